@@ -0,0 +1,528 @@
+# batch_edit.py - 批量编辑模块
+"""
+批量编辑模块，把批量编辑对话框中的各项操作作为整列运算应用到选中的事件上。
+
+支持的操作（按以下顺序依次作用于选中的事件）：
+1. 增减绝对时间
+2. 事件类型替换
+3. 统一相对时间（第一个事件的绝对时间从0开始计算）
+4. 统一坐标
+5. 时间缩放：选中事件的相对时间乘以缩放倍数
+6. 表达式，例如::
+
+    x = x * 1.5; y = y + 20
+    rel = max(rel, 16)
+    time = time * 2
+
+表达式由分号或换行分隔的赋值语句组成，可以读取字段 x、y、rel、time、key、row
+（与搜索查询的数值字段相同，row 从1开始），可以修改 x、y、rel、time；
+支持 + - * / // % 运算和 min、max、abs、round、int 函数，结果四舍五入为整数。
+
+与逐行修改相同，所有时间操作都保持未选中事件的绝对时间不变：
+修改选中事件的时间后，只调整其后第一个未选中事件的相对时间。
+
+计算在后台线程中基于事件快照进行，只涉及从第一个选中行到最后一个选中行（及其后一行）的连续区间，
+得到各列的新数据后由主线程通过 EventStore.update_range() 一次写入，
+无论选中多少行都只产生一条撤销记录和一次界面刷新。
+"""
+
+import ast
+
+import numpy as np
+
+from event_store import type_codes_from_str, type_str_from_codes, KEY_EVENT_TYPES, MOUSE_EVENT_TYPES, NO_KEYCODE
+from event_query import FIELD_ALIASES
+from utils import generate_key_event_name
+
+# 表达式可以读取的字段和可以修改的字段
+READABLE_FIELDS = ("key", "x", "y", "rel", "time", "row")
+WRITABLE_FIELDS = ("x", "y", "rel", "time")
+
+# 表达式结果的绝对值上限（超出后浮点数无法精确表示整数）
+_MAX_VALUE = 2 ** 53
+
+# 二元运算（除法类运算单独检查除数）
+_BINARY_OPERATORS = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+    ast.Div: np.true_divide,
+    ast.FloorDiv: np.floor_divide,
+    ast.Mod: np.mod
+}
+
+# 函数名 -> (numpy 函数, 最少参数个数, 最多参数个数)
+_FUNCTIONS = {
+    "min": (np.minimum, 2, None),
+    "max": (np.maximum, 2, None),
+    "abs": (np.abs, 1, 1),
+    "round": (lambda values: _round_half_away(values), 1, 1),
+    "int": (np.trunc, 1, 1)
+}
+
+
+class EditError(ValueError):
+    """批量编辑参数或表达式错误"""
+
+
+# =============================================================================
+# 表达式
+# =============================================================================
+
+class EditExpression:
+    """编译后的批量编辑表达式
+
+    表达式只解析一次，编译为对选中行整列求值的 numpy 运算，求值时没有逐行的Python循环。
+    """
+
+    def __init__(self, text):
+        """解析并编译表达式
+
+        Args:
+            text: 表达式文本
+
+        Raises:
+            EditError: 表达式语法错误
+        """
+        self.text = text
+        source = text.replace("；", ";").strip()
+        try:
+            module = ast.parse(source, mode="exec")
+        except SyntaxError as e:
+            raise EditError(f"表达式语法错误: {e.msg}")
+        self._statements = [_compile_statement(node) for node in module.body]
+
+    def is_empty(self):
+        """表达式是否没有任何语句"""
+        return not self._statements
+
+    def apply(self, state):
+        """依次执行各条赋值语句
+
+        Args:
+            state: 批量编辑的计算状态（_EditState）
+
+        Raises:
+            EditError: 除数为0、结果不是有限数值或超出范围
+        """
+        for field, evaluate in self._statements:
+            state.set_field(field, _to_integers(evaluate(state), len(state.rows), field))
+
+
+def _field_name(name, writable=False):
+    """把表达式中的名称解析为字段名"""
+    field = FIELD_ALIASES.get(name.lower())
+    fields = WRITABLE_FIELDS if writable else READABLE_FIELDS
+    if field not in fields:
+        if writable:
+            raise EditError(f"只能修改 {'、'.join(WRITABLE_FIELDS)}，不能修改: {name}")
+        raise EditError(f"未知的字段: {name}（可用字段: {'、'.join(READABLE_FIELDS)}）")
+    return field
+
+
+def _compile_statement(node):
+    """编译一条赋值语句为 (字段名, 求值函数)"""
+    if isinstance(node, ast.Assign):
+        if len(node.targets) != 1 or not isinstance(node.targets[0], ast.Name):
+            raise EditError("每条语句只能给一个字段赋值，例如 x = x * 1.5")
+        return _field_name(node.targets[0].id, writable=True), _compile_value(node.value)
+    if isinstance(node, ast.AugAssign) and isinstance(node.target, ast.Name):
+        field = _field_name(node.target.id, writable=True)
+        return field, _compile_binary(node.op, lambda state: state.field(field), _compile_value(node.value))
+    raise EditError("表达式必须由赋值语句组成，例如 rel = max(rel, 16)")
+
+
+def _compile_value(node):
+    """编译一个取值表达式为求值函数 evaluate(state)"""
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        value = float(node.value)
+        return lambda state: value
+    if isinstance(node, ast.Name):
+        field = _field_name(node.id)
+        return lambda state: state.field(field)
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.UAdd, ast.USub)):
+        operand = _compile_value(node.operand)
+        if isinstance(node.op, ast.USub):
+            return lambda state: np.negative(operand(state))
+        return operand
+    if isinstance(node, ast.BinOp):
+        return _compile_binary(node.op, _compile_value(node.left), _compile_value(node.right))
+    if isinstance(node, ast.Call):
+        return _compile_call(node)
+    raise EditError(f"表达式中不支持: {ast.unparse(node)}")
+
+
+def _compile_binary(op, left, right):
+    """编译二元运算"""
+    function = _BINARY_OPERATORS.get(type(op))
+    if function is None:
+        raise EditError("表达式只支持 + - * / // % 运算")
+    if function in (np.add, np.subtract, np.multiply):
+        return lambda state: function(left(state), right(state))
+
+    def divide(state):
+        divisor = right(state)
+        if np.any(np.asarray(divisor) == 0):
+            raise EditError("表达式中出现了除以0")
+        return function(left(state), divisor)
+    return divide
+
+
+def _compile_call(node):
+    """编译函数调用"""
+    name = node.func.id if isinstance(node.func, ast.Name) else None
+    if name not in _FUNCTIONS or node.keywords:
+        raise EditError(f"表达式只支持函数: {'、'.join(_FUNCTIONS)}")
+    function, min_args, max_args = _FUNCTIONS[name]
+    if len(node.args) < min_args or (max_args is not None and len(node.args) > max_args):
+        raise EditError(f"函数 {name} 的参数个数不正确")
+    arguments = [_compile_value(arg) for arg in node.args]
+    if len(arguments) == 1:
+        argument = arguments[0]
+        return lambda state: function(argument(state))
+
+    def reduce(state):
+        result = arguments[0](state)
+        for argument in arguments[1:]:
+            result = function(result, argument(state))
+        return result
+    return reduce
+
+
+def _round_half_away(values):
+    """四舍五入（0.5 远离0取整）"""
+    return np.copysign(np.floor(np.abs(values) + 0.5), values)
+
+
+def _to_integers(values, count, field):
+    """把求值结果四舍五入为 count 个 int64 整数"""
+    values = np.broadcast_to(np.asarray(values, dtype=np.float64), (count,))
+    if not np.all(np.isfinite(values)) or np.any(np.abs(values) >= _MAX_VALUE):
+        raise EditError(f"{field} 的计算结果超出范围")
+    return _round_half_away(values).astype(np.int64)
+
+
+# =============================================================================
+# 计算状态
+# =============================================================================
+
+class _EditState:
+    """批量编辑的计算状态
+
+    只保存从第一个选中行到最后一个选中行之后一行的连续区间 [first, end)。
+    绝对时间保存在比区间多一个元素的 times 数组中：
+    times[0] 是 first 前一行的绝对时间（first 为0时为时间原点），
+    times[i] 是第 first + i - 1 行的绝对时间，相对时间即相邻两项之差。
+    """
+
+    def __init__(self, snapshot, rows):
+        """初始化计算状态
+
+        Args:
+            snapshot: 事件快照（EventSnapshot）
+            rows: 选中的存储行号（升序、不重复的 int64 数组）
+        """
+        self.rows = rows
+        self.first = int(rows[0])
+        self.end = min(int(rows[-1]) + 2, snapshot.row_count())
+        first, end = self.first, self.end
+        self.local = rows - first  # 选中行在区间中的位置
+
+        # 只累加区间内的相对时间，区间之前的部分求和即可
+        rel_times = snapshot.rel_times
+        times = np.empty(end - first + 1, dtype=np.int64)
+        times[0] = snapshot.time_origin + int(rel_times[:first].sum(dtype=np.int64))
+        np.cumsum(rel_times[first:end], out=times[1:])
+        times[1:] += times[0]
+        self.times = times
+        self.old_rel_times = np.diff(times)
+        self.old_origin = int(times[0])
+
+        self.snapshot = snapshot
+        self.names = None  # 替换类型时才复制名称
+        self.types = np.array(snapshot.types[first:end])
+        self.buttons = np.array(snapshot.buttons[first:end])
+        self.keycodes = np.array(snapshot.keycodes[first:end])
+        self.xs = np.array(snapshot.xs[first:end])
+        self.ys = np.array(snapshot.ys[first:end])
+        self.changed = set()  # 被修改的列名
+
+        # 区间中未选中的位置（times 数组下标），设置相对时间时以它们为锚点
+        selected = np.zeros(len(times), dtype=bool)
+        selected[self.local + 1] = True
+        self._selected = selected
+
+    def field(self, field):
+        """读取选中行的字段值"""
+        local = self.local
+        if field == "x":
+            return self.xs[local]
+        if field == "y":
+            return self.ys[local]
+        if field == "key":
+            return self.keycodes[local]
+        if field == "time":
+            return self.times[local + 1]
+        if field == "rel":
+            return self.times[local + 1] - self.times[local]
+        return self.rows + 1
+
+    def set_field(self, field, values):
+        """修改选中行的字段值
+
+        Args:
+            field: 字段名（x、y、rel、time）
+            values: 与选中行一一对应的 int64 数组，或一个整数
+        """
+        if field == "x":
+            self.xs[self.local] = values
+            self.changed.add("xs")
+        elif field == "y":
+            self.ys[self.local] = values
+            self.changed.add("ys")
+        elif field == "time":
+            self.set_times(values)
+        elif field == "rel":
+            self.set_rel_times(values)
+
+    def set_times(self, values):
+        """设置选中行的绝对时间，未选中行的绝对时间不变
+
+        第一行的相对时间不变，绝对时间的变化由时间原点承担。
+        """
+        times = self.times
+        if self.first == 0:
+            times[0] += values[0] - times[1]
+        times[self.local + 1] = values
+
+    def set_rel_times(self, values):
+        """设置选中行的相对时间，未选中行的绝对时间不变
+
+        每段连续选中行的绝对时间等于段前一行的绝对时间加上段内相对时间的累加。
+        """
+        times = self.times
+        positions = self.local + 1
+        deltas = np.zeros(len(times), dtype=np.int64)
+        deltas[positions] = values
+        sums = np.cumsum(deltas)
+        indices = np.arange(len(times), dtype=np.int64)
+        anchors = np.maximum.accumulate(np.where(self._selected, 0, indices))[positions]
+        times[positions] = times[anchors] + sums[positions] - sums[anchors]
+
+    def result(self, version):
+        """整理计算结果
+
+        Returns:
+            BatchEditResult: 只包含发生变化的列
+        """
+        columns = {name: getattr(self, name) for name in self.changed}
+        rel_times = np.diff(self.times)
+        if not np.array_equal(rel_times, self.old_rel_times):
+            columns["rel_times"] = rel_times
+        time_origin = None
+        if self.first == 0 and int(self.times[0]) != self.old_origin:
+            time_origin = int(self.times[0])
+        return BatchEditResult(self.first, columns, time_origin, len(self.rows), version)
+
+
+# =============================================================================
+# 批量编辑
+# =============================================================================
+
+class BatchEdit:
+    """一次批量编辑的全部参数"""
+
+    def __init__(self, offset=0, unified_rel_time=0, old_type_info=None, new_type_info=None,
+                 apply_coords=False, unified_x=0, unified_y=0, time_scale=1.0, expression=""):
+        """初始化批量编辑参数
+
+        Args:
+            offset: 增减绝对时间（毫秒）
+            unified_rel_time: 统一相对时间（大于0时生效）
+            old_type_info: 替换前的 (事件类型, 键码文本)，None表示不替换类型
+            new_type_info: 替换后的 (事件类型, 键码文本)
+            apply_coords: 是否应用统一坐标
+            unified_x: 统一X坐标
+            unified_y: 统一Y坐标
+            time_scale: 时间缩放倍数（大于0，1表示不缩放）
+            expression: 表达式文本
+
+        Raises:
+            EditError: 参数或表达式错误
+        """
+        if time_scale <= 0:
+            raise EditError("时间缩放倍数必须大于0")
+        self.offset = offset
+        self.unified_rel_time = unified_rel_time
+        self.old_type_info = old_type_info
+        self.new_type_info = new_type_info
+        self.apply_coords = apply_coords
+        self.unified_x = unified_x
+        self.unified_y = unified_y
+        self.time_scale = time_scale
+        self.expression = EditExpression(expression) if expression and expression.strip() else None
+
+    def is_empty(self):
+        """是否没有任何需要执行的操作"""
+        return (not self.offset and self.unified_rel_time <= 0 and not (self.old_type_info and self.new_type_info)
+                and not self.apply_coords and self.time_scale == 1 and self.expression is None)
+
+    def compute(self, snapshot, rows, task=None):
+        """基于快照计算批量编辑的结果
+
+        Args:
+            snapshot: 事件快照（EventSnapshot）
+            rows: 选中的存储行号
+            task: 任务句柄（可选），用于在各步之间响应取消
+
+        Returns:
+            BatchEditResult: 计算结果
+
+        Raises:
+            EditError: 表达式求值失败
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        if np.any(rows[1:] <= rows[:-1]):
+            rows = np.unique(rows)
+        rows = rows[(rows >= 0) & (rows < snapshot.row_count())]
+        if not len(rows):
+            return BatchEditResult(0, {}, None, 0, snapshot.version)
+        state = _EditState(snapshot, rows)
+
+        # 1. 增减绝对时间
+        if self.offset:
+            state.set_times(state.field("time") + self.offset)
+
+        # 2. 事件类型替换
+        if self.old_type_info and self.new_type_info:
+            self._replace_types(state)
+        _check_cancelled(task)
+
+        # 3. 统一相对时间，第一个事件的绝对时间从0开始计算
+        if self.unified_rel_time > 0:
+            if state.first == 0:
+                state.times[0] = 0
+            state.set_rel_times(np.full(len(rows), self.unified_rel_time, dtype=np.int64))
+
+        # 4. 统一坐标
+        if self.apply_coords:
+            state.set_field("x", self.unified_x)
+            state.set_field("y", self.unified_y)
+
+        # 5. 时间缩放
+        if self.time_scale != 1:
+            state.set_rel_times(_to_integers(state.field("rel") * self.time_scale, len(rows), "rel"))
+        _check_cancelled(task)
+
+        # 6. 表达式
+        if self.expression is not None:
+            with np.errstate(all="ignore"):
+                self.expression.apply(state)
+        return state.result(snapshot.version)
+
+    def _replace_types(self, state):
+        """把类型（和键码）匹配的选中行替换为新类型"""
+        old_type, old_keycode = self.old_type_info
+        new_type, new_keycode = self.new_type_info
+        local = state.local
+        types = state.types[local]
+        buttons = state.buttons[local]
+
+        # 按 (类型码, 鼠标按钮) 的组合匹配类型名，每种组合只转换一次
+        pairs, inverse = np.unique(types.astype(np.int64) * 256 + buttons.astype(np.int64), return_inverse=True)
+        pair_matches = np.array([type_str_from_codes(*divmod(int(pair), 256)) == old_type for pair in pairs])
+        match = pair_matches[inverse.reshape(-1)]
+        if old_keycode:
+            match &= state.keycodes[local] == int(old_keycode)
+        matched = local[match]
+        if not len(matched):
+            return
+
+        type_code, mouse_button = type_codes_from_str(new_type)
+        state.types[matched] = type_code
+        state.buttons[matched] = mouse_button
+        state.changed.update(("types", "buttons"))
+        # 从按键事件替换为鼠标事件时清除键码，新类型是具体按键事件时使用其键码
+        if old_type in KEY_EVENT_TYPES and new_type in MOUSE_EVENT_TYPES:
+            state.keycodes[matched] = NO_KEYCODE
+            state.changed.add("keycodes")
+        elif new_keycode:
+            state.keycodes[matched] = int(new_keycode)
+            state.changed.add("keycodes")
+
+        # 事件名称只取决于新类型和键码，每个键码只生成一次
+        keycodes, inverse = np.unique(state.keycodes[matched], return_inverse=True)
+        names = np.array([generate_key_event_name(new_type, "" if keycode == NO_KEYCODE else str(keycode))
+                          for keycode in keycodes.tolist()], dtype=object)
+        span_names = np.array(state.snapshot.names[state.first:state.end], dtype=object)
+        span_names[matched] = names[inverse.reshape(-1)]
+        state.names = span_names.tolist()
+        state.changed.add("names")
+
+
+def key_event_choices(event_store):
+    """列出事件存储中已有的具体按键事件，供类型替换选择
+
+    Args:
+        event_store: 事件存储或快照
+
+    Returns:
+        dict: 事件名称 -> (事件类型, 键码文本)，同名事件以最后一个为准
+    """
+    types = np.asarray(event_store.types, dtype=np.int8)
+    keycodes = np.asarray(event_store.keycodes, dtype=np.int64)
+    key_types = [type_codes_from_str(type_str)[0] for type_str in KEY_EVENT_TYPES]
+    key_rows = np.flatnonzero(np.isin(types, key_types) & (keycodes != NO_KEYCODE))
+    names = event_store.names
+    choices = {}
+    for row in key_rows.tolist():
+        choices[names[row]] = (type_str_from_codes(int(types[row])), str(keycodes[row]))
+    return choices
+
+
+def _check_cancelled(task):
+    if task is not None:
+        task.raise_if_cancelled()
+
+
+# =============================================================================
+# 计算结果
+# =============================================================================
+
+class BatchEditResult:
+    """批量编辑的计算结果，由主线程写入事件存储"""
+
+    def __init__(self, first, columns, time_origin, row_count, version):
+        """初始化计算结果
+
+        Args:
+            first: 区间第一行
+            columns: 列名（EventStore.update_range() 的参数名）-> 区间内该列的新数据
+            time_origin: 新的时间原点，None表示不变
+            row_count: 选中的行数
+            version: 计算所基于的快照版本号
+        """
+        self.first = first
+        self.columns = columns
+        self.time_origin = time_origin
+        self.row_count = row_count
+        self.version = version
+
+    def is_empty(self):
+        """是否没有任何修改"""
+        return not self.columns and self.time_origin is None
+
+    def apply(self, event_store):
+        """把结果写入事件存储
+
+        Args:
+            event_store: 事件存储实例
+
+        Returns:
+            bool: 是否已写入；事件存储在计算期间被修改过时返回False，不做任何修改
+        """
+        if event_store.version != self.version:
+            return False
+        if not self.is_empty():
+            event_store.update_range(self.first, time_origin=self.time_origin, **self.columns)
+        return True
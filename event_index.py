@@ -0,0 +1,891 @@
+# event_index.py - 事件索引模块
+"""
+事件索引模块，提供随事件存储变更增量维护的辅助索引。
+
+PairingIndex 按“通道”（每个键码、每个鼠标按键）记录按下/释放事件所在的行，
+事件存储的插入、删除、修改和重置只更新受影响的通道，
+生成脚本或高亮异常行时无需重新扫描整个事件列表。
+
+SearchIndex 为事件搜索维护事件名称的三元组倒排索引和类型、键码列，
+搜索时只对候选词做子串校验，再用布尔掩码一次性求出命中的行。
+
+EventStatistics 以累计值维护各类事件数量和相对时间之和，
+每次修改只处理受影响的行，统计面板读取快照的代价与事件总数无关。
+
+本模块不依赖Qt，可在任意线程中使用。
+"""
+
+import numpy as np
+
+from event_store import (
+    CHANGE_INSERT, CHANGE_REMOVE, CHANGE_UPDATE, CHANGE_RESET, CHANGE_TIMES,
+    NO_KEYCODE, type_str_from_codes
+)
+
+# 成对性问题类型
+PAIRING_DUPLICATE_PRESS = "duplicate_press"  # 重复按下
+PAIRING_RELEASE_WITHOUT_PRESS = "release_without_press"  # 未按下就释放
+PAIRING_NOT_RELEASED = "not_released"  # 按下但未释放
+
+# 通道类型
+CHANNEL_KEY = "key"
+CHANNEL_MOUSE = "mouse"
+
+# 不参与成对性检查的行
+NO_CHANNEL = np.iinfo(np.int64).min
+
+# 累计的行号平移记录超过该数量时，把平移应用到所有通道并清空记录
+_MAX_PENDING_SHIFTS = 1024
+
+
+def _is_press(types):
+    """按下事件（按键按下、鼠标按键按下）的掩码"""
+    return (types == 0) | (types == 4)
+
+
+def _encode_channels(types, buttons, keycodes):
+    """计算每一行所属的通道和是否为按下事件
+
+    通道编码：按键为 keycode * 4，鼠标按键为 button * 4 + 1，其他事件为 NO_CHANNEL。
+
+    Returns:
+        tuple: (通道数组, 按下标记数组)
+    """
+    types = np.asarray(types, dtype=np.int64)
+    buttons = np.asarray(buttons, dtype=np.int64)
+    keycodes = np.asarray(keycodes, dtype=np.int64)
+
+    channels = np.full(len(types), NO_CHANNEL, dtype=np.int64)
+    is_key = (types == 0) | (types == 1)
+    channels[is_key] = keycodes[is_key] * 4
+    is_mouse = ((types == 4) | (types == 5)) & (buttons >= 1) & (buttons <= 3)
+    channels[is_mouse] = buttons[is_mouse] * 4 + 1
+    return channels, _is_press(types)
+
+
+def decode_channel(channel):
+    """将通道编码还原为 (通道类型, 键码或鼠标按键代码)"""
+    if channel % 4 == 0:
+        return CHANNEL_KEY, channel // 4
+    return CHANNEL_MOUSE, (channel - 1) // 4
+
+
+def _apply_shifts(rows, shifts):
+    """对升序行号数组依次应用行号平移
+
+    每次平移给当前行号不小于阈值的行加上平移量。行号始终保持升序，每次平移只影响一个后缀，
+    用树状数组累计各后缀的平移量，二分查找每次平移的起点，最后一次性加到行号上，
+    k 次平移的代价为 O(k·log²m + m)，m 为行数。
+
+    Args:
+        rows: 升序行号数组
+        shifts: [(阈值, 平移量), ...]，阈值为平移发生时的行号
+
+    Returns:
+        numpy.ndarray: 平移后的行号数组
+    """
+    size = len(rows)
+    if not shifts or not size:
+        return rows
+    tree = [0] * (size + 1)
+    starts = np.zeros(size, dtype=np.int64)
+    for threshold, delta in shifts:
+        low, high = 0, size
+        while low < high:
+            middle = (low + high) // 2
+            offset = 0
+            i = middle + 1
+            while i > 0:
+                offset += tree[i]
+                i -= i & -i
+            if rows[middle] + offset < threshold:
+                low = middle + 1
+            else:
+                high = middle
+        if low == size:
+            continue
+        starts[low] += delta
+        i = low + 1
+        while i <= size:
+            tree[i] += delta
+            i += i & -i
+    return rows + np.cumsum(starts)
+
+
+class RowGroups:
+    """按键分组的升序行号数组
+
+    插入和删除使之后所有行的行号平移。splice() 只改写调用方指明的组，
+    平移追加到平移记录中，其他组保存行号数组和已应用的记录数，读取时才补上之后的平移。
+    平移记录过长时一次性应用到所有组并清空。
+    """
+
+    def __init__(self):
+        self._shifts = []  # 行号平移记录 [(阈值, 平移量)]
+        self._groups = {}  # 键 -> (升序行号数组, 已应用的平移记录数)
+
+    def __contains__(self, key):
+        return key in self._groups
+
+    def __len__(self):
+        return len(self._groups)
+
+    def keys(self):
+        """所有组的键（列表副本）"""
+        return list(self._groups)
+
+    def count(self, key):
+        """组内的行数（平移不改变行数，无需补上平移）"""
+        entry = self._groups.get(key)
+        return 0 if entry is None else len(entry[0])
+
+    def rows(self, key):
+        """组的当前行号数组"""
+        rows, applied = self._groups[key]
+        if applied != len(self._shifts):
+            rows = _apply_shifts(rows, self._shifts[applied:])
+            self._groups[key] = (rows, len(self._shifts))
+        return rows
+
+    def set(self, key, rows):
+        """设置组的行号数组（当前行号），空数组删除该组"""
+        if len(rows):
+            self._groups[key] = (rows, len(self._shifts))
+        else:
+            self._groups.pop(key, None)
+
+    def discard(self, key):
+        """删除一个组"""
+        self._groups.pop(key, None)
+
+    def clear(self):
+        """删除所有组"""
+        self._shifts = []
+        self._groups = {}
+
+    def splice(self, first, old_count, new_count, keys=(), new_keys=None):
+        """把 [first, first + old_count) 替换为 new_count 个新行
+
+        Args:
+            first: 第一行
+            old_count: 被替换的行数
+            new_count: 新行数
+            keys: 被替换的行和新行所在的组，只有这些组会被改写
+            new_keys: 新行的键数组（长度为 new_count），None表示新行不属于 keys 中的组
+        """
+        end = first + old_count
+        shift = new_count - old_count
+        # 改写后的组已包含本次平移
+        applied = len(self._shifts) + (1 if shift else 0)
+        for key in keys:
+            rows = self.rows(key) if key in self._groups else np.empty(0, dtype=np.int64)
+            left, right = np.searchsorted(rows, (first, end))
+            parts = [rows[:left], rows[right:] + shift]
+            if new_keys is not None:
+                parts.insert(1, first + np.flatnonzero(new_keys == key))
+            rows = np.concatenate(parts)
+            if len(rows):
+                self._groups[key] = (rows, applied)
+            else:
+                self._groups.pop(key, None)
+
+        if shift:
+            self._shifts.append((end, shift))
+        if len(self._shifts) > _MAX_PENDING_SHIFTS:
+            for key in self._groups:
+                self.rows(key)
+            self._groups = {key: (rows, 0) for key, (rows, _) in self._groups.items()}
+            self._shifts = []
+
+
+class PairingIndex:
+    """事件成对性索引
+
+    对每个通道，按下后必须先释放才能再次按下。
+    处理完一个事件后，通道的按下状态总是等于该事件是否为按下事件，
+    因此第 i 个事件有问题当且仅当它与通道内前一个事件同为按下或同为释放
+    （第一个事件之前视为已释放），可以对整个通道向量化求值。
+
+    各通道的行和问题行保存在 RowGroups 中，插入和删除只改写被修改事件所在的通道，
+    其他通道的行号平移延迟到读取时应用。
+    """
+
+    def __init__(self, event_store, attach=True):
+        """初始化成对性索引
+
+        Args:
+            event_store: 事件存储实例
+            attach: 是否注册为事件存储的监听器，随存储变更自动更新
+        """
+        self.event_store = event_store
+        self._channel_rows = RowGroups()  # 通道 -> 升序行号数组
+        self._channel_issues = RowGroups()  # 通道 -> 有问题的行号数组
+        self._unreleased_channels = set()  # 按下但未释放的通道
+        self._old_rows = None  # 删除或修改前的 (第一行, 通道数组, 按下标记数组)
+        self._dirty = set()
+        self._issues = None  # 问题列表缓存
+        self._issue_rows = None  # 合并后按行号排序的问题行
+        self._issue_channels = None  # 与问题行对应的通道
+        self._unreleased = None  # 未释放的问题
+        self.rebuild()
+        if attach:
+            event_store.add_pre_listener(self.on_store_about_to_change)
+            event_store.add_listener(self.on_store_changed)
+
+    def detach(self):
+        """停止跟踪事件存储"""
+        self.event_store.remove_pre_listener(self.on_store_about_to_change)
+        self.event_store.remove_listener(self.on_store_changed)
+
+    # -------------------------------------------------------------------------
+    # 索引维护
+    # -------------------------------------------------------------------------
+
+    def _classify(self, first, count):
+        """读取事件存储中一段行的通道信息"""
+        store = self.event_store
+        end = first + count
+        return _encode_channels(store.types[first:end], store.buttons[first:end], store.keycodes[first:end])
+
+    def _invalidate(self, channels=()):
+        """标记通道需要重新求值，并丢弃合并后的问题列表"""
+        self._dirty.update(int(channel) for channel in channels if channel != NO_CHANNEL)
+        self._issues = None
+        self._issue_rows = None
+
+    def rebuild(self):
+        """从事件存储完整重建索引"""
+        channels, _ = self._classify(0, self.event_store.row_count())
+        self._channel_rows.clear()
+        self._channel_issues.clear()
+        self._unreleased_channels = set()
+
+        rows = np.flatnonzero(channels != NO_CHANNEL)
+        if len(rows):
+            # 稳定排序保证同一通道内的行号保持升序
+            order = rows[np.argsort(channels[rows], kind='stable')]
+            sorted_channels = channels[order]
+            starts = np.flatnonzero(np.diff(sorted_channels)) + 1
+            for group in np.split(order, starts):
+                self._channel_rows.set(int(channels[group[0]]), group)
+
+        self._dirty = set(self._channel_rows.keys())
+        self._issues = None
+        self._issue_rows = None
+
+    def _replace_rows(self, first, old_count, new_channels, channels):
+        """把 [first, first + old_count) 替换为通道为 new_channels 的新行，只改写 channels 中的通道"""
+        # 这些通道随后重新求值，旧的问题行不再平移
+        for channel in channels:
+            self._channel_issues.discard(channel)
+        self._channel_rows.splice(first, old_count, len(new_channels), channels, new_channels)
+        self._channel_issues.splice(first, old_count, len(new_channels))
+
+    def _take_old_rows(self, first, count):
+        """取出前置回调记录的旧通道和按下标记，没有对应的记录时返回None"""
+        old = self._old_rows
+        self._old_rows = None
+        if old is None or old[0] != first or len(old[1]) != count:
+            return None
+        return old[1:]
+
+    def _on_insert(self, first, count):
+        new_channels, _ = self._classify(first, count)
+        inserted_channels = np.unique(new_channels[new_channels != NO_CHANNEL]).tolist()
+        self._replace_rows(first, 0, new_channels, inserted_channels)
+        # 行号变化后合并的问题列表一律失效，只有新增事件的通道需要重新求值
+        self._invalidate(inserted_channels)
+
+    def _on_remove(self, first, count):
+        old = self._take_old_rows(first, count)
+        if old is None:
+            # 没有收到删除前的通知，无法得知被删除的行所在的通道
+            self.rebuild()
+            return
+        old_channels = old[0]
+        removed_channels = np.unique(old_channels[old_channels != NO_CHANNEL]).tolist()
+        self._replace_rows(first, count, np.empty(0, dtype=np.int64), removed_channels)
+        self._invalidate(removed_channels)
+
+    def _on_update(self, first, count):
+        old = self._take_old_rows(first, count)
+        if old is None:
+            self.rebuild()
+            return
+        old_channels, old_presses = old
+        new_channels, new_presses = self._classify(first, count)
+        changed = (old_channels != new_channels) | (old_presses != new_presses)
+        if not changed.any():
+            return
+
+        moved = old_channels != new_channels
+        affected = set(old_channels[changed].tolist()) | set(new_channels[changed].tolist())
+        affected.discard(NO_CHANNEL)
+        # 只有按下/释放状态变化时通道的行号不变，只需重新求值
+        if moved.any():
+            moved_channels = set(old_channels[moved].tolist()) | set(new_channels[moved].tolist())
+            moved_channels.discard(NO_CHANNEL)
+            self._replace_rows(first, count, new_channels, moved_channels)
+        self._invalidate(affected)
+
+    def on_store_about_to_change(self, change, first, count):
+        """事件存储变更前回调，记录即将删除或修改的行所在的通道"""
+        if change in (CHANGE_REMOVE, CHANGE_UPDATE) and count > 0:
+            self._old_rows = (first,) + self._classify(first, count)
+
+    def on_store_changed(self, change, first, count):
+        """事件存储变更回调"""
+        if change == CHANGE_INSERT:
+            self._on_insert(first, count)
+        elif change == CHANGE_REMOVE:
+            self._on_remove(first, count)
+        elif change == CHANGE_UPDATE:
+            if count > 0:
+                self._on_update(first, count)
+        elif change == CHANGE_RESET:
+            self.rebuild()
+
+    # -------------------------------------------------------------------------
+    # 查询
+    # -------------------------------------------------------------------------
+
+    def _evaluate_channel(self, channel):
+        """向量化计算一个通道内的成对性问题"""
+        rows = self._channel_rows.rows(channel)
+        presses = _is_press(np.frombuffer(self.event_store.types, dtype=np.int8)[rows])
+        previous = np.empty(len(presses), dtype=bool)
+        previous[0] = False
+        previous[1:] = presses[:-1]
+        self._channel_issues.set(channel, rows[presses == previous])
+        if presses[-1]:
+            self._unreleased_channels.add(channel)
+        else:
+            self._unreleased_channels.discard(channel)
+
+    def _ensure_evaluated(self):
+        """重新计算脏通道"""
+        for channel in self._dirty:
+            if channel in self._channel_rows:
+                self._evaluate_channel(channel)
+            else:
+                self._channel_issues.discard(channel)
+                self._unreleased_channels.discard(channel)
+        self._dirty.clear()
+
+    def _ensure_merged(self):
+        """重新计算脏通道，并把各通道的问题按行号合并"""
+        if self._issue_rows is not None:
+            return
+        self._ensure_evaluated()
+
+        row_parts = []
+        channel_parts = []
+        for channel in self._channel_issues.keys():
+            rows = self._channel_issues.rows(channel)
+            row_parts.append(rows)
+            channel_parts.append(np.full(len(rows), channel, dtype=np.int64))
+
+        if row_parts:
+            rows = np.concatenate(row_parts)
+            order = np.argsort(rows, kind='stable')
+            self._issue_rows = rows[order]
+            self._issue_channels = np.concatenate(channel_parts)[order]
+        else:
+            self._issue_rows = np.empty(0, dtype=np.int64)
+            self._issue_channels = np.empty(0, dtype=np.int64)
+
+        # 未释放的问题：先按键后鼠标，各自按代码排序
+        unreleased = [decode_channel(channel) for channel in self._unreleased_channels]
+        unreleased.sort(key=lambda item: (item[0] != CHANNEL_KEY, item[1]))
+        self._unreleased = [(None, PAIRING_NOT_RELEASED, channel_type, code)
+                            for channel_type, code in unreleased]
+
+    def _make_row_issue(self, row, channel):
+        """构建一个行内问题"""
+        channel_type, code = decode_channel(channel)
+        kind = PAIRING_DUPLICATE_PRESS if _is_press(self.event_store.types[row]) else PAIRING_RELEASE_WITHOUT_PRESS
+        return (row, kind, channel_type, code)
+
+    def issues(self):
+        """获取当前所有成对性问题
+
+        行内问题按行号排序，其后是未释放的按键和鼠标按键。
+
+        Returns:
+            list: (行号或None, 问题类型, 通道类型, 键码或鼠标按键代码) 列表
+        """
+        if self._issues is None:
+            self._ensure_merged()
+            self._issues = [self._make_row_issue(row, channel) for row, channel
+                            in zip(self._issue_rows.tolist(), self._issue_channels.tolist())]
+            self._issues.extend(self._unreleased)
+        return self._issues
+
+    def issue_count(self):
+        """成对性问题总数"""
+        self._ensure_evaluated()
+        issues = self._channel_issues
+        return sum(issues.count(channel) for channel in issues.keys()) + len(self._unreleased_channels)
+
+    def has_issues(self):
+        """是否存在成对性问题"""
+        return self.issue_count() > 0
+
+    def row_issue(self, row):
+        """获取某一行的成对性问题，没有问题返回None
+
+        只查找该行所在通道的问题行，不需要合并全部通道。
+        """
+        if not 0 <= row < self.event_store.row_count():
+            return None
+        channel = int(self._classify(row, 1)[0][0])
+        self._ensure_evaluated()
+        if channel not in self._channel_issues:
+            return None
+        rows = self._channel_issues.rows(channel)
+        position = int(np.searchsorted(rows, row))
+        if position < len(rows) and rows[position] == row:
+            return self._make_row_issue(row, channel)
+        return None
+
+
+# =============================================================================
+# 搜索索引
+# =============================================================================
+
+# 类型码和鼠标按钮合成的类型键：type_code * 4 + mouse_button
+_TYPE_KEY_STRIDE = 4
+
+
+def _type_keys(types, buttons):
+    """把 (类型码, 鼠标按钮) 合成一个整数类型键"""
+    return np.asarray(types, dtype=np.int64) * _TYPE_KEY_STRIDE + np.asarray(buttons, dtype=np.int64)
+
+
+def _lookup_mask(ids, matching_ids, size):
+    """ids 中取值属于 matching_ids 的位置掩码
+
+    取值都是小于 size 的非负编号，用一张查找表做一次向量化取值，比 np.isin 更快。
+    """
+    if not matching_ids:
+        return np.zeros(len(ids), dtype=bool)
+    table = np.zeros(size, dtype=bool)
+    table[list(matching_ids)] = True
+    return table[ids]
+
+
+def _intern_values(values, index):
+    """把整数数组映射为编号数组，新值加入 index（值 -> 编号）
+
+    不同取值很少，先去重再逐个映射，整体仍是向量化的。
+    """
+    unique, inverse = np.unique(np.asarray(values, dtype=np.int64), return_inverse=True)
+    for value in unique.tolist():
+        index.setdefault(value, len(index))
+    unique_ids = np.array([index[value] for value in unique.tolist()], dtype=np.int64)
+    return unique_ids[inverse.reshape(-1)]
+
+
+def _trigrams(text):
+    """返回文本中所有长度为3的子串"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TermVocabulary:
+    """词表：为每个不同的字符串分配编号，并维护小写形式的三元组倒排索引
+
+    事件名称大量重复，倒排索引建立在不同名称上而不是行上，
+    行到名称的映射由调用方保存的编号数组表示。
+    每个词记录引用次数（调用方中使用它的行数），降为0时从词表和倒排索引中移除，
+    编号留给之后的新词复用，删除或改名后不再出现的名称不会留在词表中。
+    """
+
+    def __init__(self):
+        self._ids = {}
+        self._terms = []  # 编号 -> 词，已移除的编号为None
+        self._counts = []  # 编号 -> 引用次数
+        self._free_ids = []  # 可复用的编号
+        self._postings = {}  # 三元组 -> 含有该三元组的词编号集合
+
+    def __len__(self):
+        """编号上限（包括已移除、待复用的编号）"""
+        return len(self._terms)
+
+    def intern(self, term):
+        """返回词的编号并增加一次引用，新词会加入词表"""
+        term_id = self._ids.get(term)
+        if term_id is None:
+            if self._free_ids:
+                term_id = self._free_ids.pop()
+                self._terms[term_id] = term
+            else:
+                term_id = len(self._terms)
+                self._terms.append(term)
+                self._counts.append(0)
+            self._ids[term] = term_id
+            for trigram in _trigrams(term.lower()):
+                self._postings.setdefault(trigram, set()).add(term_id)
+        self._counts[term_id] += 1
+        return term_id
+
+    def intern_many(self, terms):
+        """批量返回词编号数组（每个词增加一次引用）"""
+        return np.fromiter((self.intern(term) for term in terms), dtype=np.int64, count=len(terms))
+
+    def release_many(self, term_ids):
+        """每个编号减少一次引用，引用次数降为0的词从词表中移除"""
+        unique, counts = np.unique(np.asarray(term_ids, dtype=np.int64), return_counts=True)
+        for term_id, count in zip(unique.tolist(), counts.tolist()):
+            self._counts[term_id] -= count
+            if not self._counts[term_id]:
+                self._evict(term_id)
+
+    def _evict(self, term_id):
+        """从词表和倒排索引中移除一个词"""
+        term = self._terms[term_id]
+        del self._ids[term]
+        for trigram in _trigrams(term.lower()):
+            posting = self._postings[trigram]
+            posting.discard(term_id)
+            if not posting:
+                del self._postings[trigram]
+        self._terms[term_id] = None
+        self._free_ids.append(term_id)
+
+    def term_id(self, term):
+        """返回已有词的编号，不存在时返回None"""
+        return self._ids.get(term)
+
+    def matching_ids(self, text):
+        """返回小写形式包含 text 的所有词编号
+
+        text 不少于3个字符时先求三元组倒排列表的交集作为候选，再做子串校验；
+        更短的文本直接校验全部词。
+
+        Args:
+            text: 小写搜索文本
+
+        Returns:
+            list: 词编号列表
+        """
+        if len(text) >= 3:
+            candidates = None
+            for trigram in sorted(_trigrams(text), key=lambda item: len(self._postings.get(item, ()))):
+                posting = self._postings.get(trigram)
+                if not posting:
+                    return []
+                candidates = set(posting) if candidates is None else candidates & posting
+                if not candidates:
+                    return []
+            terms = self._terms
+            return [term_id for term_id in candidates if text in terms[term_id].lower()]
+        return [term_id for term_id, term in enumerate(self._terms) if term is not None and text in term.lower()]
+
+
+class SearchIndex:
+    """事件搜索索引
+
+    保存三列行编号：名称编号、类型编号（由类型码和鼠标按钮合成）、键码编号。搜索条件与旧版逐行扫描一致：
+    名称、类型名或键码文本包含搜索文本（不区分大小写），且类型名等于过滤类型。
+    每个条件先在词表或类型表上求出命中的值，再对编号列做一次查表得到布尔掩码，
+    组合条件就是掩码的按位与/或。
+
+    名称命中的行通常很少，对全部行按名称搜索时不扫描名称编号列，而是把命中名称的行号
+    直接写入掩码；各名称的行号保存在 RowGroups 中，第一次这样搜索时才建立。
+    """
+
+    def __init__(self, event_store, attach=True):
+        """初始化搜索索引
+
+        Args:
+            event_store: 事件存储实例
+            attach: 是否注册为事件存储的监听器，随存储变更自动更新
+        """
+        self.event_store = event_store
+        self.names = TermVocabulary()
+        self._name_ids = np.empty(0, dtype=np.int64)
+        self._name_rows = None  # 名称编号 -> 升序行号数组（RowGroups），未建立时为None
+        self._type_ids = np.empty(0, dtype=np.int64)
+        self._keycode_ids = np.empty(0, dtype=np.int64)
+        self._type_index = {}  # 类型键 -> 类型编号
+        self._keycode_index = {}  # 键码 -> 键码编号
+        self.rebuild()
+        if attach:
+            event_store.add_listener(self.on_store_changed)
+
+    def detach(self):
+        """停止跟踪事件存储"""
+        self.event_store.remove_listener(self.on_store_changed)
+
+    # -------------------------------------------------------------------------
+    # 索引维护
+    # -------------------------------------------------------------------------
+
+    def _read_rows(self, first, count):
+        """读取一段行的三列索引数据"""
+        store = self.event_store
+        end = first + count
+        name_ids = self.names.intern_many(store.names[first:end])
+        type_ids = _intern_values(_type_keys(store.types[first:end], store.buttons[first:end]), self._type_index)
+        keycode_ids = _intern_values(store.keycodes[first:end], self._keycode_index)
+        return name_ids, type_ids, keycode_ids
+
+    def rebuild(self):
+        """从事件存储完整重建索引（同时丢弃不再使用的名称和键码）"""
+        self.names = TermVocabulary()
+        self._name_rows = None
+        self._type_index = {}
+        self._keycode_index = {}
+        self._name_ids, self._type_ids, self._keycode_ids = self._read_rows(0, self.event_store.row_count())
+
+    def _splice_name_rows(self, first, old_count, new_count, name_ids, new_name_ids=None):
+        """同步各名称的行号（name_ids 为被替换的行和新行涉及的名称编号）"""
+        if self._name_rows is not None:
+            keys = np.unique(name_ids).tolist()
+            self._name_rows.splice(first, old_count, new_count, keys, new_name_ids)
+
+    def _on_insert(self, first, count):
+        new_columns = self._read_rows(first, count)
+        self._name_ids, self._type_ids, self._keycode_ids = (
+            np.concatenate((column[:first], new, column[first:]))
+            for column, new in zip((self._name_ids, self._type_ids, self._keycode_ids), new_columns)
+        )
+        self._splice_name_rows(first, 0, count, new_columns[0], new_columns[0])
+
+    def _on_remove(self, first, count):
+        end = first + count
+        old_name_ids = self._name_ids[first:end]
+        self._name_ids, self._type_ids, self._keycode_ids = (
+            np.concatenate((column[:first], column[end:]))
+            for column in (self._name_ids, self._type_ids, self._keycode_ids)
+        )
+        self._splice_name_rows(first, count, 0, old_name_ids)
+        self.names.release_many(old_name_ids)
+
+    def _on_update(self, first, count):
+        end = first + count
+        old_name_ids = self._name_ids[first:end].copy()
+        # 先引用新名称再释放旧名称，名称未变的行不会被移出词表
+        name_ids, self._type_ids[first:end], self._keycode_ids[first:end] = self._read_rows(first, count)
+        self._name_ids[first:end] = name_ids
+        renamed = old_name_ids != name_ids
+        if renamed.any():
+            self._splice_name_rows(first, count, count,
+                                   np.concatenate((old_name_ids[renamed], name_ids[renamed])), name_ids)
+        self.names.release_many(old_name_ids)
+
+    def on_store_changed(self, change, first, count):
+        """事件存储变更回调"""
+        if change == CHANGE_INSERT:
+            self._on_insert(first, count)
+        elif change == CHANGE_REMOVE:
+            self._on_remove(first, count)
+        elif change == CHANGE_UPDATE:
+            if count > 0:
+                self._on_update(first, count)
+        elif change == CHANGE_RESET:
+            self.rebuild()
+
+    # -------------------------------------------------------------------------
+    # 查询
+    # -------------------------------------------------------------------------
+
+    def _ids(self, column, rows):
+        return column if rows is None else column[rows]
+
+    def _name_groups(self):
+        """各名称的行号，第一次使用时由名称编号列建立"""
+        if self._name_rows is None:
+            self._name_rows = RowGroups()
+            name_ids = self._name_ids
+            order = np.argsort(name_ids, kind='stable')
+            starts = np.flatnonzero(np.diff(name_ids[order])) + 1
+            for group in np.split(order, starts) if len(order) else ():
+                self._name_rows.set(int(name_ids[group[0]]), group)
+        return self._name_rows
+
+    def name_mask(self, text, rows=None):
+        """事件名称包含 text（不区分大小写）的行掩码
+
+        先求三元组倒排列表的交集得到命中的名称：只计算部分行时按名称编号查表；
+        计算全部行时把命中名称的行号写入掩码，代价与命中行数成正比，不扫描名称编号列。
+
+        Args:
+            text: 搜索文本
+            rows: 只计算这些行（升序行号数组），None表示全部行
+
+        Returns:
+            numpy.ndarray: 与 rows（或全部行）一一对应的布尔掩码
+        """
+        name_ids = self.names.matching_ids(text.lower())
+        if rows is not None:
+            return _lookup_mask(self._name_ids[rows], name_ids, len(self.names))
+        mask = np.zeros(len(self._name_ids), dtype=bool)
+        if name_ids:
+            groups = self._name_groups()
+            for name_id in name_ids:
+                mask[groups.rows(name_id)] = True
+        return mask
+
+    def type_text_mask(self, text, rows=None):
+        """事件类型名包含 text（不区分大小写）的行掩码"""
+        text = text.lower()
+        type_ids = [type_id for key, type_id in self._type_index.items()
+                    if text in type_str_from_codes(*divmod(key, _TYPE_KEY_STRIDE)).lower()]
+        return _lookup_mask(self._ids(self._type_ids, rows), type_ids, len(self._type_index))
+
+    def keycode_text_mask(self, text, rows=None):
+        """键码文本包含 text 的行掩码"""
+        keycode_ids = [keycode_id for keycode, keycode_id in self._keycode_index.items()
+                       if text in ("" if keycode == NO_KEYCODE else str(keycode))]
+        return _lookup_mask(self._ids(self._keycode_ids, rows), keycode_ids, len(self._keycode_index))
+
+    def text_mask(self, text, rows=None):
+        """名称、类型名或键码文本包含 text 的行掩码（与旧版搜索框的匹配规则一致）"""
+        text = text.lower()
+        return self.name_mask(text, rows) | self.type_text_mask(text, rows) | self.keycode_text_mask(text, rows)
+
+    def type_mask(self, type_str, rows=None):
+        """事件类型名等于 type_str 的行掩码"""
+        type_ids = [type_id for key, type_id in self._type_index.items()
+                    if type_str_from_codes(*divmod(key, _TYPE_KEY_STRIDE)) == type_str]
+        return _lookup_mask(self._ids(self._type_ids, rows), type_ids, len(self._type_index))
+
+
+# =============================================================================
+# 统计
+# =============================================================================
+
+def estimate_total_time(single_loop_ms, loop_count, interval, time_unit):
+    """计算预计总时间：单次循环时间 * 循环次数 + 间隔时间 * (循环次数 - 1)
+
+    Args:
+        single_loop_ms: 单次循环时间（毫秒）
+        loop_count: 循环次数
+        interval: 循环间隔
+        time_unit: 间隔单位（ms、s、min）
+
+    Returns:
+        float: 预计总时间（毫秒）
+    """
+    if time_unit == "s":
+        interval_ms = interval * 1000
+    elif time_unit == "min":
+        interval_ms = interval * 60000
+    else:  # ms
+        interval_ms = interval
+    return single_loop_ms * loop_count + interval_ms * (loop_count - 1)
+
+
+class EventStatistics:
+    """事件统计聚合
+
+    累计保存每种类型码的事件数和全部相对时间之和：
+    插入时加上新行，删除和修改前（前置监听器）减去旧行、修改后加上新行，
+    只有重置（打开文件、排序等）才整体重新统计。
+    单次循环时间 = 时间原点 + 相对时间之和，不需要计算绝对时间。
+
+    version 在每次变化后递增，snapshot() 按版本缓存，未变化时直接返回上一次的快照。
+    """
+
+    def __init__(self, event_store, attach=True):
+        """初始化事件统计
+
+        Args:
+            event_store: 事件存储实例
+            attach: 是否注册为事件存储的监听器，随存储变更自动更新
+        """
+        self.event_store = event_store
+        self.version = 0
+        self._type_counts = np.zeros(256, dtype=np.int64)  # 类型码（按无符号字节） -> 事件数
+        self._rel_time_sum = 0
+        self._row_count = 0
+        self._snapshot = None
+        self.rebuild()
+        if attach:
+            event_store.add_pre_listener(self.on_store_about_to_change)
+            event_store.add_listener(self.on_store_changed)
+
+    def detach(self):
+        """停止跟踪事件存储"""
+        self.event_store.remove_pre_listener(self.on_store_about_to_change)
+        self.event_store.remove_listener(self.on_store_changed)
+
+    # -------------------------------------------------------------------------
+    # 聚合维护
+    # -------------------------------------------------------------------------
+
+    def _accumulate(self, first, count, sign):
+        """把一段行计入（sign=1）或移出（sign=-1）累计值"""
+        if count <= 0:
+            return
+        store = self.event_store
+        end = first + count
+        types = np.frombuffer(store.types[first:end], dtype=np.uint8)
+        rel_times = np.frombuffer(store.rel_times[first:end], dtype=np.int64)
+        self._type_counts += sign * np.bincount(types, minlength=256)
+        self._rel_time_sum += sign * int(rel_times.sum())
+        self._row_count += sign * count
+
+    def rebuild(self):
+        """从事件存储完整重新统计"""
+        self._type_counts[:] = 0
+        self._rel_time_sum = 0
+        self._row_count = 0
+        self._accumulate(0, self.event_store.row_count(), 1)
+        self._changed()
+
+    def _changed(self):
+        self.version += 1
+        self._snapshot = None
+
+    def on_store_about_to_change(self, change, first, count):
+        """事件存储变更前回调，移出即将删除或修改的行"""
+        if change in (CHANGE_REMOVE, CHANGE_UPDATE):
+            self._accumulate(first, count, -1)
+
+    def on_store_changed(self, change, first, count):
+        """事件存储变更回调"""
+        if change in (CHANGE_INSERT, CHANGE_UPDATE):
+            self._accumulate(first, count, 1)
+        elif change == CHANGE_RESET:
+            self.rebuild()
+            return
+        elif change == CHANGE_TIMES and first != 0:
+            # 后续事件整体平移不改变任何累计值
+            return
+        self._changed()
+
+    # -------------------------------------------------------------------------
+    # 查询
+    # -------------------------------------------------------------------------
+
+    def single_loop_time(self):
+        """单次循环时间（最后一个事件的绝对时间，不小于0）"""
+        if not self._row_count:
+            return 0
+        return max(0, self.event_store.time_origin + self._rel_time_sum)
+
+    def snapshot(self):
+        """当前统计快照
+
+        Returns:
+            dict: version、event_count、key_press、key_release、mouse_move（含滚轮）、
+                mouse_click、single_loop_time、avg_interval、density（事件/秒）
+        """
+        if self._snapshot is None:
+            counts = self._type_counts
+            row_count = self._row_count
+            single_loop_time = self.single_loop_time()
+            self._snapshot = {
+                'version': self.version,
+                'event_count': row_count,
+                'key_press': int(counts[0]),
+                'key_release': int(counts[1]),
+                'mouse_move': int(counts[2] + counts[6]),
+                'mouse_click': int(counts[4] + counts[5]),
+                'single_loop_time': single_loop_time,
+                'avg_interval': single_loop_time / (row_count - 1) if row_count > 1 else 0,
+                'density': row_count / (single_loop_time / 1000) if single_loop_time > 0 else 0
+            }
+        return self._snapshot
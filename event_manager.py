@@ -2,18 +2,26 @@
 import os
 import json
 from datetime import datetime
+import numpy as np
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, 
-                            QLineEdit, QComboBox, QPushButton, QTableWidgetItem,
+                            QLineEdit, QComboBox, QPushButton,
                             QFrame, QGroupBox, QGridLayout, QScrollArea, QTextEdit,
                             QListView, QFileDialog, QTextBrowser, QSpinBox, QMenu,
                             QDialog)
-from PyQt6.QtCore import Qt, QTimer, QDateTime, QUrl, pyqtSignal, QPoint, QThread
+from PyQt6.QtCore import Qt, QTimer, QDateTime, QUrl, QPoint
 from PyQt6.QtGui import (QFont, QPalette, QColor, QIcon, QPixmap, QPainter, QPen, QCursor,
                         QKeyEvent, QDesktopServices, QIntValidator, QAction, QFontDatabase)
 
 # 导入共享模块
 from styles import UnifiedStyleHelper, ChineseMessageBox, ModernGroupBox, ModernLineEdit, ModernComboBox, ModernDoubleSpinBox
-from utils import VK_MAPPING, KEY_NAME_MAPPING, EVENT_TYPE_MAP, generate_key_event_name, SORT_TIP_TEXT, get_event_data_from_table
+from utils import VK_MAPPING, KEY_NAME_MAPPING, EVENT_TYPE_MAP, SORT_TIP_TEXT
+from event_store import (EventStore, record_from_strings, absolute_time_order,
+                         CHANGE_INSERT, CHANGE_REMOVE, CHANGE_UPDATE, CHANGE_TIMES, CHANGE_RESET)
+from event_index import PairingIndex, SearchIndex, EventStatistics
+from event_query import EventQuery, QueryContext, QueryError, ALL_EVENT_TYPES
+from event_table_model import EventTableModel
+from refresh_scheduler import REFRESH_SEARCH, REFRESH_STATS
+from task_executor import SORT_TASK, BATCH_EDIT_TASK, PRIORITY_INTERACTIVE
 from event_dialogs import EventEditDialog, PasteOptionsDialog, DeleteOptionsDialog
 from debug_tools import get_global_debug_logger
 
@@ -21,213 +29,43 @@ from debug_tools import get_global_debug_logger
 # 常量定义
 # =============================================================================
 
+# 输入停止多久后开始实时搜索（毫秒）
+SEARCH_DEBOUNCE_MS = 250
+
+# 实时搜索每次处理的行数，处理完一块后让出事件循环，以便新的输入取消旧搜索
+SEARCH_CHUNK_ROWS = 262144
 
 
 # =============================================================================
-# 线程类定义
+# 后台任务（在任务执行器的线程池中执行，只读取事件快照）
 # =============================================================================
 
-class SortEventsThread(QThread):
-    """事件排序线程类，负责在后台对事件进行排序"""
-    
-    # 信号定义
-    sort_complete = pyqtSignal(list)  # 排序完成信号
-    sort_failed = pyqtSignal(str)  # 排序失败信号
+def sort_order_task(task, snapshot):
+    """计算按绝对时间排序后的行号顺序，由主线程按该顺序重排事件存储
     
-    def __init__(self, events_table):
-        super().__init__()
-        self.events_table = events_table
-        self.debug_logger = get_global_debug_logger()
+    Args:
+        task: 任务句柄
+        snapshot: 在主线程拍摄的事件快照（EventSnapshot）
     
-    def run(self):
-        """线程运行方法，执行事件排序逻辑"""
-        try:
-            # 获取所有事件数据
-            events = []
-            for row in range(self.events_table.rowCount()):
-                event_data = []
-                for col in range(self.events_table.columnCount()):
-                    item = self.events_table.item(row, col)
-                    event_data.append(item.text() if item else "")
-                events.append(event_data)
-            
-            # 按绝对时间排序
-            events.sort(key=lambda x: int(x[7]) if x[7].isdigit() else 0)
-            
-            # 重新计算相对时间
-            prev_absolute_time = 0
-            for i, event in enumerate(events):
-                # 获取当前事件的绝对时间
-                current_absolute_time = int(event[7]) if event[7].isdigit() else 0
-                
-                # 计算新的相对时间
-                relative_time = current_absolute_time - prev_absolute_time
-                
-                # 更新事件数据
-                event[0] = str(i + 1)  # 更新行号
-                event[6] = str(relative_time)  # 更新相对时间
-                
-                # 更新前一个绝对时间为当前绝对时间
-                prev_absolute_time = current_absolute_time
-            
-            # 发送排序完成信号
-            self.sort_complete.emit(events)
-            
-        except Exception as e:
-            error_msg = f"排序事件失败: {str(e)}"
-            self.sort_failed.emit(error_msg)
-
-
-class BatchEditThread(QThread):
-    """批量编辑线程类，负责在后台对事件进行批量编辑"""
-    
-    # 信号定义
-    edit_complete = pyqtSignal(list, int, object, object, int, int, bool)  # 编辑完成信号，添加应用标志
-    edit_failed = pyqtSignal(str)  # 排序失败信号编辑失败信号
-    
-    def __init__(self, events_table, selected_row_indices, offset, unified_rel_time, old_type_info, new_type_info, unified_x, unified_y, apply_coords):
-        super().__init__()
-        self.events_table = events_table
-        self.selected_row_indices = selected_row_indices
-        self.offset = offset
-        self.unified_rel_time = unified_rel_time
-        self.old_type_info = old_type_info
-        self.new_type_info = new_type_info
-        self.unified_x = unified_x
-        self.unified_y = unified_y
-        self.apply_coords = apply_coords
-        self.debug_logger = get_global_debug_logger()
-    
-    def run(self):
-        """线程运行方法，执行批量编辑逻辑"""
-        try:
-            # 获取需要调整的行索引
-            rows_to_adjust = []
-            
-            # 处理每个选中的事件
-            for row_idx in self.selected_row_indices:
-                # 1. 处理增减偏移时间
-                if self.offset != 0:
-                    # 获取当前行的绝对偏移时间
-                    abs_time_item = self.events_table.item(row_idx, 7)
-                    if abs_time_item:
-                        abs_time = int(abs_time_item.text()) if abs_time_item.text().isdigit() else 0
-                        new_abs_time = abs_time + self.offset
-                        
-                        # 添加到需要调整的行列表
-                        rows_to_adjust.append(row_idx)
-                
-                # 2. 处理事件类型替换
-                if self.old_type_info and self.new_type_info:
-                    old_type, old_keycode = self.old_type_info
-                    new_type, new_keycode = self.new_type_info
-                    
-                    type_item = self.events_table.item(row_idx, 2)
-                    if type_item:
-                        current_event_type = type_item.text()
-                        
-                        # 匹配逻辑
-                        match = False
-                        if old_keycode:
-                            # 具体按键事件匹配
-                            keycode_item = self.events_table.item(row_idx, 3)
-                            current_keycode = keycode_item.text() if keycode_item else ""
-                            match = (current_event_type == old_type) and (current_keycode == old_keycode)
-                        else:
-                            # 基本类型匹配
-                            match = (current_event_type == old_type)
-                        
-                        if match:
-                            # 添加到需要调整的行列表
-                            rows_to_adjust.append(row_idx)
-            
-            # 3. 处理统一相对时间
-            if self.unified_rel_time > 0:
-                # 添加所有选中行到需要调整的行列表
-                rows_to_adjust.extend(self.selected_row_indices)
-            
-            # 4. 处理统一坐标
-            # 只要设置了应用标志，就需要调整所有选中行
-            if self.apply_coords:
-                rows_to_adjust.extend(self.selected_row_indices)
-            
-            # 去重并排序
-            rows_to_adjust = sorted(list(set(rows_to_adjust)))
-            
-            # 发送编辑完成信号
-            self.edit_complete.emit(
-                rows_to_adjust,
-                self.offset,
-                self.old_type_info,
-                self.new_type_info,
-                self.unified_x,
-                self.unified_y,
-                self.apply_coords
-            )
-            
-        except Exception as e:
-            error_msg = f"批量编辑事件失败: {str(e)}"
-            self.edit_failed.emit(error_msg)
+    Returns:
+        tuple: (排序后各位置对应的原行号数组, 快照版本号)
+    """
+    return absolute_time_order(snapshot.absolute_times()), snapshot.version
 
 
-class SearchFilterThread(QThread):
-    """搜索过滤线程类，负责在后台对事件进行搜索过滤"""
+def batch_edit_task(task, snapshot, batch_edit, rows):
+    """计算批量编辑后各列的新数据，由主线程一次写入事件存储
     
-    # 信号定义
-    filter_complete = pyqtSignal(list, list)  # 过滤完成信号
-    filter_failed = pyqtSignal(str)  # 过滤失败信号
+    Args:
+        task: 任务句柄
+        snapshot: 在主线程拍摄的事件快照（EventSnapshot）
+        batch_edit: 批量编辑参数（BatchEdit）
+        rows: 选中的存储行号（升序 int64 数组）
     
-    def __init__(self, events_table, search_text, filter_type):
-        super().__init__()
-        self.events_table = events_table
-        self.search_text = search_text.lower()
-        self.filter_type = filter_type
-        self.debug_logger = get_global_debug_logger()
-    
-    def run(self):
-        """线程运行方法，执行搜索过滤逻辑"""
-        try:
-            show_rows = []
-            hide_rows = []
-            
-            # 遍历所有行，根据条件隐藏或显示
-            for row in range(self.events_table.rowCount()):
-                # 获取当前行的事件类型
-                type_item = self.events_table.item(row, 2)
-                event_type = type_item.text() if type_item else ""
-                
-                # 获取当前行的事件名称
-                name_item = self.events_table.item(row, 1)
-                event_name = name_item.text().lower() if name_item else ""
-                
-                # 获取当前行的键码
-                keycode_item = self.events_table.item(row, 3)
-                key_code = keycode_item.text().lower() if keycode_item else ""
-                
-                # 搜索条件匹配
-                matches_search = True
-                if self.search_text:
-                    if self.search_text not in event_name and self.search_text not in event_type.lower() and self.search_text not in key_code:
-                        matches_search = False
-                
-                # 类型过滤匹配
-                matches_type = True
-                if self.filter_type != "全部事件类型":
-                    if event_type != self.filter_type:
-                        matches_type = False
-                
-                # 根据匹配结果添加到相应列表
-                if matches_search and matches_type:
-                    show_rows.append(row)
-                else:
-                    hide_rows.append(row)
-            
-            # 发送过滤完成信号
-            self.filter_complete.emit(show_rows, hide_rows)
-            
-        except Exception as e:
-            error_msg = f"搜索过滤事件失败: {str(e)}"
-            self.filter_failed.emit(error_msg)
+    Returns:
+        BatchEditResult: 计算结果（包含快照版本号）
+    """
+    return batch_edit.compute(snapshot, rows, task)
 
 
 # =============================================================================
@@ -256,11 +94,33 @@ class EventManager:
         self.main_window = main_window
         self.debug_logger = get_global_debug_logger()
         self.events_table = None
-        
-        # 线程实例，用于处理耗时操作
-        self.sort_events_thread = None
-        self.batch_edit_thread = None
-        self.search_filter_thread = None
+        # 界面刷新调度器：统计信息等在下一轮事件循环中合并刷新
+        self.refresh_scheduler = getattr(main_window, 'refresh_scheduler', None)
+        
+        # 事件数据存储，事件表格只是它的视图
+        self.event_store = EventStore()
+        self.event_store.add_listener(self.on_store_changed)
+        self.events_table_model = None
+        
+        # 成对性索引和搜索索引，随事件存储的每次修改增量更新
+        self.pairing_index = PairingIndex(self.event_store)
+        self.search_index = SearchIndex(self.event_store)
+        # 事件统计累计值，统计面板读取时不需要遍历事件
+        self.event_stats = EventStatistics(self.event_store)
+        
+        # 当前生效的搜索查询，None表示未过滤
+        self.active_query = None
+        
+        # 实时搜索：防抖定时器、搜索代次（只应用最新一次搜索的结果）和上一次的结果
+        self.search_debounce_timer = None
+        self.search_generation = 0
+        self.search_running = False  # 分块搜索尚未完成
+        self.last_search_result = None  # (查询, 命中行号, 事件存储版本)
+        # 修改后生效的查询需要重新求值的存储行范围 [(起, 止), ...]，按后续插入删除平移
+        self.search_dirty_ranges = []
+        
+        # 任务执行器：排序、批量编辑等耗时计算在共享线程池中执行
+        self.task_executor = getattr(main_window, 'task_executor', None)
         
     def create_event_editor(self, parent=None):
         """创建事件编辑器组件
@@ -321,12 +181,17 @@ class EventManager:
         
         # 搜索输入框
         self.search_input = ModernLineEdit()
-        self.search_input.setPlaceholderText("按事件名称、类型、键码搜索...")
+        self.search_input.setPlaceholderText("按事件名称、类型、键码搜索，或输入条件如 type:按键按下 key:13 time:1000..5000 x>500")
+        self.search_input.setToolTip(
+            "普通文本匹配事件名称、类型或键码；\n"
+            "条件：name: type: type= key: x y rel time row，支持 : = != > >= < <=，\n"
+            "范围写作 time:1000..5000，多个值写作 key:13,65，条件前加 - 表示取反"
+        )
         search_layout.addWidget(self.search_input)
         
         # 事件类型过滤
         self.filter_type_combo = ModernComboBox(width=150)
-        self.filter_type_combo.addItem("全部事件类型")
+        self.filter_type_combo.addItem(ALL_EVENT_TYPES)
         self.filter_type_combo.addItems(["按键按下", "按键释放", "鼠标移动", "左键按下", "左键释放", "右键按下", "右键释放", "中键按下", "中键释放", "鼠标滚轮"])
         search_layout.addWidget(self.filter_type_combo)
         
@@ -346,9 +211,18 @@ class EventManager:
         
         parent_layout.addWidget(search_container)
         
+        # 实时搜索防抖定时器
+        self.search_debounce_timer = QTimer(search_container)
+        self.search_debounce_timer.setSingleShot(True)
+        self.search_debounce_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.search_debounce_timer.timeout.connect(self.on_live_search)
+        
         # 连接信号
         search_btn.clicked.connect(self.on_search_filter_changed)
         reset_btn.clicked.connect(self.on_reset_search_filter)
+        # 输入或切换类型时实时搜索
+        self.search_input.textChanged.connect(self.search_debounce_timer.start)
+        self.filter_type_combo.currentTextChanged.connect(self.search_debounce_timer.start)
         # 为搜索输入框添加回车键支持
         self.search_input.returnPressed.connect(self.on_search_filter_changed)
         # 为过滤类型下拉框添加焦点事件，允许用户按回车键触发搜索
@@ -364,10 +238,17 @@ class EventManager:
             parent_layout: 父布局，用于放置事件表格
         """
         # 创建表格
-        from main_window import ModernTableWidget
-        self.events_table = ModernTableWidget(0, 8)  # 8列：行号 + 原有7列
-        headers = ["序号", "事件名称", "事件类型", "键码", "X坐标", "Y坐标", "相对偏移时间", "绝对偏移时间"]
-        self.events_table.setHorizontalHeaderLabels(headers)
+        from main_window import ModernTableView
+        self.events_table = ModernTableView()
+        
+        # 搜索过滤先于表格刷新，重新过滤后表格只需刷新一次
+        if self.refresh_scheduler is not None:
+            self.refresh_scheduler.register(REFRESH_SEARCH, self.refresh_search_results)
+        
+        # 虚拟化模型：8列（行号 + 原有7列），显示文本按需生成
+        self.events_table_model = EventTableModel(self.event_store, self.events_table, self.pairing_index,
+                                                  self.refresh_scheduler)
+        self.events_table.setModel(self.events_table_model)
         
         # 优化列宽分配
         self.events_table.setColumnWidth(0, 50)   # 序号
@@ -505,33 +386,187 @@ class EventManager:
         context_menu.exec(self.events_table.viewport().mapToGlobal(position))
     
     def on_search_filter_changed(self):
-        """搜索过滤条件改变时调用"""
-        search_text = self.search_input.text().lower()
+        """立即按当前条件搜索（搜索按钮、回车键）"""
+        self.run_search(show_errors=True)
+    
+    def on_live_search(self):
+        """输入停止后的实时搜索，条件尚未输入完整时不弹出错误提示"""
+        self.run_search(show_errors=False)
+    
+    def run_search(self, show_errors):
+        """解析搜索条件并开始搜索
+        
+        Args:
+            show_errors: 条件有误时是否弹窗提示，否则只在状态栏显示
+        """
+        self.search_debounce_timer.stop()
+        search_text = self.search_input.text()
         filter_type = self.filter_type_combo.currentText()
         
-        # 创建并启动搜索过滤线程
-        self.search_filter_thread = SearchFilterThread(self.events_table, search_text, filter_type)
-        self.search_filter_thread.filter_complete.connect(self.on_search_filter_complete)
-        self.search_filter_thread.filter_failed.connect(self.on_search_filter_failed)
-        self.search_filter_thread.start()
+        try:
+            query = EventQuery(search_text, filter_type)
+        except QueryError as e:
+            if show_errors:
+                ChineseMessageBox.show_warning(self.main_window, "查询条件有误", str(e))
+            else:
+                self.main_window.status_bar.showMessage(f"⚠️ {e}")
+            return
+        
+        self.start_search(query)
     
-    def on_search_filter_complete(self, show_rows, hide_rows):
-        """搜索过滤完成回调"""
-        # 批量更新优化：禁用中间重绘
-        self.events_table.setUpdatesEnabled(False)
+    def start_search(self, query):
+        """开始一次搜索，之前尚未完成的搜索随之作废
+        
+        查询在事件存储未修改的前提下细化了上一次的查询时（例如在搜索框中继续输入），
+        只在上一次的命中行中筛选。较大的表格分块求值，每块之间让出事件循环。
+        
+        Args:
+            query: 编译后的查询
+        """
+        self.search_generation += 1
+        generation = self.search_generation
+        # 整体搜索会覆盖所有行，等待中的部分重新过滤不再需要
+        self.search_dirty_ranges = []
+        
+        if query.is_empty():
+            self.search_running = False
+            self.apply_search_result(None, None)
+            return
+        
+        self.search_running = True
+        candidates = None
+        last = self.last_search_result
+        if last is not None and last[2] == self.event_store.version and query.narrows(last[0]):
+            candidates = last[1]
+        
+        context = QueryContext(self.event_store, self.search_index)
+        total = context.row_count if candidates is None else len(candidates)
+        self.continue_search(generation, query, context, candidates, total, 0, [])
+    
+    def continue_search(self, generation, query, context, candidates, total, position, hits):
+        """处理搜索的下一块候选行"""
+        # 已有更新的搜索：放弃本次搜索
+        if generation != self.search_generation:
+            return
+        # 搜索期间事件被修改：按新数据重新搜索
+        if not context.is_current():
+            self.last_search_result = None
+            self.start_search(query)
+            return
         
         try:
-            # 遍历所有行，根据条件隐藏或显示
-            for row in range(self.events_table.rowCount()):
-                # 根据匹配结果隐藏或显示行
-                should_show = row in show_rows
-                self.events_table.setRowHidden(row, not should_show)
+            end = min(position + SEARCH_CHUNK_ROWS, total)
+            if candidates is None:
+                chunk = np.arange(position, end, dtype=np.int64) if position > 0 or end < total else None
+            else:
+                chunk = candidates[position:end]
+            mask = query.evaluate(context, chunk)
+            hits.append(np.flatnonzero(mask) if chunk is None else chunk[mask])
+        except Exception as e:
+            self.search_running = False
+            self.on_search_filter_failed(f"搜索过滤事件失败: {str(e)}")
+            return
+        
+        if end < total:
+            QTimer.singleShot(0, lambda: self.continue_search(generation, query, context, candidates, total, end, hits))
+            return
+        
+        self.search_running = False
+        rows = np.concatenate(hits) if hits else np.empty(0, dtype=np.int64)
+        self.last_search_result = (query, rows, context.version)
+        self.apply_search_result(query, rows)
+    
+    def apply_search_result(self, query, rows):
+        """把搜索结果应用到事件表格
+        
+        Args:
+            query: 生效的查询，None表示清除过滤
+            rows: 命中的行号数组
+        """
+        try:
+            if query is not None and query is self.active_query:
+                # 重新过滤的结果与当前显示相同时保留视图状态（选中行、滚动位置）
+                visible = self.events_table_model.visible_rows()
+                if visible is not None and np.array_equal(visible, rows):
+                    return
+            self.active_query = query
+            if query is None:
+                self.events_table_model.set_row_filter(None)
+            else:
+                # 事件存储整体重置后模型会用同样的查询重新过滤
+                self.events_table_model.set_row_filter(
+                    lambda: query.rows(self.event_store, self.search_index),
+                    rows
+                )
             
             # 更新统计信息
             self.update_stats()
-        finally:
-            # 确保重新启用重绘
-            self.events_table.setUpdatesEnabled(True)
+        except Exception as e:
+            self.on_search_filter_failed(f"搜索过滤事件失败: {str(e)}")
+    
+    def mark_search_dirty(self, change, first, count):
+        """记录一次修改后生效的查询需要重新求值的存储行范围
+
+        已记录的范围随插入删除平移，始终对应当前的行号。
+
+        Returns:
+            bool: 是否有需要重新求值的行
+        """
+        ranges = self.search_dirty_ranges
+        row_count = self.event_store.row_count()
+        positional = self.active_query.depends_on_position()
+        if change == CHANGE_INSERT:
+            ranges[:] = [(start + count if start >= first else start, end + count if end > first else end)
+                         for start, end in ranges]
+            ranges.append((first, row_count if positional else first + count))
+        elif change == CHANGE_REMOVE:
+            def shift(row):
+                return row if row <= first else max(first, row - count)
+            ranges[:] = [(shift(start), shift(end)) for start, end in ranges if shift(start) < shift(end)]
+            if positional and first < row_count:
+                ranges.append((first, row_count))
+        elif change == CHANGE_UPDATE or (change == CHANGE_TIMES and self.active_query.depends_on_time()):
+            if count > 0:
+                ranges.append((first, first + count))
+        return bool(ranges)
+
+    def refresh_search_results(self):
+        """事件修改后按生效的查询重新过滤（由刷新调度器每轮事件循环最多调用一次）
+
+        只对修改涉及的行重新求值，表格中其余行的可见性、选中状态和滚动位置保持不变。
+        """
+        ranges, self.search_dirty_ranges = self.search_dirty_ranges, []
+        # 进行中的搜索（可能是新输入的查询）发现数据已修改时会自行重新搜索
+        if self.search_running or self.active_query is None or not ranges:
+            return
+        rows = np.unique(np.concatenate([np.arange(start, end, dtype=np.int64) for start, end in ranges]))
+        if len(rows) * 2 > self.event_store.row_count():
+            # 大部分行都要重新求值时分块搜索，避免长时间阻塞界面
+            self.start_search(self.active_query)
+            return
+        
+        query = self.active_query
+        try:
+            context = QueryContext(self.event_store, self.search_index)
+            hits = rows[query.evaluate(context, rows)]
+            self.events_table_model.refilter_rows(rows, hits)
+        except Exception as e:
+            self.on_search_filter_failed(f"搜索过滤事件失败: {str(e)}")
+            return
+        self.last_search_result = (query, self.events_table_model.visible_rows(), context.version)
+    
+    def current_query_rows(self):
+        """当前搜索查询命中的行号，未过滤时返回None
+        
+        Returns:
+            numpy.ndarray: 升序行号数组，可供批量编辑、时间分析等功能复用
+        """
+        if self.active_query is None:
+            return None
+        last = self.last_search_result
+        if last is not None and last[0] is self.active_query and last[2] == self.event_store.version:
+            return last[1]
+        return self.active_query.rows(self.event_store, self.search_index)
     
     def on_search_filter_failed(self, error_msg):
         """搜索过滤失败回调"""
@@ -551,23 +586,21 @@ class EventManager:
     
     def on_reset_search_filter(self):
         """重置搜索过滤条件"""
-        # 批量更新优化：禁用中间重绘
-        self.events_table.setUpdatesEnabled(False)
-        
-        try:
-            # 显示所有行
-            for row in range(self.events_table.rowCount()):
-                self.events_table.setRowHidden(row, False)
-            
-            # 清空搜索输入和过滤类型
-            self.search_input.clear()
-            self.filter_type_combo.setCurrentIndex(0)
-            
-            # 更新统计信息
-            self.update_stats()
-        finally:
-            # 确保重新启用重绘
-            self.events_table.setUpdatesEnabled(True)
+        # 清空搜索输入和过滤类型
+        self.search_input.clear()
+        self.filter_type_combo.setCurrentIndex(0)
+        
+        # 作废进行中的搜索和清空输入触发的实时搜索，显示所有行
+        self.search_debounce_timer.stop()
+        self.search_generation += 1
+        self.search_running = False
+        self.last_search_result = None
+        self.search_dirty_ranges = []
+        self.active_query = None
+        self.events_table_model.set_row_filter(None)
+        
+        # 更新统计信息
+        self.update_stats()
         
         # 显示状态消息
         self.main_window.status_bar.showMessage("✅ 搜索过滤已重置")
@@ -575,9 +608,9 @@ class EventManager:
     
     def on_batch_edit(self):
         """批量编辑事件"""
-        # 获取选中的行
-        selected_rows = self.get_selected_event_rows()
-        if not selected_rows:
+        # 获取选中事件的存储行号
+        selected_rows = self.get_selected_store_rows()
+        if not len(selected_rows):
             ChineseMessageBox.show_info(self.main_window, "提示", "请先选择要编辑的事件")
             return
         
@@ -586,159 +619,56 @@ class EventManager:
         
         # 打开批量编辑对话框
         from main_window import BatchEditDialog
-        dialog = BatchEditDialog(self.main_window, selected_rows, self.events_table)
+        dialog = BatchEditDialog(self.main_window, selected_rows, self.event_store)
         if dialog.exec() == QDialog.DialogCode.Accepted:
             # 应用批量编辑
             self.apply_batch_edit(dialog)
-            
-            # 更新统计信息
-            self.update_stats()
-            
-            # 记录操作
-            self.debug_logger.log_info(f"已批量编辑 {len(selected_rows)} 个事件")
     
     def apply_batch_edit(self, dialog):
         """应用批量编辑"""
-        # 获取编辑参数
-        offset = dialog.get_offset_adjustment()
-        unified_rel_time = dialog.get_unified_rel_time()
-        old_type_info, new_type_info = dialog.get_type_replacement()
-        apply_coords, unified_x, unified_y = dialog.get_unified_coordinates()
-        
-        # 获取选中的行索引
-        selected_row_indices = [row.row() for row in self.selected_rows]
-        selected_row_indices.sort()  # 从小到大排序
+        # 获取编辑参数（对话框确认时已检查过表达式）
+        batch_edit = dialog.get_batch_edit()
+        if batch_edit.is_empty():
+            return
         
         # 保存当前状态到撤销栈
         self.main_window.save_state_to_undo_stack()
         
-        # 创建并启动批量编辑线程
-        self.batch_edit_thread = BatchEditThread(
-            self.events_table,
-            selected_row_indices,
-            offset,
-            unified_rel_time,
-            old_type_info,
-            new_type_info,
-            unified_x,
-            unified_y,
-            apply_coords
+        # 在任务执行器中计算各列的新数据
+        self.task_executor.submit(
+            BATCH_EDIT_TASK,
+            batch_edit_task,
+            self.event_store.snapshot(),
+            batch_edit,
+            self.selected_rows,
+            priority=PRIORITY_INTERACTIVE,
+            on_finished=self.on_batch_edit_complete,
+            on_failed=lambda error: self.on_batch_edit_failed(f"批量编辑事件失败: {error}")
         )
-        self.batch_edit_thread.edit_complete.connect(lambda rows, off, old, new, ux, uy, app: self.on_batch_edit_complete(rows, off, old, new, selected_row_indices, unified_rel_time, ux, uy, app))
-        self.batch_edit_thread.edit_failed.connect(self.on_batch_edit_failed)
-        self.batch_edit_thread.start()
     
-    def on_batch_edit_complete(self, rows_to_adjust, offset, old_type_info, new_type_info, selected_row_indices, unified_rel_time, unified_x, unified_y, apply_coords):
-        """批量编辑完成回调"""
+    def on_batch_edit_complete(self, result):
+        """批量编辑完成回调，把计算结果一次写入事件存储"""
         # 开始批量操作
         self.main_window._batch_operation = True
         
         try:
-            # 处理每个选中的事件
-            for row_idx in selected_row_indices:
-                # 1. 处理增减偏移时间
-                if offset != 0:
-                    # 调整绝对偏移时间
-                    abs_time_item = self.events_table.item(row_idx, 7)
-                    if abs_time_item:
-                        abs_time = int(abs_time_item.text()) if abs_time_item.text().isdigit() else 0
-                        new_abs_time = abs_time + offset
-                        abs_time_item.setText(str(new_abs_time))
-                
-                # 2. 处理事件类型替换
-                if old_type_info and new_type_info:
-                    old_type, old_keycode = old_type_info
-                    new_type, new_keycode = new_type_info
-                    
-                    type_item = self.events_table.item(row_idx, 2)
-                    current_event_type = type_item.text() if type_item else ""
-                    
-                    # 匹配逻辑
-                    match = False
-                    if old_keycode:
-                        # 具体按键事件匹配
-                        keycode_item = self.events_table.item(row_idx, 3)
-                        current_keycode = keycode_item.text() if keycode_item else ""
-                        match = (current_event_type == old_type) and (current_keycode == old_keycode)
-                    else:
-                        # 基本类型匹配
-                        match = (current_event_type == old_type)
-                    
-                    if match:
-                        # 更新事件类型
-                        type_item.setText(new_type)
-                        
-                        # 检查是否需要清除键码
-                        keycode_item = self.events_table.item(row_idx, 3)
-                        if keycode_item:
-                            # 鼠标事件类型列表
-                            mouse_event_types = ["鼠标移动", "左键按下", "左键释放", "右键按下", "右键释放", "中键按下", "中键释放", "鼠标滚轮"]
-                            # 按键事件类型列表
-                            key_event_types = ["按键按下", "按键释放"]
-                            
-                            # 如果从按键事件替换为鼠标事件，清除键码
-                            if old_type in key_event_types and new_type in mouse_event_types:
-                                keycode_item.setText("")
-                            # 如果新类型是具体按键事件，更新键码
-                            elif new_keycode:
-                                keycode_item.setText(new_keycode)
-                        
-                        # 更新事件名称
-                        name_item = self.events_table.item(row_idx, 1)
-                        if name_item:
-                            # 获取当前键码
-                            keycode_item = self.events_table.item(row_idx, 3)
-                            current_keycode = keycode_item.text() if keycode_item else ""
-                            # 生成新名称
-                            new_name = generate_key_event_name(new_type, current_keycode)
-                            name_item.setText(new_name)
-                
-                # 3. 处理统一相对时间
-                if unified_rel_time > 0:
-                    # 设置相对时间
-                    rel_time_item = self.events_table.item(row_idx, 6)
-                    rel_time_item.setText(str(unified_rel_time))
-                    
-                    # 根据相对时间重新计算当前事件的绝对时间
-                    if row_idx > 0:
-                        prev_abs_time_item = self.events_table.item(row_idx - 1, 7)
-                        prev_abs_time = int(prev_abs_time_item.text()) if prev_abs_time_item.text().isdigit() else 0
-                    else:
-                        prev_abs_time = 0
-                    
-                    new_abs_time = prev_abs_time + unified_rel_time
-                    abs_time_item = self.events_table.item(row_idx, 7)
-                    abs_time_item.setText(str(new_abs_time))
-                
-                # 4. 处理统一坐标
-                # 使用应用标志判断是否需要应用统一坐标
-                if apply_coords:
-                    # 更新X坐标
-                    x_item = self.events_table.item(row_idx, 4)
-                    if x_item:
-                        x_item.setText(str(unified_x))
-                    
-                    # 更新Y坐标
-                    y_item = self.events_table.item(row_idx, 5)
-                    if y_item:
-                        y_item.setText(str(unified_y))
-            
-            # 4. 根据修改调整后续事件时间
-            if offset != 0 or unified_rel_time > 0:
-                # 重新计算所有事件的相对时间
-                self.recalculate_relative_times()
-            
-            # 清除撤销栈
-            self.main_window.redo_stack.clear()
+            # 计算期间事件被修改：选中的行号可能已指向其他事件，放弃本次编辑
+            if not result.apply(self.event_store):
+                self.on_batch_edit_failed("批量编辑期间事件已被修改，请重新选择事件后再试")
+                return
             
             # 更新统计信息
             self.update_stats()
-            
-            # 立即更新预计总时间
-            self.main_window.on_calculate_total_time()
         finally:
             # 结束批量操作
             self.main_window._batch_operation = False
+        
+        # 标记状态已更改（批量操作结束后才会生效）
+        self.main_window.mark_state_dirty()
+        
+        # 记录操作
+        self.main_window.status_bar.showMessage(f"✅ 已批量编辑 {result.row_count} 个事件")
+        self.debug_logger.log_info(f"已批量编辑 {result.row_count} 个事件")
     
     def on_batch_edit_failed(self, error_msg):
         """批量编辑失败回调"""
@@ -755,75 +685,85 @@ class EventManager:
             [5, "左键释放", "左键释放", "", "500", "500", "600", "1500"]
         ]
         
-        for row_data in sample_data:
-            self.add_table_row(row_data)
+        self.add_table_rows(sample_data)
         
         self.update_stats()
         self.debug_logger.log_info("示例数据已添加")
     
     def add_table_row(self, row_data):
-        """添加表格行"""
-        row_position = self.events_table.rowCount()
-        self.events_table.insertRow(row_position)
-        
-        for col, data in enumerate(row_data):
-            item = QTableWidgetItem(str(data))
-            item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-            self.events_table.setItem(row_position, col, item)
+        """添加表格行（row_data包含行号列）"""
+        self.add_table_rows([row_data])
     
     def add_table_rows(self, rows_data):
-        """批量添加表格行 - 高性能版本"""
+        """批量添加表格行（每行包含行号列） - 高性能版本"""
         if not rows_data:
             return
         
-        # 获取当前行数量
-        current_row_count = self.events_table.rowCount()
-        # 计算新的行数量
-        new_row_count = current_row_count + len(rows_data)
-        
-        # 一次性设置行数量
-        self.events_table.setRowCount(new_row_count)
-        
-        # 填充数据
-        for i, row_data in enumerate(rows_data):
-            row_position = current_row_count + i
-            for col, data in enumerate(row_data):
-                item = QTableWidgetItem(str(data))
-                item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-                self.events_table.setItem(row_position, col, item)
+        # 跳过行号列，一次性追加到事件存储
+        self.event_store.append_rows([record_from_strings(row_data[1:]) for row_data in rows_data])
     
     def update_stats(self):
-        """更新统计信息"""
-        if hasattr(self.main_window, 'stats_panel'):
+        """更新统计信息和预计总时间
+        
+        有刷新调度器时只标记待刷新，同一轮事件循环中的多次调用只刷新一次。
+        """
+        if self.refresh_scheduler is not None:
+            self.refresh_scheduler.invalidate(REFRESH_STATS)
+        elif hasattr(self.main_window, 'stats_panel'):
             self.main_window.stats_panel.update_stats()
     
+    def on_store_changed(self, change, first, count):
+        """事件存储变更回调，任何修改（包括撤销、重做和后台加载）之后都刷新统计信息
+
+        正在过滤时，修改过的事件可能不再（或开始）满足查询，记录涉及的行，
+        合并到下一轮事件循环只对这些行重新过滤；整体重置时表格模型已经按查询重新过滤过。
+        """
+        if self.refresh_scheduler is not None:
+            if (self.active_query is not None and change != CHANGE_RESET and not self.search_running
+                    and self.mark_search_dirty(change, first, count)):
+                self.refresh_scheduler.invalidate(REFRESH_SEARCH, REFRESH_STATS)
+            else:
+                if change == CHANGE_RESET:
+                    # 行号全部失效，表格模型已经按查询重新过滤
+                    self.search_dirty_ranges = []
+                self.refresh_scheduler.invalidate(REFRESH_STATS)
+    
     def sort_events_by_absolute_time(self):
         """按绝对时间对事件进行排序，并重新计算相对时间"""
-        if self.events_table.rowCount() == 0:
+        if self.event_store.row_count() == 0:
             ChineseMessageBox.show_info(self.main_window, "提示", "没有可排序的事件")
             return
         
         # 保存当前状态到撤销栈
         self.main_window.save_state_to_undo_stack()
         
-        # 创建并启动事件排序线程
-        self.sort_events_thread = SortEventsThread(self.events_table)
-        self.sort_events_thread.sort_complete.connect(self.on_sort_complete)
-        self.sort_events_thread.sort_failed.connect(self.on_sort_failed)
-        self.sort_events_thread.start()
+        self.start_sort_task()
+    
+    def start_sort_task(self):
+        """拍摄事件快照并在任务执行器中计算排序，之前尚未完成的排序随之取消"""
+        self.task_executor.submit(
+            SORT_TASK,
+            sort_order_task,
+            self.event_store.snapshot(),
+            priority=PRIORITY_INTERACTIVE,
+            on_finished=lambda result: self.on_sort_complete(*result),
+            on_failed=lambda error: self.on_sort_failed(f"排序事件失败: {error}")
+        )
     
-    def on_sort_complete(self, sorted_events):
+    def on_sort_complete(self, order, version):
         """事件排序完成回调"""
+        # 排序期间事件被修改：排序结果已过期，按新数据重新排序
+        if version != self.event_store.version:
+            self.debug_logger.log_info("排序期间事件已被修改，重新排序")
+            self.start_sort_task()
+            return
+        
         # 开始批量操作
         self.main_window._batch_operation = True
         
         try:
-            # 清空表格
-            self.events_table.setRowCount(0)
-            
-            # 插入排序后的事件
-            for event in sorted_events:
-                self.add_table_row(event)
+            # 按排序结果重排事件存储
+            self.event_store.sort_by_absolute_time(order)
             
             # 更新统计信息
             self.update_stats()
@@ -833,9 +773,6 @@ class EventManager:
             
             self.main_window.status_bar.showMessage("✅ 已按绝对时间排序事件并重新计算相对时间")
             self.debug_logger.log_info("已按绝对时间排序事件并重新计算相对时间")
-            
-            # 立即更新预计总时间
-            self.main_window.on_calculate_total_time()
         finally:
             # 结束批量操作
             self.main_window._batch_operation = False
@@ -845,120 +782,49 @@ class EventManager:
         self.debug_logger.log_error(error_msg)
         ChineseMessageBox.show_error(self.main_window, "错误", error_msg)
     
-    def recalculate_relative_times(self):
-        """重新计算所有事件的相对时间，保持绝对时间不变"""
-        if self.events_table.rowCount() < 2:
-            return
-        
-        # 从第二个事件开始，根据绝对时间计算相对时间
-        for i in range(1, self.events_table.rowCount()):
-            # 获取前一个事件的绝对时间
-            prev_abs_time_item = self.events_table.item(i-1, 7)
-            prev_abs_time = int(prev_abs_time_item.text()) if prev_abs_time_item and prev_abs_time_item.text().isdigit() else 0
-            
-            # 获取当前事件的绝对时间
-            curr_abs_time_item = self.events_table.item(i, 7)
-            curr_abs_time = int(curr_abs_time_item.text()) if curr_abs_time_item and curr_abs_time_item.text().isdigit() else 0
-            
-            # 计算并更新相对时间
-            rel_time = curr_abs_time - prev_abs_time
-            rel_time_item = self.events_table.item(i, 6)
-            rel_time_item.setText(str(rel_time))
-    
-    def recalculate_time_from_row(self, start_row):
-        """从指定行开始重新计算时间"""
-        total_rows = self.events_table.rowCount()
-        if total_rows <= start_row:
-            return
-        
-        # 获取前一个事件的绝对时间
-        prev_abs_time = 0
-        if start_row > 0:
-            prev_abs_time_item = self.events_table.item(start_row - 1, 7)
-            prev_abs_time = int(prev_abs_time_item.text()) if prev_abs_time_item and prev_abs_time_item.text().isdigit() else 0
-        
-        # 重新计算后续事件的绝对时间
-        for i in range(start_row, total_rows):
-            # 获取相对时间
-            rel_time_item = self.events_table.item(i, 6)
-            rel_time = int(rel_time_item.text()) if rel_time_item and rel_time_item.text().isdigit() else 0
-            
-            # 计算并更新绝对时间
-            curr_abs_time = prev_abs_time + rel_time
-            abs_time_item = self.events_table.item(i, 7)
-            abs_time_item.setText(str(curr_abs_time))
-            
-            # 更新前一个绝对时间
-            prev_abs_time = curr_abs_time
-    
     def recalculate_all_times(self):
         """重新计算所有事件的相对时间和绝对时间"""
-        if self.events_table.rowCount() == 0:
-            return
-        
-        # 第一个事件的绝对时间为0
-        first_abs_time_item = self.events_table.item(0, 7)
-        if first_abs_time_item:
-            first_abs_time_item.setText("0")
-        
-        # 从第二个事件开始重新计算
-        self.recalculate_time_from_row(1)
+        self.event_store.recalculate_all_times()
     
     def get_selected_event_rows(self):
         """获取选中的事件行"""
         return self.events_table.selectionModel().selectedRows()
     
-    def update_row_numbers(self):
-        """更新行号"""
-        for row in range(self.events_table.rowCount()):
-            item = self.events_table.item(row, 0)
-            if item:
-                item.setText(str(row + 1))
-            else:
-                item = QTableWidgetItem(str(row + 1))
-                item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-                self.events_table.setItem(row, 0, item)
+    def get_selected_store_rows(self):
+        """获取选中事件在事件存储中的行号（升序 int64 数组）
+
+        按选区的连续范围生成行号，选中大量事件时不需要为每一行创建索引对象。
+        """
+        ranges = [np.arange(selection_range.top(), selection_range.bottom() + 1, dtype=np.int64)
+                  for selection_range in self.events_table.selectionModel().selection()]
+        if not ranges:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(self.events_table_model.store_rows(np.concatenate(ranges)))
+    
+    def store_row(self, index):
+        """将选中行的QModelIndex转换为事件存储中的行号（搜索过滤时两者不同）"""
+        return self.events_table_model.store_row(index.row())
     
     def get_prev_absolute_time(self, current_row):
         """获取当前行前一个事件的绝对时间"""
         if current_row == 0:
             return 0
-        prev_item = self.events_table.item(current_row - 1, 7)
-        return int(prev_item.text()) if prev_item and prev_item.text().isdigit() else 0
+        return self.event_store.abs_time(current_row - 1)
     
     def get_next_absolute_time(self, current_row):
         """获取当前行后一个事件的绝对时间"""
-        total_rows = self.events_table.rowCount()
-        if current_row >= total_rows - 1:
+        if current_row >= self.event_store.row_count() - 1:
             return None
-        next_item = self.events_table.item(current_row + 1, 7)
-        return int(next_item.text()) if next_item and next_item.text().isdigit() else None
-    
-    def adjust_next_event_relative_time(self, current_row, new_current_absolute_time):
-        """调整当前行后一个事件的相对时间"""
-        next_absolute_time = self.get_next_absolute_time(current_row)
-        if next_absolute_time is not None:
-            next_row = current_row + 1
-            new_relative_time = next_absolute_time - new_current_absolute_time
-            rel_time_item = self.events_table.item(next_row, 6)
-            if rel_time_item:
-                rel_time_item.setText(str(new_relative_time))
-            else:
-                # 如果不存在，创建新的相对时间项
-                new_rel_item = QTableWidgetItem(str(new_relative_time))
-                new_rel_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-                self.events_table.setItem(next_row, 6, new_rel_item)
+        return self.event_store.abs_time(current_row + 1)
     
     def get_event_absolute_time(self, row):
         """获取指定行事件的绝对时间"""
-        abs_time_item = self.events_table.item(row, 7)
-        return int(abs_time_item.text()) if abs_time_item and abs_time_item.text().isdigit() else 0
+        return self.event_store.abs_time(row)
     
     def update_app_state(self):
         """更新应用状态"""
         self.update_stats()
         self.main_window.mark_state_dirty()
-        self.main_window.on_calculate_total_time()
     
     def on_add_event(self):
         """添加事件 - 在指定位置插入"""
@@ -968,11 +834,11 @@ class EventManager:
             if selected_rows:
                 # 有选中事件：在第一个选中事件后插入
                 index = selected_rows[0]  # 获取QModelIndex对象
-                insert_position = index.row() + 1
-                insert_after_item = index.row()  # 在这个事件后插入
+                insert_position = self.store_row(index) + 1
+                insert_after_item = self.store_row(index)  # 在这个事件后插入
             else:
                 # 没有选中事件：在最后插入
-                insert_position = self.events_table.rowCount()
+                insert_position = self.event_store.row_count()
                 insert_after_item = None  # 在最后插入
             
             # 保存当前状态到撤销栈
@@ -1007,9 +873,7 @@ class EventManager:
                     new_absolute_time = prev_absolute_time + relative_time
                     
                     # 插入新行
-                    self.events_table.insertRow(insert_position)
                     new_row_data = [
-                        str(insert_position + 1),  # 行号
                         event_data[0],  # 事件名称
                         event_data[1],  # 事件类型
                         event_data[2],  # 键码
@@ -1019,19 +883,10 @@ class EventManager:
                         str(new_absolute_time)  # 绝对偏移
                     ]
                     
-                    for col, data in enumerate(new_row_data):
-                        item = QTableWidgetItem(str(data))
-                        item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-                        self.events_table.setItem(insert_position, col, item)
-                    
-                    # 更新行号
-                    self.update_row_numbers()
-                    
-                    # 根据时间修改选项调整后续事件
-                    if time_option == "仅修改当前事件时间":
-                        self.adjust_next_event_relative_time(insert_position, new_absolute_time)
-                    else:  # 修改后重新计算后续事件时间
-                        self.recalculate_time_from_row(insert_position + 1)
+                    # 根据时间修改选项调整后续事件：仅修改当前事件时间时后续事件绝对时间不变，
+                    # 否则后续事件随之顺延
+                    keep_following = time_option == "仅修改当前事件时间"
+                    self.event_store.insert_row(insert_position, record_from_strings(new_row_data), keep_following)
                     
                     # 更新应用状态
                     self.update_app_state()
@@ -1065,10 +920,10 @@ class EventManager:
             try:
                 # 只编辑第一个选中的事件
                 index = selected_rows[0]  # 获取QModelIndex对象
-                row = index.row()  # 获取整数行号
+                row = self.store_row(index)  # 获取事件存储中的行号
                 
                 # 获取当前事件数据
-                event_data = get_event_data_from_table(self.events_table, row)
+                event_data = self.event_store.get_string_row(row)
                 
                 # 打开编辑对话框
                 dialog = EventEditDialog(self.main_window, event_data=event_data, is_edit_mode=True)
@@ -1085,22 +940,12 @@ class EventManager:
                     # 计算编辑后事件的绝对时间
                     current_absolute_time = prev_absolute_time + relative_time
                     
-                    # 更新当前事件的数据（跳过绝对时间列）
-                    for col in range(1, 7):  # 只更新1-6列
-                        item = QTableWidgetItem(new_event_data[col-1])
-                        item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-                        self.events_table.setItem(row, col, item)
-                    
-                    # 更新当前事件的绝对时间
-                    absolute_item = QTableWidgetItem(str(current_absolute_time))
-                    absolute_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-                    self.events_table.setItem(row, 7, absolute_item)
+                    # 更新当前事件的数据和绝对时间
+                    new_row_data = list(new_event_data[:5]) + [str(relative_time), str(current_absolute_time)]
                     
                     # 根据时间修改选项调整后续事件
-                    if time_option == "仅修改当前事件时间":
-                        self.adjust_next_event_relative_time(row, current_absolute_time)
-                    else:  # 修改后重新计算后续事件时间
-                        self.recalculate_time_from_row(row + 1)
+                    keep_following = time_option == "仅修改当前事件时间"
+                    self.event_store.set_record(row, record_from_strings(new_row_data), keep_following)
                     
                     # 更新应用状态
                     self.update_app_state()
@@ -1124,13 +969,12 @@ class EventManager:
             ChineseMessageBox.show_warning(self.main_window, "警告", "请先选择要删除的事件")
             return
         
-        # 获取删除前的表行数和最后一行索引，用于判断是否删除的是末尾事件
-        rows_before_delete = self.events_table.rowCount()
+        # 获取删除前的事件数和最后一行索引，用于判断是否删除的是末尾事件
+        rows_before_delete = self.event_store.row_count()
         last_row_before_delete = rows_before_delete - 1
         
-        # 找出第一个和最后一个被删除事件的索引
-        selected_row_numbers = [row.row() for row in selected_rows]
-        first_deleted_index = min(selected_row_numbers)
+        # 找出最后一个被删除事件的索引
+        selected_row_numbers = [self.store_row(row) for row in selected_rows]
         last_deleted_index = max(selected_row_numbers)
         
         # 检测是否删除的是末尾事件
@@ -1166,61 +1010,14 @@ class EventManager:
         self.main_window._batch_operation = True
         
         try:
-            # 获取删除前的表行数和最后一行索引
-            rows_before_delete = self.events_table.rowCount()
-            last_row_before_delete = rows_before_delete - 1
+            # 找出被删除事件的索引
+            selected_row_numbers = sorted(set(self.store_row(row) for row in selected_rows))
             
-            # 找出第一个和最后一个被删除事件的索引
-            selected_row_numbers = [row.row() for row in selected_rows]
-            first_deleted_index = min(selected_row_numbers)
-            last_deleted_index = max(selected_row_numbers)
-
-            # 检测是否删除的是末尾事件
-            is_deleting_end_events = last_deleted_index == last_row_before_delete
-
-            # 执行删除
-            for row in sorted(selected_row_numbers, reverse=True):
-                self.events_table.removeRow(row)
-
-            # 只有当不是删除末尾事件时，才需要处理时间计算
-            if not is_deleting_end_events:
-                # 获取删除前的事件数据，用于计算（只收集必要的列）
-                all_events_before_delete = []
-                for row in range(rows_before_delete):
-                    event_data = []
-                    for col in [0, 7]:  # 只收集行号和绝对时间列
-                        item = self.events_table.item(row, col)
-                        event_data.append(item.text() if item else "")
-                    all_events_before_delete.append(event_data)
-                
-                # 获取被删除事件之前的最后一个事件的绝对时间
-                prev_absolute_time = 0
-                if first_deleted_index > 0:
-                    prev_event = all_events_before_delete[first_deleted_index - 1]
-                    prev_absolute_time = int(prev_event[1]) if prev_event[1].isdigit() else 0
-                
-                if time_option == "仅修改当前事件时间":
-                    # 仅重新计算删除位置后一个事件的相对时间
-                    next_row_index = first_deleted_index
-                    if next_row_index < self.events_table.rowCount():
-                        # 获取删除位置后一个事件的原始绝对时间
-                        next_absolute_time = None
-                        for event in all_events_before_delete:
-                            if event[0].isdigit() and int(event[0]) > first_deleted_index + 1:  # 找到删除后的第一个事件
-                                next_absolute_time = int(event[1]) if event[1].isdigit() else 0
-                                break
-                    
-                    if next_absolute_time is not None:
-                        # 计算新的相对时间
-                        new_relative_time = next_absolute_time - prev_absolute_time
-                        next_relative_item = QTableWidgetItem(str(new_relative_time))
-                        next_relative_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-                        self.events_table.setItem(next_row_index, 6, next_relative_item)
-                else:
-                    # 重新计算后续所有事件的绝对时间
-                    self.recalculate_time_from_row(first_deleted_index)
+            # 执行删除：仅修改当前事件时间时调整删除位置后一个事件的相对时间，使后续事件绝对时间保持不变，
+            # 否则后续所有事件随之提前（删除末尾事件时两者相同）
+            keep_following = time_option == "仅修改当前事件时间"
+            self.event_store.remove_rows(selected_row_numbers, keep_following)
             
-            self.update_row_numbers()
             self.update_stats()
             
             # 标记状态变更
@@ -1228,9 +1025,6 @@ class EventManager:
             
             self.main_window.status_bar.showMessage(f"✅ 已删除 {len(selected_rows)} 个事件")
             self.debug_logger.log_info(f"已删除 {len(selected_rows)} 个事件，使用逻辑: {time_option}")
-            
-            # 立即更新预计总时间
-            self.main_window.on_calculate_total_time()
         finally:
             # 结束批量操作
             self.main_window._batch_operation = False
@@ -1242,8 +1036,8 @@ class EventManager:
             self.main_window.copied_events = []
             
             for row_index in selected_rows:
-                row = row_index.row()  # 获取整数行号
-                event_data = get_event_data_from_table(self.events_table, row)
+                row = self.store_row(row_index)  # 获取事件存储中的行号
+                event_data = self.event_store.get_string_row(row)
                 self.main_window.copied_events.append(event_data)
             
             self.main_window.status_bar.showMessage(f"📋 已复制 {len(selected_rows)} 个事件")
@@ -1287,13 +1081,13 @@ class EventManager:
         paste_position = None
         if selected_rows:
             # 有选中事件：在第一个选中事件后粘贴
-            paste_position = selected_rows[0].row() + 1
+            paste_position = self.store_row(selected_rows[0]) + 1
         else:
             # 没有选中事件：在最后粘贴
-            paste_position = self.events_table.rowCount()
+            paste_position = self.event_store.row_count()
         
         # 判断是否粘贴到末尾
-        is_pasting_to_end = paste_position == self.events_table.rowCount()
+        is_pasting_to_end = paste_position == self.event_store.row_count()
         
         # 获取粘贴逻辑设置和跳过弹窗开关
         paste_logic = self.main_window.get_paste_logic()
@@ -1329,31 +1123,24 @@ class EventManager:
             selected_rows = self.get_selected_event_rows()
             if selected_rows:
                 # 有选中事件：在第一个选中事件后粘贴
-                paste_position = selected_rows[0].row() + 1
+                paste_position = self.store_row(selected_rows[0]) + 1
             else:
                 # 没有选中事件：在最后粘贴
-                paste_position = self.events_table.rowCount()
+                paste_position = self.event_store.row_count()
             
             # 获取前一个事件的绝对时间
-            if paste_position == 0:
-                prev_absolute_time = 0
-            else:
-                prev_item = self.events_table.item(paste_position - 1, 7)  # 绝对偏移列
-                prev_absolute_time = int(prev_item.text()) if prev_item and prev_item.text().isdigit() else 0
+            prev_absolute_time = self.get_prev_absolute_time(paste_position)
             
             # 粘贴事件
-            for i, event_data in enumerate(self.main_window.copied_events):
+            new_records = []
+            for event_data in self.main_window.copied_events:
                 # 计算新事件的相对时间
                 relative_time = int(event_data[5]) if event_data[5] else 100
                 
                 # 计算新事件的绝对时间
                 new_absolute_time = prev_absolute_time + relative_time
                 
-                # 插入新行 - 修复：每次插入到当前位置，确保事件顺序正确
-                insert_position = paste_position + i
-                self.events_table.insertRow(insert_position)
                 new_row_data = [
-                    str(insert_position + 1),  # 行号
                     event_data[0],  # 事件名称
                     event_data[1],  # 事件类型
                     event_data[2],  # 键码
@@ -1362,40 +1149,15 @@ class EventManager:
                     str(relative_time),  # 相对偏移
                     str(new_absolute_time)  # 绝对偏移
                 ]
-                
-                for col, data in enumerate(new_row_data):
-                    item = QTableWidgetItem(str(data))
-                    item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-                    self.events_table.setItem(insert_position, col, item)
+                new_records.append(record_from_strings(new_row_data))
                 
                 # 更新前一个事件的绝对时间
                 prev_absolute_time = new_absolute_time
             
-            # 更新行号
-            self.update_row_numbers()
-            
-            # 根据时间修改选项调整后续事件
-            if time_option == "修改后重新计算后续事件时间":
-                # 重新计算后续所有事件的绝对时间
-                self.recalculate_time_from_row(paste_position + len(self.main_window.copied_events))
-            elif time_option == "仅修改当前事件时间":
-                # 仅重新计算粘贴位置后一个事件的相对时间
-                next_row_index = paste_position + len(self.main_window.copied_events)
-                if next_row_index < self.events_table.rowCount():
-                    # 获取粘贴位置后一个事件的绝对时间
-                    next_item = self.events_table.item(next_row_index, 7)  # 绝对偏移列
-                    if next_item and next_item.text().isdigit():
-                        next_absolute_time = int(next_item.text())
-                        # 获取粘贴的最后一个事件的绝对时间
-                        last_paste_item = self.events_table.item(next_row_index - 1, 7)  # 绝对偏移列
-                        if last_paste_item and last_paste_item.text().isdigit():
-                            last_paste_absolute_time = int(last_paste_item.text())
-                            # 计算新的相对时间
-                            new_relative_time = next_absolute_time - last_paste_absolute_time
-                            # 更新相对时间
-                            rel_time_item = self.events_table.item(next_row_index, 6)  # 相对偏移列
-                            if rel_time_item:
-                                rel_time_item.setText(str(new_relative_time))
+            # 一次性插入全部粘贴的事件，根据时间修改选项调整后续事件：
+            # 仅修改当前事件时间时只调整粘贴位置后一个事件的相对时间，否则后续事件整体顺延
+            keep_following = time_option == "仅修改当前事件时间"
+            self.event_store.insert_rows(paste_position, new_records, keep_following)
             
             self.update_stats()
             
@@ -1404,9 +1166,6 @@ class EventManager:
             
             self.main_window.status_bar.showMessage(f"✅ 已粘贴 {len(self.main_window.copied_events)} 个事件")
             self.debug_logger.log_info(f"已粘贴 {len(self.main_window.copied_events)} 个事件，使用逻辑: {time_option}")
-            
-            # 立即更新预计总时间
-            self.main_window.on_calculate_total_time()
         finally:
             # 结束批量操作
             self.main_window._batch_operation = False
@@ -1419,7 +1178,7 @@ class EventManager:
     
     def on_clear_events(self):
         """清空所有事件"""
-        if self.events_table.rowCount() == 0:
+        if self.event_store.row_count() == 0:
             ChineseMessageBox.show_info(self.main_window, "提示", "事件列表已经为空")
             return
         
@@ -1433,8 +1192,8 @@ class EventManager:
             self.main_window._batch_operation = True
             
             try:
-                # 清空表格
-                self.events_table.setRowCount(0)
+                # 清空事件
+                self.event_store.clear()
                 
                 # 更新统计信息
                 self.update_stats()
@@ -0,0 +1,347 @@
+# event_query.py - 事件查询模块
+"""
+事件查询模块，实现事件搜索框使用的小型查询语言。
+
+查询由空白分隔的条件组成，所有条件同时满足（与）才算命中，例如::
+
+    type:按键按下 key:13 time:1000..5000 x>500 rel<50
+
+支持的条件：
+- 普通文本：名称、类型名或键码包含该文本（不区分大小写），含空格的文本可用双引号括起
+- name:文本、type:文本：名称/类型名包含该文本；type=按键按下 表示类型名完全相同
+- 数值字段 key、x、y、rel、time、row：
+  字段:值、字段:起..止（闭区间，可省略一端）、字段:值1,值2、字段=值、!=、>、>=、<、<=
+- 条件前加 - 表示取反，例如 -type:鼠标移动
+
+查询只解析一次，编译为一组对事件存储整列求值的 numpy 谓词，
+求值时没有逐行的Python循环；得到的行号可供搜索过滤、批量编辑和时间分析复用。
+谓词也可以只对一部分候选行求值，用于分块搜索和在上一次结果中继续细化。
+
+本模块不依赖Qt，可在任意线程中使用。
+"""
+
+import re
+import shlex
+
+import numpy as np
+
+from event_store import NO_KEYCODE
+from event_index import SearchIndex
+
+# 不限制事件类型时的过滤选项
+ALL_EVENT_TYPES = "全部事件类型"
+
+# 字段别名 -> 字段名
+FIELD_ALIASES = {
+    "name": "name", "名称": "name",
+    "type": "type", "类型": "type",
+    "key": "key", "keycode": "key", "键码": "key",
+    "x": "x",
+    "y": "y",
+    "rel": "rel", "相对": "rel",
+    "time": "time", "abs": "time", "绝对": "time",
+    "row": "row", "序号": "row"
+}
+
+TEXT_FIELDS = ("name", "type")
+NUMERIC_FIELDS = ("key", "x", "y", "rel", "time", "row")
+# 取值由事件位置决定的字段，插入删除会改变之后所有事件的取值
+POSITION_FIELDS = ("time", "row")
+
+_TERM_PATTERN = re.compile(r'^([^\s:<>=!]+)\s*(>=|<=|!=|:|=|>|<)(.*)$', re.DOTALL)
+_INTEGER_PATTERN = re.compile(r'^[+-]?\d+$')
+
+
+class QueryError(ValueError):
+    """查询语法错误"""
+
+
+# =============================================================================
+# 求值上下文
+# =============================================================================
+
+class QueryContext:
+    """查询求值所需的数据，整列数据按需读取并缓存
+
+    缓存只对创建时的事件存储版本有效，存储修改后应重新创建上下文。
+    """
+
+    def __init__(self, event_store, search_index=None):
+        """初始化求值上下文
+
+        Args:
+            event_store: 事件存储实例
+            search_index: 搜索索引（可选），不提供时临时建立一个
+        """
+        self.event_store = event_store
+        self.search_index = search_index or SearchIndex(event_store, attach=False)
+        self.row_count = event_store.row_count()
+        self.version = event_store.version
+        self._columns = {}
+
+    def is_current(self):
+        """事件存储自创建上下文以来是否没有被修改"""
+        return self.event_store.version == self.version
+
+    def column(self, field, rows=None):
+        """获取数值字段的数据（int64 数组）
+
+        Args:
+            field: 字段名
+            rows: 只取这些行，None表示整列
+        """
+        values = self._columns.get(field)
+        if values is None:
+            store = self.event_store
+            if field == "key":
+                values = np.array(store.keycodes, dtype=np.int64)
+            elif field == "x":
+                values = np.array(store.xs, dtype=np.int64)
+            elif field == "y":
+                values = np.array(store.ys, dtype=np.int64)
+            elif field == "rel":
+                values = np.array(store.rel_times, dtype=np.int64)
+            elif field == "time":
+                values = store.absolute_times()
+            else:
+                # 序号从1开始，与表格显示一致
+                values = np.arange(1, self.row_count + 1, dtype=np.int64)
+            self._columns[field] = values
+        return values if rows is None else values[rows]
+
+
+# =============================================================================
+# 条件
+# =============================================================================
+
+def _parse_integer(text, field):
+    text = text.strip()
+    if not _INTEGER_PATTERN.match(text):
+        raise QueryError(f"{field} 的取值必须是整数: {text or '(空)'}")
+    return int(text)
+
+
+def _compile_text_term(field, op, value):
+    """编译名称/类型条件，返回 mask(context, rows) 函数"""
+    if op not in (":", "=", "!="):
+        raise QueryError(f"{field} 只支持 :、= 和 != 比较")
+    if field == "name":
+        if op == ":":
+            return lambda context, rows: context.search_index.name_mask(value, rows)
+        return _exact_name_term(value, op == "!=")
+    if op == ":":
+        return lambda context, rows: context.search_index.type_text_mask(value, rows)
+    if op == "=":
+        return lambda context, rows: context.search_index.type_mask(value, rows)
+    return lambda context, rows: ~context.search_index.type_mask(value, rows)
+
+
+def _exact_name_term(value, negate):
+    def mask(context, rows):
+        names = context.event_store.names
+        result = context.search_index.name_mask(value, rows)
+        # 名称子串命中的行很少是全表，只对候选行逐一确认
+        candidates = np.flatnonzero(result)
+        candidate_rows = candidates if rows is None else rows[candidates]
+        exact = np.fromiter((names[row] == value for row in candidate_rows.tolist()), dtype=bool, count=len(candidates))
+        result[candidates[~exact]] = False
+        return ~result if negate else result
+    return mask
+
+
+def _compile_numeric_term(field, op, value):
+    """编译数值条件，返回 mask(context, rows) 函数"""
+    if op == ":":
+        if ".." in value:
+            low_text, high_text = value.split("..", 1)
+            low = _parse_integer(low_text, field) if low_text.strip() else None
+            high = _parse_integer(high_text, field) if high_text.strip() else None
+            if low is None and high is None:
+                raise QueryError(f"{field} 的范围至少需要一个端点")
+
+            def predicate(values):
+                result = np.ones(len(values), dtype=bool)
+                if low is not None:
+                    result &= values >= low
+                if high is not None:
+                    result &= values <= high
+                return result
+        else:
+            choices = [_parse_integer(part, field) for part in value.split(",")]
+
+            def predicate(values):
+                # 取值很少时逐个比较比 np.isin 的排序更快
+                if len(choices) > 8:
+                    return np.isin(values, choices)
+                result = values == choices[0]
+                for choice in choices[1:]:
+                    result |= values == choice
+                return result
+    else:
+        number = _parse_integer(value, field)
+        predicate = {
+            "=": lambda values: values == number,
+            "!=": lambda values: values != number,
+            ">": lambda values: values > number,
+            ">=": lambda values: values >= number,
+            "<": lambda values: values < number,
+            "<=": lambda values: values <= number
+        }[op]
+
+    def mask(context, rows):
+        values = context.column(field, rows)
+        result = predicate(values)
+        if field == "key":
+            # 没有键码的事件不参与键码比较
+            result &= values != NO_KEYCODE
+        return result
+    return mask
+
+
+def _compile_term(token):
+    """把一个查询词编译为条件
+
+    Returns:
+        tuple: (是否取反, 字段名（普通文本为None）, 比较符, 取值, mask函数)
+    """
+    negate = False
+    if len(token) > 1 and token[0] == "-":
+        negate = True
+        token = token[1:]
+
+    match = _TERM_PATTERN.match(token)
+    field = FIELD_ALIASES.get(match.group(1).lower()) if match else None
+    if field is None:
+        # 不是已知字段的条件按普通文本处理，与旧版搜索框保持一致
+        text = token
+        return negate, None, ":", text, lambda context, rows: context.search_index.text_mask(text, rows)
+
+    op = match.group(2)
+    value = match.group(3)
+    if not value.strip():
+        raise QueryError(f"条件缺少取值: {token}")
+    if field in TEXT_FIELDS:
+        return negate, field, op, value, _compile_text_term(field, op, value)
+    return negate, field, op, value, _compile_numeric_term(field, op, value)
+
+
+def _term_implies(term, other):
+    """条件 term 成立时 other 是否必然成立（只识别相同条件和子串变长两种情况）"""
+    if term[:4] == other[:4]:
+        return True
+    negate, field, op, value = term[:4]
+    other_negate, other_field, other_op, other_value = other[:4]
+    # 包含较长文本的行必然包含其中较短的文本
+    return (not negate and not other_negate and field == other_field and op == other_op == ":"
+            and field in (None, "name", "type") and other_value.lower() in value.lower())
+
+
+# =============================================================================
+# 查询
+# =============================================================================
+
+class EventQuery:
+    """编译后的事件查询
+
+    用法::
+
+        query = EventQuery("type:按键按下 time:1000..5000")
+        rows = query.rows(event_store, search_index)
+    """
+
+    def __init__(self, text="", type_str=ALL_EVENT_TYPES):
+        """解析并编译查询
+
+        Args:
+            text: 查询文本
+            type_str: 额外要求的事件类型名（对应搜索栏的类型下拉框），"全部事件类型"表示不限制
+
+        Raises:
+            QueryError: 查询语法错误
+        """
+        self.text = text
+        self.type_str = type_str
+        try:
+            tokens = shlex.split(text)
+        except ValueError as e:
+            raise QueryError(f"查询语法错误: {e}")
+
+        self._terms = [_compile_term(token) for token in tokens]
+        if type_str and type_str != ALL_EVENT_TYPES:
+            self._terms.append((False, "type", "=", type_str,
+                                lambda context, rows: context.search_index.type_mask(type_str, rows)))
+
+    def is_empty(self):
+        """查询是否没有任何条件（命中全部事件）"""
+        return not self._terms
+
+    def depends_on_position(self):
+        """命中与否是否取决于事件所在的位置（序号，或由前面的事件累加出的绝对时间）
+
+        这类查询在插入删除之后，之后所有行的结果都可能改变。
+        """
+        return any(term[1] in POSITION_FIELDS for term in self._terms)
+
+    def depends_on_time(self):
+        """查询是否使用绝对时间（只有绝对时间变化时也需要重新求值）"""
+        return any(term[1] == "time" for term in self._terms)
+
+    def narrows(self, previous):
+        """本查询的结果是否必然是 previous 结果的子集
+
+        成立时只需在上一次的命中行中继续筛选，例如在搜索框中继续输入。
+
+        Args:
+            previous: 上一次的查询，可以为None
+        """
+        if previous is None:
+            return False
+        return all(any(_term_implies(term, other) for term in self._terms) for other in previous._terms)
+
+    def evaluate(self, context, rows=None):
+        """在求值上下文中计算命中掩码
+
+        Args:
+            context: QueryContext 实例
+            rows: 只计算这些行（升序行号数组），None表示全部行
+
+        Returns:
+            numpy.ndarray: 与 rows（或全部行）一一对应的布尔掩码
+        """
+        result = np.ones(context.row_count if rows is None else len(rows), dtype=bool)
+        for negate, _, _, _, term_mask in self._terms:
+            mask = term_mask(context, rows)
+            if negate:
+                result &= ~mask
+            else:
+                result &= mask
+        return result
+
+    def mask(self, event_store, search_index=None):
+        """求出命中行的布尔掩码
+
+        Args:
+            event_store: 事件存储实例
+            search_index: 与事件存储同步的搜索索引（可选）
+
+        Returns:
+            numpy.ndarray: 布尔掩码
+        """
+        return self.evaluate(QueryContext(event_store, search_index))
+
+    def rows(self, event_store, search_index=None, candidates=None):
+        """求出命中的行号
+
+        Args:
+            event_store: 事件存储实例
+            search_index: 与事件存储同步的搜索索引（可选）
+            candidates: 只在这些行中查找（升序行号数组），None表示全部行
+
+        Returns:
+            numpy.ndarray: 升序的 int64 行号数组
+        """
+        context = QueryContext(event_store, search_index)
+        if candidates is None:
+            return np.flatnonzero(self.evaluate(context))
+        candidates = np.asarray(candidates, dtype=np.int64)
+        return candidates[self.evaluate(context, candidates)]
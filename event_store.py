@@ -0,0 +1,1084 @@
+# event_store.py - 事件数据存储模块
+"""
+事件数据存储模块，提供与Qt无关的列式事件存储。
+
+所有事件数据以类型化数组按列保存（事件类型码、键码、鼠标按钮、坐标、相对时间），
+事件管理器、脚本管理器、统计面板等组件均直接读写本存储，事件表格仅作为它的视图。
+
+绝对时间不单独保存，而是由时间原点加上相对时间的前缀和推导，
+前缀和由 PrefixSumTree 维护，修改一个事件的时间不需要逐行重算后续事件。
+
+设置撤销记录器后，每次修改都会生成一条只包含最少逆向数据的撤销操作，
+由 undo_history.UndoHistory 组织成撤销步骤。
+
+事件存储只能在主线程中访问；后台线程读取的是 snapshot() 得到的不可变快照，
+结果连同快照的版本号一起返回，主线程丢弃基于旧版本计算的结果。
+"""
+
+from array import array
+
+import numpy as np
+
+from time_index import PrefixSumTree
+
+# =============================================================================
+# 列定义和类型映射
+# =============================================================================
+
+# 表格列索引（第0列为行号，仅由视图生成）
+COLUMN_ROW_NUMBER = 0
+COLUMN_NAME = 1
+COLUMN_TYPE = 2
+COLUMN_KEYCODE = 3
+COLUMN_X = 4
+COLUMN_Y = 5
+COLUMN_REL_TIME = 6
+COLUMN_ABS_TIME = 7
+
+COLUMN_HEADERS = ["序号", "事件名称", "事件类型", "键码", "X坐标", "Y坐标", "相对偏移时间", "绝对偏移时间"]
+
+# 全部事件类型（界面显示顺序）
+EVENT_TYPES = ["按键按下", "按键释放", "鼠标移动", "左键按下", "左键释放", "右键按下", "右键释放", "中键按下", "中键释放", "鼠标滚轮"]
+KEY_EVENT_TYPES = ["按键按下", "按键释放"]
+MOUSE_EVENT_TYPES = ["鼠标移动", "左键按下", "左键释放", "右键按下", "右键释放", "中键按下", "中键释放", "鼠标滚轮"]
+
+# 鼠标按钮编码
+MOUSE_BUTTON_NONE = 0
+MOUSE_BUTTON_LEFT = 1
+MOUSE_BUTTON_RIGHT = 2
+MOUSE_BUTTON_MIDDLE = 3
+
+MOUSE_BUTTON_NAMES = {
+    MOUSE_BUTTON_LEFT: "Left",
+    MOUSE_BUTTON_RIGHT: "Right",
+    MOUSE_BUTTON_MIDDLE: "Middle"
+}
+MOUSE_BUTTON_CODES = {name: code for code, name in MOUSE_BUTTON_NAMES.items()}
+
+# 键码为空时的占位值
+NO_KEYCODE = -1
+
+# 事件类型字符串 -> (脚本类型码, 鼠标按钮)
+TYPE_STR_TO_CODES = {
+    "按键按下": (0, MOUSE_BUTTON_NONE),
+    "按键释放": (1, MOUSE_BUTTON_NONE),
+    "鼠标移动": (2, MOUSE_BUTTON_NONE),
+    "左键按下": (4, MOUSE_BUTTON_LEFT),
+    "左键释放": (5, MOUSE_BUTTON_LEFT),
+    "右键按下": (4, MOUSE_BUTTON_RIGHT),
+    "右键释放": (5, MOUSE_BUTTON_RIGHT),
+    "中键按下": (4, MOUSE_BUTTON_MIDDLE),
+    "中键释放": (5, MOUSE_BUTTON_MIDDLE),
+    "鼠标滚轮": (6, MOUSE_BUTTON_NONE)
+}
+
+# (脚本类型码, 鼠标按钮) -> 事件类型字符串
+CODES_TO_TYPE_STR = {codes: type_str for type_str, codes in TYPE_STR_TO_CODES.items()}
+
+# 没有鼠标按钮信息时的默认映射（与旧版导入逻辑保持一致）
+_DEFAULT_TYPE_STR = {
+    0: "按键按下",
+    1: "按键释放",
+    2: "鼠标移动",
+    4: "左键按下",
+    5: "左键释放",
+    6: "鼠标滚轮"
+}
+
+# 变更通知类型
+CHANGE_INSERT = "insert"
+CHANGE_REMOVE = "remove"
+CHANGE_UPDATE = "update"
+CHANGE_RESET = "reset"
+CHANGE_TIMES = "times"  # 只有推导出的绝对时间发生变化
+
+# 撤销操作类型（操作为元组，第一个元素为类型，apply_undo() 执行它并记录反向操作）
+UNDO_REMOVE = "remove"    # (UNDO_REMOVE, 第一行, 行数)：删除插入的行
+UNDO_INSERT = "insert"    # (UNDO_INSERT, 位置, 各列数据)：恢复删除的行
+UNDO_SET = "set"          # (UNDO_SET, 第一行, ((列序号, 旧数据), ...))：恢复修改的单元格
+UNDO_ORIGIN = "origin"    # (UNDO_ORIGIN, 旧时间原点)：恢复整体时间平移
+UNDO_RESET = "reset"      # (UNDO_RESET, 各列数据, 旧时间原点)：恢复被整体替换的内容
+UNDO_REORDER = "reorder"  # (UNDO_REORDER, 行号数组)：按行号数组重新排列各行
+
+# 各列在 _columns() 中的序号
+_NAME = 0
+_TYPE = 1
+_BUTTON = 2
+_KEYCODE = 3
+_X = 4
+_Y = 5
+_REL_TIME = 6
+
+
+def parse_int(text, default=0):
+    """将表格文本安全地转换为整数
+
+    Args:
+        text: 文本或数字
+        default: 转换失败时的默认值
+
+    Returns:
+        int: 转换后的整数
+    """
+    if isinstance(text, int):
+        return text
+    try:
+        return int(str(text).strip())
+    except (ValueError, TypeError):
+        return default
+
+
+def type_codes_from_str(type_str):
+    """将事件类型字符串转换为(类型码, 鼠标按钮)
+
+    Args:
+        type_str: 事件类型字符串
+
+    Returns:
+        tuple: (类型码, 鼠标按钮编码)，未知类型按"按键按下"处理
+    """
+    return TYPE_STR_TO_CODES.get(type_str, (0, MOUSE_BUTTON_NONE))
+
+
+def type_str_from_codes(type_code, mouse_button=MOUSE_BUTTON_NONE):
+    """将(类型码, 鼠标按钮)转换为事件类型字符串
+
+    Args:
+        type_code: 脚本事件类型码
+        mouse_button: 鼠标按钮编码
+
+    Returns:
+        str: 事件类型字符串
+    """
+    type_str = CODES_TO_TYPE_STR.get((type_code, mouse_button))
+    if type_str is None:
+        type_str = _DEFAULT_TYPE_STR.get(type_code, "未知事件")
+    return type_str
+
+
+def record_from_strings(values):
+    """将7列字符串行（名称、类型、键码、X、Y、相对时间、绝对时间）转换为事件记录
+
+    Args:
+        values: 字符串序列，与表格第1-7列对应
+
+    Returns:
+        tuple: 事件记录 (名称, 类型码, 鼠标按钮, 键码, X, Y, 相对时间, 绝对时间)
+    """
+    values = list(values) + [""] * (7 - len(values))
+    type_code, mouse_button = type_codes_from_str(values[1])
+    keycode_text = str(values[2]).strip()
+    keycode = parse_int(keycode_text, NO_KEYCODE) if keycode_text else NO_KEYCODE
+    return (
+        str(values[0]),
+        type_code,
+        mouse_button,
+        keycode,
+        parse_int(values[3]),
+        parse_int(values[4]),
+        parse_int(values[5]),
+        parse_int(values[6])
+    )
+
+
+def record_to_strings(record):
+    """将事件记录转换为7列字符串行
+
+    Args:
+        record: 事件记录
+
+    Returns:
+        list: 与表格第1-7列对应的字符串列表
+    """
+    name, type_code, mouse_button, keycode, x, y, rel_time, abs_time = record
+    return [
+        name,
+        type_str_from_codes(type_code, mouse_button),
+        "" if keycode == NO_KEYCODE else str(keycode),
+        str(x),
+        str(y),
+        str(rel_time),
+        str(abs_time)
+    ]
+
+
+# =============================================================================
+# 事件存储类
+# =============================================================================
+
+class EventStore:
+    """列式事件存储
+
+    以类型化数组保存全部事件，是事件数据的唯一来源。
+    每次修改都会递增版本号并通知监听器，视图和索引据此增量更新。
+
+    监听器签名为 callback(change, first, count)：
+    - change: 变更类型（insert/remove/update/reset/times）
+    - first: 受影响的第一行
+    - count: 受影响的行数
+
+    times 表示这些行的字段本身没有变化，只是前面事件的相对时间改变后，
+    它们推导出的绝对时间随之平移。
+
+    绝对时间 = 时间原点 + 到该行为止的相对时间之和。
+    导入的脚本第一个事件相对时间为0而绝对时间不一定为0，差值保存在时间原点中。
+    写入整条记录（插入、替换、重置）时，记录中的绝对时间只用于确定第一行的时间原点。
+
+    前置监听器使用相同签名，在插入、删除、重置和单元格修改（update）发生之前调用，
+    供表格模型发出 beginInsertRows 等信号，增量索引据此读取修改前的值。
+
+    撤销记录器（set_undo_log）在每次修改时收到一条撤销操作，
+    操作只保存被修改部分的旧数据，交给 apply_undo() 即可还原。
+    """
+
+    def __init__(self, records=None):
+        """初始化事件存储
+
+        Args:
+            records: 初始事件记录列表（可选）
+        """
+        self._names = []
+        self._types = array('b')
+        self._buttons = array('b')
+        self._keycodes = array('q')
+        self._xs = array('q')
+        self._ys = array('q')
+        self._rel_times = array('q')
+        self._time_origin = 0
+        self._time_tree = None  # 相对时间前缀和树，结构变更后延迟重建
+        self._version = 0
+        self._listeners = []
+        self._pre_listeners = []
+        self._undo_log = None
+
+        if records:
+            self._insert_records(0, records)
+
+    # -------------------------------------------------------------------------
+    # 监听和版本
+    # -------------------------------------------------------------------------
+
+    @property
+    def version(self):
+        """数据版本号，每次修改后递增"""
+        return self._version
+
+    def add_listener(self, callback):
+        """注册变更监听器"""
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        """移除变更监听器"""
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def add_pre_listener(self, callback):
+        """注册结构变更前置监听器"""
+        if callback not in self._pre_listeners:
+            self._pre_listeners.append(callback)
+
+    def remove_pre_listener(self, callback):
+        """移除结构变更前置监听器"""
+        if callback in self._pre_listeners:
+            self._pre_listeners.remove(callback)
+
+    def _notify_before(self, change, first=0, count=0):
+        """在结构变更发生前通知前置监听器"""
+        for callback in list(self._pre_listeners):
+            callback(change, first, count)
+
+    def _notify(self, change, first=0, count=0):
+        """递增版本号并通知所有监听器"""
+        self._version += 1
+        for callback in list(self._listeners):
+            callback(change, first, count)
+
+    def set_undo_log(self, undo_log):
+        """设置撤销记录器
+
+        Args:
+            undo_log: 提供 record(operation) 方法的对象，None表示不记录
+        """
+        self._undo_log = undo_log
+
+    def _log_undo(self, operation):
+        """把撤销操作交给撤销记录器"""
+        if self._undo_log is not None:
+            self._undo_log.record(operation)
+
+    def _log_set(self, first, count, indices):
+        """在修改单元格之前记录这些列的旧数据"""
+        if self._undo_log is not None:
+            columns = self._columns()
+            end = first + count
+            self._undo_log.record((UNDO_SET, first, tuple((index, columns[index][first:end]) for index in indices)))
+
+    def _log_origin(self):
+        """在修改时间原点之前记录旧值"""
+        if self._undo_log is not None:
+            self._undo_log.record((UNDO_ORIGIN, self._time_origin))
+
+    # -------------------------------------------------------------------------
+    # 列访问（只读约定，请勿在外部直接修改）
+    # -------------------------------------------------------------------------
+
+    @property
+    def names(self):
+        return self._names
+
+    @property
+    def types(self):
+        return self._types
+
+    @property
+    def buttons(self):
+        return self._buttons
+
+    @property
+    def keycodes(self):
+        return self._keycodes
+
+    @property
+    def xs(self):
+        return self._xs
+
+    @property
+    def ys(self):
+        return self._ys
+
+    @property
+    def rel_times(self):
+        return self._rel_times
+
+    @property
+    def time_origin(self):
+        """时间原点（第一个事件的绝对时间减去其相对时间）"""
+        return self._time_origin
+
+    @property
+    def abs_times(self):
+        """全部事件的绝对时间（按需计算的 numpy 数组）"""
+        return self.absolute_times()
+
+    # -------------------------------------------------------------------------
+    # 查询
+    # -------------------------------------------------------------------------
+
+    def __len__(self):
+        return len(self._names)
+
+    def row_count(self):
+        """获取事件数量"""
+        return len(self._names)
+
+    def get_record(self, row):
+        """获取指定行的事件记录"""
+        return (
+            self._names[row],
+            self._types[row],
+            self._buttons[row],
+            self._keycodes[row],
+            self._xs[row],
+            self._ys[row],
+            self._rel_times[row],
+            self.abs_time(row)
+        )
+
+    def get_records(self, start=0, end=None):
+        """获取一段事件记录"""
+        if end is None:
+            end = len(self._names)
+        return list(zip(
+            self._names[start:end],
+            self._types[start:end],
+            self._buttons[start:end],
+            self._keycodes[start:end],
+            self._xs[start:end],
+            self._ys[start:end],
+            self._rel_times[start:end],
+            self.absolute_times(start, end).tolist()
+        ))
+
+    def get_string_row(self, row):
+        """获取指定行的7列字符串数据（与旧版表格数据格式一致）"""
+        return record_to_strings(self.get_record(row))
+
+    def to_string_rows(self):
+        """导出全部事件为7列字符串行列表"""
+        return [record_to_strings(record) for record in self.get_records()]
+
+    def type_name(self, row):
+        """获取指定行的事件类型字符串"""
+        return type_str_from_codes(self._types[row], self._buttons[row])
+
+    def keycode_text(self, row):
+        """获取指定行的键码文本，没有键码时返回空字符串"""
+        keycode = self._keycodes[row]
+        return "" if keycode == NO_KEYCODE else str(keycode)
+
+    def display_text(self, row, column):
+        """获取指定单元格的显示文本"""
+        if column == COLUMN_ROW_NUMBER:
+            return str(row + 1)
+        if column == COLUMN_NAME:
+            return self._names[row]
+        if column == COLUMN_TYPE:
+            return self.type_name(row)
+        if column == COLUMN_KEYCODE:
+            return self.keycode_text(row)
+        if column == COLUMN_X:
+            return str(self._xs[row])
+        if column == COLUMN_Y:
+            return str(self._ys[row])
+        if column == COLUMN_REL_TIME:
+            return str(self._rel_times[row])
+        if column == COLUMN_ABS_TIME:
+            return str(self.abs_time(row))
+        return ""
+
+    def _tree(self):
+        """获取相对时间前缀和树，必要时重建"""
+        if self._time_tree is None:
+            self._time_tree = PrefixSumTree(self._rel_times)
+        return self._time_tree
+
+    def abs_time(self, row):
+        """获取指定行的绝对时间"""
+        if row < 0:
+            row += len(self._names)
+        if not 0 <= row < len(self._names):
+            raise IndexError("event index out of range")
+        return self._time_origin + self._tree().prefix(row + 1)
+
+    def absolute_times(self, start=0, end=None):
+        """计算一段事件的绝对时间
+
+        只对请求的行做一次向量化累加，起点由前缀和树在 O(log n) 内给出。
+
+        Args:
+            start: 第一行
+            end: 结束行（不包含），默认到末尾
+
+        Returns:
+            numpy.ndarray: int64 绝对时间数组
+        """
+        count = len(self._names)
+        if end is None or end > count:
+            end = count
+        start = max(0, start)
+        if start >= end:
+            return np.empty(0, dtype=np.int64)
+        base = self._time_origin
+        if start > 0:
+            base += self._tree().prefix(start)
+        times = np.array(self._rel_times[start:end], dtype=np.int64)
+        np.cumsum(times, out=times)
+        times += base
+        return times
+
+    def rel_time(self, row):
+        """获取指定行的相对时间"""
+        return self._rel_times[row]
+
+    def last_absolute_time(self):
+        """获取最后一个事件的绝对时间（即单次循环时间）"""
+        return self.abs_time(-1) if self._names else 0
+
+    def snapshot(self):
+        """拍摄不可变快照，交给后台线程读取
+
+        需要在修改事件存储的线程中调用；各列只做内存拷贝，百万级事件也只需几毫秒。
+
+        Returns:
+            EventSnapshot: 快照
+        """
+        columns = (tuple(self._names),) + tuple(column[:] for column in self._columns()[1:])
+        return EventSnapshot(columns, self._time_origin if self._names else 0, self._version)
+
+    # -------------------------------------------------------------------------
+    # 修改
+    # -------------------------------------------------------------------------
+
+    def _columns(self):
+        """按列序号返回全部数据列"""
+        return (self._names, self._types, self._buttons, self._keycodes,
+                self._xs, self._ys, self._rel_times)
+
+    def _slice_columns(self, first, end):
+        """复制一段行的全部列数据"""
+        return tuple(column[first:end] for column in self._columns())
+
+    def _insert_columns(self, position, columns):
+        """在指定位置插入各列数据（不发送通知）"""
+        for column, values in zip(self._columns(), columns):
+            column[position:position] = values
+        self._time_tree = None
+
+    def _insert_records(self, position, records):
+        """在指定位置插入记录（不发送通知）"""
+        columns, origin = columns_from_records(records)
+        self._insert_columns(position, columns)
+        if position == 0:
+            self._time_origin = origin
+
+    def _following_abs_time(self, row, keep_following):
+        """需要保持后续事件时间时，记录 row 行当前的绝对时间"""
+        if keep_following and row < len(self._names):
+            return self.abs_time(row)
+        return None
+
+    def _finish_time_change(self, row, old_abs_time):
+        """时间修改完成后处理从 row 行开始的后续事件
+
+        Args:
+            row: 第一个后续事件的行号
+            old_abs_time: 该行修改前的绝对时间；为None时后续事件整体平移
+        """
+        count = len(self._names)
+        if row >= count:
+            return
+        if old_abs_time is None:
+            self._notify(CHANGE_TIMES, row, count - row)
+            return
+        # 只调整后一个事件的相对时间，使其绝对时间（以及之后所有事件）保持不变
+        delta = old_abs_time - self.abs_time(row)
+        if delta:
+            self._notify_before(CHANGE_UPDATE, row, 1)
+            self._log_set(row, 1, (_REL_TIME,))
+            self._rel_times[row] += delta
+            self._tree().add(row, delta)
+            self._notify(CHANGE_UPDATE, row, 1)
+
+    def insert_rows(self, position, records, keep_following=False):
+        """在指定位置插入多条事件记录
+
+        Args:
+            position: 插入位置
+            records: 事件记录列表
+            keep_following: 是否保持插入点之后事件的绝对时间不变，
+                否则后续事件整体顺延
+        """
+        records = list(records)
+        if not records:
+            return
+        position = max(0, min(position, len(self._names)))
+        old_abs_time = self._following_abs_time(position, keep_following)
+        old_origin = self._time_origin
+        self._notify_before(CHANGE_INSERT, position, len(records))
+        self._insert_records(position, records)
+        self._log_undo((UNDO_REMOVE, position, len(records)))
+        if self._time_origin != old_origin:
+            self._log_undo((UNDO_ORIGIN, old_origin))
+        self._notify(CHANGE_INSERT, position, len(records))
+        self._finish_time_change(position + len(records), old_abs_time)
+
+    def insert_row(self, position, record, keep_following=False):
+        """在指定位置插入一条事件记录"""
+        self.insert_rows(position, [record], keep_following)
+
+    def append_rows(self, records):
+        """在末尾追加多条事件记录"""
+        self.insert_rows(len(self._names), records)
+
+    def remove_range(self, first, count, keep_following=False):
+        """删除一段连续的事件
+
+        Args:
+            first: 第一行索引
+            count: 删除数量
+            keep_following: 是否保持删除范围之后事件的绝对时间不变，
+                否则后续事件整体提前
+        """
+        if count <= 0:
+            return
+        end = first + count
+        old_abs_time = self._following_abs_time(end, keep_following)
+        self._notify_before(CHANGE_REMOVE, first, count)
+        if self._undo_log is not None:
+            self._log_undo((UNDO_INSERT, first, self._slice_columns(first, end)))
+        for column in self._columns():
+            del column[first:end]
+        self._time_tree = None
+        self._notify(CHANGE_REMOVE, first, count)
+        self._finish_time_change(first, old_abs_time)
+
+    def remove_rows(self, rows, keep_following=False):
+        """删除多行事件（行索引可以无序、不连续）
+
+        按连续区间从后往前删除，每个区间只发送一次通知。
+        """
+        rows = sorted(set(rows))
+        while rows:
+            end = rows.pop()
+            first = end
+            while rows and rows[-1] == first - 1:
+                first = rows.pop()
+            self.remove_range(first, end - first + 1, keep_following)
+
+    def _set_time_fields(self, row, rel_time, abs_time=None):
+        """写入一行的相对时间；第一行同时根据绝对时间确定时间原点（不发送通知）"""
+        delta = rel_time - self._rel_times[row]
+        if delta:
+            self._log_set(row, 1, (_REL_TIME,))
+            self._rel_times[row] = rel_time
+            if self._time_tree is not None:
+                self._time_tree.add(row, delta)
+        if row == 0 and abs_time is not None and abs_time - rel_time != self._time_origin:
+            self._log_origin()
+            self._time_origin = abs_time - rel_time
+
+    def set_record(self, row, record, keep_following=False):
+        """替换指定行的事件记录
+
+        Args:
+            row: 行号
+            record: 事件记录
+            keep_following: 是否保持后续事件的绝对时间不变
+        """
+        old_abs_time = self._following_abs_time(row + 1, keep_following)
+        old_time = self.abs_time(row)
+        self._notify_before(CHANGE_UPDATE, row, 1)
+        self._log_set(row, 1, (_NAME, _TYPE, _BUTTON, _KEYCODE, _X, _Y))
+        (self._names[row], self._types[row], self._buttons[row], self._keycodes[row],
+         self._xs[row], self._ys[row]) = record[:6]
+        self._set_time_fields(row, record[6], record[7])
+        self._notify(CHANGE_UPDATE, row, 1)
+        if old_abs_time is not None or self.abs_time(row) != old_time:
+            self._finish_time_change(row + 1, old_abs_time)
+
+    def set_name(self, row, name):
+        """设置事件名称"""
+        self._notify_before(CHANGE_UPDATE, row, 1)
+        self._log_set(row, 1, (_NAME,))
+        self._names[row] = name
+        self._notify(CHANGE_UPDATE, row, 1)
+
+    def set_type(self, row, type_code, mouse_button=MOUSE_BUTTON_NONE):
+        """设置事件类型"""
+        self._notify_before(CHANGE_UPDATE, row, 1)
+        self._log_set(row, 1, (_TYPE, _BUTTON))
+        self._types[row] = type_code
+        self._buttons[row] = mouse_button
+        self._notify(CHANGE_UPDATE, row, 1)
+
+    def set_keycode(self, row, keycode):
+        """设置键码"""
+        self._notify_before(CHANGE_UPDATE, row, 1)
+        self._log_set(row, 1, (_KEYCODE,))
+        self._keycodes[row] = keycode
+        self._notify(CHANGE_UPDATE, row, 1)
+
+    def set_position(self, row, x, y):
+        """设置坐标"""
+        self._notify_before(CHANGE_UPDATE, row, 1)
+        self._log_set(row, 1, (_X, _Y))
+        self._xs[row] = x
+        self._ys[row] = y
+        self._notify(CHANGE_UPDATE, row, 1)
+
+    def set_rel_time(self, row, rel_time, keep_following=False):
+        """设置相对时间
+
+        Args:
+            row: 行号
+            rel_time: 新的相对时间
+            keep_following: 是否保持后续事件的绝对时间不变，否则后续事件随之平移
+        """
+        if rel_time == self._rel_times[row]:
+            return
+        old_abs_time = self._following_abs_time(row + 1, keep_following)
+        self._notify_before(CHANGE_UPDATE, row, 1)
+        self._set_time_fields(row, rel_time)
+        self._notify(CHANGE_UPDATE, row, 1)
+        self._finish_time_change(row + 1, old_abs_time)
+
+    def set_abs_time(self, row, abs_time, keep_following=False):
+        """设置绝对时间
+
+        第一行通过调整时间原点实现，其他行通过调整本行的相对时间实现。
+
+        Args:
+            row: 行号
+            abs_time: 新的绝对时间
+            keep_following: 是否保持后续事件的绝对时间不变，否则后续事件随之平移
+        """
+        delta = abs_time - self.abs_time(row)
+        if not delta:
+            return
+        old_abs_time = self._following_abs_time(row + 1, keep_following)
+        self._notify_before(CHANGE_UPDATE, row, 1)
+        if row == 0:
+            self._log_origin()
+            self._time_origin += delta
+        else:
+            self._set_time_fields(row, self._rel_times[row] + delta)
+        self._notify(CHANGE_UPDATE, row, 1)
+        self._finish_time_change(row + 1, old_abs_time)
+
+    def update_range(self, first, names=None, types=None, buttons=None, keycodes=None,
+                     xs=None, ys=None, rel_times=None, time_origin=None):
+        """整段替换一段连续行的若干列
+
+        各列按内存块写入，只记录一条撤销操作、发送一次通知，
+        适合批量编辑等一次修改大量行的操作。
+        只有相对时间之和（或时间原点）改变时，之后的事件才随之平移。
+
+        Args:
+            first: 第一行
+            names: 新的名称列表，None表示该列不变（其余各列同理）
+            types: 新的类型码
+            buttons: 新的鼠标按钮
+            keycodes: 新的键码
+            xs: 新的X坐标
+            ys: 新的Y坐标
+            rel_times: 新的相对时间
+            time_origin: 新的时间原点，None表示不变；只有 first 为0时可以修改
+        """
+        fields = tuple((index, values) for index, values in (
+            (_NAME, names), (_TYPE, types), (_BUTTON, buttons), (_KEYCODE, keycodes),
+            (_X, xs), (_Y, ys), (_REL_TIME, rel_times)) if values is not None)
+        if time_origin is not None and first != 0:
+            raise ValueError("只有从第一行开始的修改可以改变时间原点")
+        if fields:
+            self._write_cells(first, fields, time_origin)
+        elif time_origin is not None and time_origin != self._time_origin and self._names:
+            self._log_origin()
+            self._time_origin = time_origin
+            self._notify(CHANGE_TIMES, 0, len(self._names))
+
+    def clear(self):
+        """清空全部事件"""
+        self.reset([])
+
+    def reset(self, records):
+        """用新的记录替换全部事件"""
+        self.reset_columns(*columns_from_records(list(records)))
+
+    def reset_columns(self, columns, origin=0):
+        """用各列数据替换全部事件
+
+        整数列按内存块复制，不逐条转换记录，适合加载大型项目。
+
+        Args:
+            columns: (名称列表, 类型码, 鼠标按钮, 键码, X, Y, 相对时间)，整数列为对应类型的 array
+            origin: 时间原点
+        """
+        count = len(columns[0])
+        self._notify_before(CHANGE_RESET, 0, count)
+        if self._undo_log is not None:
+            self._log_undo((UNDO_RESET, self._slice_columns(0, len(self._names)), self._time_origin))
+        for column, values in zip(self._columns(), columns):
+            column[:] = values
+        self._time_origin = origin if count else 0
+        self._time_tree = None
+        self._notify(CHANGE_RESET, 0, count)
+
+    # -------------------------------------------------------------------------
+    # 时间计算
+    # -------------------------------------------------------------------------
+
+    def recalculate_all_times(self):
+        """重新计算全部事件的绝对时间，第一个事件的绝对时间归零"""
+        if not self._names:
+            return
+        self.set_abs_time(0, 0)
+
+    def sort_by_absolute_time(self, order=None):
+        """按绝对时间稳定排序，并重新计算相对时间
+
+        排序只重排各列数据，撤销时按逆排列还原，不需要保存整份旧数据。
+
+        Args:
+            order: 预先计算的排序（absolute_time_order() 的结果），None表示现在计算
+        """
+        count = len(self._names)
+        if not count:
+            return
+        times = self.absolute_times()
+        if order is None or len(order) != count:
+            order = absolute_time_order(times)
+        sorted_times = times[order]
+        rel_times = np.diff(sorted_times, prepend=0)
+
+        self._notify_before(CHANGE_RESET, 0, count)
+        self._reorder_columns(order)
+        self._log_set(0, count, (_REL_TIME,))
+        self._rel_times[:] = _int_array('q', rel_times)
+        if self._time_origin:
+            self._log_origin()
+            self._time_origin = 0
+        self._time_tree = None
+        self._notify(CHANGE_RESET, 0, count)
+
+    def _reorder_columns(self, order):
+        """按行号数组重新排列全部列（不发送通知）"""
+        order = np.asarray(order, dtype=np.int64)
+        if self._undo_log is not None:
+            inverse = np.empty_like(order)
+            inverse[order] = np.arange(len(order), dtype=np.int64)
+            self._log_undo((UNDO_REORDER, inverse))
+        names = self._names
+        self._names[:] = [names[row] for row in order.tolist()]
+        for column in self._columns()[1:]:
+            column[:] = _int_array(column.typecode, _column_values(column)[order])
+        self._time_tree = None
+
+    # -------------------------------------------------------------------------
+    # 撤销
+    # -------------------------------------------------------------------------
+
+    def apply_undo(self, operation):
+        """执行一条撤销操作
+
+        执行过程同样会向撤销记录器记录反向操作，撤销和重做因此使用同一套逻辑。
+
+        Args:
+            operation: 修改时记录的撤销操作
+        """
+        kind = operation[0]
+        if kind == UNDO_REMOVE:
+            self.remove_range(operation[1], operation[2])
+        elif kind == UNDO_INSERT:
+            position, columns = operation[1:]
+            count = len(columns[0])
+            self._notify_before(CHANGE_INSERT, position, count)
+            self._insert_columns(position, columns)
+            self._log_undo((UNDO_REMOVE, position, count))
+            self._notify(CHANGE_INSERT, position, count)
+            self._finish_time_change(position + count, None)
+        elif kind == UNDO_SET:
+            self._restore_cells(operation[1], operation[2])
+        elif kind == UNDO_ORIGIN:
+            self._log_origin()
+            self._time_origin = operation[1]
+            if self._names:
+                self._notify(CHANGE_TIMES, 0, len(self._names))
+        elif kind == UNDO_RESET:
+            columns, origin = operation[1:]
+            self._notify_before(CHANGE_RESET, 0, len(columns[0]))
+            self._log_undo((UNDO_RESET, self._slice_columns(0, len(self._names)), self._time_origin))
+            for column, values in zip(self._columns(), columns):
+                column[:] = values
+            self._time_origin = origin
+            self._time_tree = None
+            self._notify(CHANGE_RESET, 0, len(columns[0]))
+        elif kind == UNDO_REORDER:
+            count = len(self._names)
+            self._notify_before(CHANGE_RESET, 0, count)
+            self._reorder_columns(operation[1])
+            self._notify(CHANGE_RESET, 0, count)
+        else:
+            raise ValueError(f"未知的撤销操作: {kind}")
+
+    def _restore_cells(self, first, fields):
+        """把一段行的若干列写回旧数据"""
+        self._write_cells(first, fields)
+
+    def _write_cells(self, first, fields, time_origin=None):
+        """把一段行的若干列整段替换为新数据（记录撤销并发送通知）
+
+        Args:
+            first: 第一行
+            fields: ((列序号, 新数据), ...)，各列数据长度相同
+            time_origin: 新的时间原点，None表示不变
+        """
+        columns = self._columns()
+        fields = tuple((index, list(values) if index == _NAME else _as_column(columns[index].typecode, values))
+                       for index, values in fields)
+        count = len(fields[0][1])
+        end = first + count
+        if end > len(self._names):
+            raise IndexError("event index out of range")
+        self._notify_before(CHANGE_UPDATE, first, count)
+        self._log_set(first, count, [index for index, _ in fields])
+        # 之后的事件平移的距离 = 时间原点的变化 + 相对时间之和的变化
+        shift = 0
+        if time_origin is not None and time_origin != self._time_origin:
+            shift = time_origin - self._time_origin
+            self._log_origin()
+            self._time_origin = time_origin
+        for index, values in fields:
+            if index == _REL_TIME and columns[index][first:end] != values:
+                old_values = _readonly_values(self._rel_times)[first:end]
+                new_values = _readonly_values(values)
+                shift += int(new_values.sum()) - int(old_values.sum())
+                if self._time_tree is not None:
+                    if count <= 64:
+                        for offset, delta in enumerate((new_values - old_values).tolist()):
+                            if delta:
+                                self._time_tree.add(first + offset, delta)
+                    else:
+                        self._time_tree = None
+            columns[index][first:end] = values
+        self._notify(CHANGE_UPDATE, first, count)
+        if shift:
+            self._finish_time_change(end, None)
+
+
+# =============================================================================
+# 不可变快照
+# =============================================================================
+
+class EventSnapshot:
+    """事件存储的不可变快照
+
+    由 EventStore.snapshot() 在修改事件存储的线程（主线程）上一次性复制各列得到，
+    只做内存块拷贝，之后可以在任意线程中只读访问，不受事件存储后续修改的影响，
+    后台线程因此不需要与主线程加锁。
+
+    提供与 EventStore 相同的只读接口（各列、绝对时间、类型名称等），数值列为只读 numpy 数组。
+    version 是拍摄快照时事件存储的版本号，后台线程把它随结果一起返回，
+    主线程据此判断结果是否已过期。
+    """
+
+    def __init__(self, columns, time_origin, version):
+        """初始化快照
+
+        Args:
+            columns: 各列数据的副本，名称列为元组
+            time_origin: 时间原点
+            version: 事件存储版本号
+        """
+        self._columns = columns
+        self._time_origin = time_origin
+        self._version = version
+        self._arrays = tuple(_readonly_values(column) for column in columns[1:])
+        self._abs_times = None
+
+    @property
+    def version(self):
+        """拍摄快照时事件存储的版本号"""
+        return self._version
+
+    @property
+    def columns(self):
+        """各列数据（名称元组和各数值列的 array），可直接交给 EventStore.reset_columns()，请勿修改"""
+        return self._columns
+
+    @property
+    def names(self):
+        return self._columns[_NAME]
+
+    @property
+    def types(self):
+        return self._arrays[_TYPE - 1]
+
+    @property
+    def buttons(self):
+        return self._arrays[_BUTTON - 1]
+
+    @property
+    def keycodes(self):
+        return self._arrays[_KEYCODE - 1]
+
+    @property
+    def xs(self):
+        return self._arrays[_X - 1]
+
+    @property
+    def ys(self):
+        return self._arrays[_Y - 1]
+
+    @property
+    def rel_times(self):
+        return self._arrays[_REL_TIME - 1]
+
+    @property
+    def time_origin(self):
+        return self._time_origin
+
+    @property
+    def abs_times(self):
+        """全部事件的绝对时间（只读 numpy 数组）"""
+        return self.absolute_times()
+
+    def __len__(self):
+        return len(self._columns[_NAME])
+
+    def row_count(self):
+        """获取事件数量"""
+        return len(self._columns[_NAME])
+
+    def absolute_times(self, start=0, end=None):
+        """一段事件的绝对时间（只读 numpy 数组，首次访问时计算全部事件）"""
+        if self._abs_times is None:
+            times = np.cumsum(self.rel_times, dtype=np.int64)
+            times += self._time_origin
+            times.flags.writeable = False
+            self._abs_times = times
+        return self._abs_times[start:end]
+
+    def type_name(self, row):
+        """获取指定行的事件类型字符串"""
+        return type_str_from_codes(int(self.types[row]), int(self.buttons[row]))
+
+    def keycode_text(self, row):
+        """获取指定行的键码文本，没有键码时返回空字符串"""
+        keycode = int(self.keycodes[row])
+        return "" if keycode == NO_KEYCODE else str(keycode)
+
+    def is_current(self, event_store):
+        """事件存储自拍摄快照以来是否没有被修改"""
+        return event_store.version == self._version
+
+
+def columns_from_records(records):
+    """把事件记录列表转换为各列数据
+
+    Args:
+        records: 事件记录列表
+
+    Returns:
+        tuple: (各列数据, 时间原点)，各列与 EventStore.reset_columns() 的参数格式相同
+    """
+    if not records:
+        return ([], array('b'), array('b'), array('q'), array('q'), array('q'), array('q')), 0
+    columns = list(zip(*records))
+    return (
+        list(columns[0]),
+        array('b', columns[1]),
+        array('b', columns[2]),
+        array('q', columns[3]),
+        array('q', columns[4]),
+        array('q', columns[5]),
+        array('q', columns[6])
+    ), columns[7][0] - columns[6][0]
+
+
+def absolute_time_order(times):
+    """按绝对时间稳定排序得到的行号数组
+
+    Args:
+        times: 绝对时间数组
+
+    Returns:
+        numpy.ndarray: 排序后各位置对应的原行号
+    """
+    return np.argsort(np.asarray(times, dtype=np.int64), kind='stable')
+
+
+def _column_values(column):
+    """以 numpy 数组读取整数列（复制）"""
+    return np.array(column, dtype=np.int8 if column.typecode == 'b' else np.int64)
+
+
+def _int_array(typecode, values):
+    """把 numpy 整数数组转换为指定类型的 array"""
+    result = array(typecode)
+    result.frombytes(np.asarray(values, dtype=np.int8 if typecode == 'b' else np.int64).tobytes())
+    return result
+
+
+def _as_column(typecode, values):
+    """把整数序列转换为指定类型的 array（已是该类型时直接返回）"""
+    if isinstance(values, array) and values.typecode == typecode:
+        return values
+    return _int_array(typecode, values)
+
+
+def _readonly_values(column):
+    """以只读 numpy 数组读取整数列（与列共享内存，不复制）"""
+    values = np.frombuffer(column, dtype=np.int8 if column.typecode == 'b' else np.int64)
+    values.flags.writeable = False
+    return values
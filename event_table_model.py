@@ -0,0 +1,339 @@
+# event_table_model.py - 事件表格模型模块
+"""
+事件表格模型模块，提供基于事件存储的虚拟化表格模型。
+
+模型本身不保存任何单元格对象，只在视图请求可见行时按需生成显示文本，
+并把事件存储的变更转换为范围化的 rowsInserted/rowsRemoved/dataChanged 信号。
+提供成对性索引时，成对性有问题的行会以背景色高亮，并在提示中显示问题描述。
+
+设置行过滤器后，模型只暴露过滤结果中的行：视图行号通过升序行号数组映射到存储行号，
+应用或清除过滤只需一次模型重置，不必逐行隐藏。
+
+提供刷新调度器时，插入删除引起的行号刷新和成对性高亮刷新会合并，
+批量修改后只在下一轮事件循环中通知视图一次。
+"""
+
+import numpy as np
+
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex
+from PyQt6.QtGui import QColor
+
+from event_store import (
+    COLUMN_HEADERS, COLUMN_ROW_NUMBER, COLUMN_ABS_TIME,
+    CHANGE_INSERT, CHANGE_REMOVE, CHANGE_UPDATE, CHANGE_RESET, CHANGE_TIMES
+)
+from utils import format_pairing_issue
+from refresh_scheduler import REFRESH_TABLE
+
+# 成对性有问题的行的背景色
+PAIRING_ISSUE_BACKGROUND = QColor(255, 228, 225)
+
+# 部分行重新过滤时，可见性变化超过这么多段连续视图行就改为一次模型重置
+MAX_REFILTER_RUNS = 64
+
+
+class EventTableModel(QAbstractTableModel):
+    """事件表格模型
+
+    将事件存储映射为8列表格（行号 + 7个事件字段），
+    内存占用与事件数量无关，重绘代价只取决于可见行数。
+
+    模型中的行号是视图行号，需要存储行号时请使用 store_row()；
+    序号列始终显示存储中的行号。
+    """
+
+    def __init__(self, event_store, parent=None, pairing_index=None, refresh_scheduler=None):
+        """初始化事件表格模型
+
+        Args:
+            event_store: 事件存储实例
+            parent: 父对象
+            pairing_index: 成对性索引，用于高亮成对性有问题的行
+            refresh_scheduler: 刷新调度器（可选），提供时合并行号和高亮的刷新
+        """
+        super().__init__(parent)
+        self.event_store = event_store
+        self.pairing_index = pairing_index
+        self.refresh_scheduler = refresh_scheduler
+        self._row_numbers_from = None  # 等待刷新行号的第一个视图行
+        self._pairing_dirty = False  # 成对性高亮是否等待刷新
+        self.row_filter = None  # 返回可见行号数组（或None表示全部可见）的函数
+        self._visible_rows = None  # 升序的可见存储行号，None表示不过滤
+        self._pending_view_range = None  # 删除前记录的视图行范围
+        self.event_store.add_pre_listener(self.on_store_about_to_change)
+        self.event_store.add_listener(self.on_store_changed)
+        if refresh_scheduler is not None:
+            refresh_scheduler.register(REFRESH_TABLE, self.refresh_views)
+
+    # -------------------------------------------------------------------------
+    # 行过滤
+    # -------------------------------------------------------------------------
+
+    def set_row_filter(self, row_filter, rows=None):
+        """设置行过滤器并立即应用
+
+        Args:
+            row_filter: 无参函数，返回升序的可见存储行号数组，返回None表示全部可见；
+                传入None清除过滤。事件存储被整体重置后会重新调用它。
+            rows: 已经求出的可见行号（可选），提供时不再调用 row_filter
+        """
+        self.row_filter = row_filter
+        self.beginResetModel()
+        if row_filter is not None and rows is not None:
+            self._visible_rows = np.asarray(rows, dtype=np.int64)
+        else:
+            self._visible_rows = self._evaluate_row_filter()
+        self.endResetModel()
+
+    def _evaluate_row_filter(self):
+        if self.row_filter is None:
+            return None
+        rows = self.row_filter()
+        if rows is None:
+            return None
+        return np.asarray(rows, dtype=np.int64)
+
+    def is_filtered(self):
+        """是否正在过滤"""
+        return self._visible_rows is not None
+
+    def visible_rows(self):
+        """当前可见的存储行号（升序 int64 数组），未过滤时返回None"""
+        return self._visible_rows
+
+    def store_row(self, view_row):
+        """视图行号 -> 存储行号"""
+        if self._visible_rows is None:
+            return view_row
+        return int(self._visible_rows[view_row])
+
+    def store_rows(self, view_rows):
+        """视图行号数组 -> 存储行号数组（int64）"""
+        view_rows = np.asarray(view_rows, dtype=np.int64)
+        if self._visible_rows is None:
+            return view_rows
+        return self._visible_rows[view_rows]
+
+    def view_row(self, store_row):
+        """存储行号 -> 视图行号，该行被过滤掉时返回-1"""
+        if self._visible_rows is None:
+            return store_row
+        position = int(np.searchsorted(self._visible_rows, store_row))
+        if position < len(self._visible_rows) and self._visible_rows[position] == store_row:
+            return position
+        return -1
+
+    def refilter_rows(self, rows, hits):
+        """按重新求值的结果更新部分存储行的可见性
+
+        只对可见性发生变化的行发出 rowsRemoved/rowsInserted，
+        其余行的选中状态和滚动位置不受影响；变化过于分散时改为一次模型重置。
+
+        Args:
+            rows: 重新求值的存储行号（升序 int64 数组）
+            hits: 其中满足过滤条件的行号（升序 int64 数组）
+        """
+        visible = self._visible_rows
+        if visible is None:
+            return
+        # 先隐藏不再满足条件的行，再显示新满足条件的行
+        hidden = np.flatnonzero(np.isin(visible, rows) & ~np.isin(visible, hits))
+        kept = np.delete(visible, hidden)
+        shown = hits[~np.isin(hits, visible)]
+        if not len(hidden) and not len(shown):
+            return
+        hidden_runs = np.split(hidden, np.flatnonzero(np.diff(hidden) != 1) + 1) if len(hidden) else []
+        positions = np.searchsorted(kept, shown)
+        shown_runs = np.split(np.arange(len(shown)), np.flatnonzero(np.diff(positions)) + 1) if len(shown) else []
+        if len(hidden_runs) + len(shown_runs) > MAX_REFILTER_RUNS:
+            self.beginResetModel()
+            self._visible_rows = np.union1d(kept, shown)
+            self.endResetModel()
+            return
+
+        # 从后往前处理，前面的视图行号不受影响
+        for run in reversed(hidden_runs):
+            view_first, view_last = int(run[0]), int(run[-1])
+            self.beginRemoveRows(QModelIndex(), view_first, view_last)
+            visible = self._visible_rows
+            self._visible_rows = np.concatenate((visible[:view_first], visible[view_last + 1:]))
+            self.endRemoveRows()
+        for run in reversed(shown_runs):
+            view_first = int(positions[run[0]])
+            self.beginInsertRows(QModelIndex(), view_first, view_first + len(run) - 1)
+            visible = self._visible_rows
+            self._visible_rows = np.concatenate((visible[:view_first], shown[run], visible[view_first:]))
+            self.endInsertRows()
+
+    def _view_range(self, first, count):
+        """存储行范围 [first, first + count) 中可见行对应的视图行范围 (起, 止)"""
+        if self._visible_rows is None:
+            return first, first + count
+        return (int(np.searchsorted(self._visible_rows, first)),
+                int(np.searchsorted(self._visible_rows, first + count)))
+
+    # -------------------------------------------------------------------------
+    # QAbstractTableModel 接口
+    # -------------------------------------------------------------------------
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        if self._visible_rows is not None:
+            return len(self._visible_rows)
+        return self.event_store.row_count()
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(COLUMN_HEADERS)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+
+        if index.row() >= self.rowCount():
+            return None
+        row = self.store_row(index.row())
+
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self.event_store.display_text(row, index.column())
+        if role == Qt.ItemDataRole.TextAlignmentRole:
+            return Qt.AlignmentFlag.AlignCenter
+        if role == Qt.ItemDataRole.BackgroundRole and self.pairing_index is not None:
+            if self.pairing_index.row_issue(row) is not None:
+                return PAIRING_ISSUE_BACKGROUND
+        elif role == Qt.ItemDataRole.ToolTipRole and self.pairing_index is not None:
+            issue = self.pairing_index.row_issue(row)
+            if issue is not None:
+                return format_pairing_issue(issue)
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return COLUMN_HEADERS[section] if 0 <= section < len(COLUMN_HEADERS) else None
+        if 0 <= section < self.rowCount():
+            return str(self.store_row(section) + 1)
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
+        # 表格只是事件存储的视图，编辑统一通过事件编辑对话框进行
+        return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+
+    # -------------------------------------------------------------------------
+    # 事件存储变更处理
+    # -------------------------------------------------------------------------
+
+    def on_store_about_to_change(self, change, first, count):
+        """事件存储结构变更前回调"""
+        if change == CHANGE_INSERT:
+            # 新插入的事件总是可见
+            view_first = self._view_range(first, 0)[0]
+            self.beginInsertRows(QModelIndex(), view_first, view_first + count - 1)
+        elif change == CHANGE_REMOVE:
+            view_first, view_end = self._view_range(first, count)
+            self._pending_view_range = (view_first, view_end)
+            if view_end > view_first:
+                self.beginRemoveRows(QModelIndex(), view_first, view_end - 1)
+        elif change == CHANGE_RESET:
+            self.beginResetModel()
+
+    def on_store_changed(self, change, first, count):
+        """事件存储变更后回调"""
+        if change == CHANGE_INSERT:
+            view_first = self._view_range(first, 0)[0]
+            if self._visible_rows is not None:
+                visible = self._visible_rows
+                self._visible_rows = np.concatenate((
+                    visible[:view_first],
+                    np.arange(first, first + count, dtype=np.int64),
+                    visible[view_first:] + count
+                ))
+            self.endInsertRows()
+            self.request_row_numbers_refresh(view_first + count)
+        elif change == CHANGE_REMOVE:
+            view_first, view_end = self._pending_view_range
+            self._pending_view_range = None
+            if self._visible_rows is not None:
+                visible = self._visible_rows
+                self._visible_rows = np.concatenate((visible[:view_first], visible[view_end:] - count))
+            if view_end > view_first:
+                self.endRemoveRows()
+            self.request_row_numbers_refresh(view_first)
+        elif change == CHANGE_RESET:
+            # 行号全部失效，按过滤条件重新求可见行
+            self._visible_rows = self._evaluate_row_filter()
+            self.endResetModel()
+            # 重置后视图整体重绘，等待中的刷新不再需要
+            self._row_numbers_from = None
+            self._pairing_dirty = False
+        elif change == CHANGE_UPDATE and count > 0:
+            view_first, view_end = self._view_range(first, count)
+            if view_end > view_first:
+                self.dataChanged.emit(
+                    self.index(view_first, 0),
+                    self.index(view_end - 1, len(COLUMN_HEADERS) - 1)
+                )
+        elif change == CHANGE_TIMES and count > 0:
+            # 只有绝对时间列需要刷新，成对性不受影响
+            view_first, view_end = self._view_range(first, count)
+            if view_end > view_first:
+                self.dataChanged.emit(
+                    self.index(view_first, COLUMN_ABS_TIME),
+                    self.index(view_end - 1, COLUMN_ABS_TIME)
+                )
+            return
+
+        # 一处修改可能改变其他行的成对性，只刷新背景色（视图只重绘可见区域）
+        if self.pairing_index is not None and change != CHANGE_RESET:
+            self.request_pairing_refresh()
+
+    def request_row_numbers_refresh(self, start_row):
+        """从视图行 start_row 开始的行号需要刷新，有调度器时合并到下一轮事件循环"""
+        if self.refresh_scheduler is None:
+            self.emit_row_numbers_changed(start_row)
+            return
+        # 之后的插入删除只会移动更靠后的行，取最小的起始行即可覆盖所有变化
+        if self._row_numbers_from is None or start_row < self._row_numbers_from:
+            self._row_numbers_from = start_row
+        self.refresh_scheduler.invalidate(REFRESH_TABLE)
+
+    def request_pairing_refresh(self):
+        """成对性高亮需要刷新，有调度器时合并到下一轮事件循环"""
+        if self.refresh_scheduler is None:
+            self.emit_pairing_changed()
+            return
+        self._pairing_dirty = True
+        self.refresh_scheduler.invalidate(REFRESH_TABLE)
+
+    def refresh_views(self):
+        """通知视图等待中的行号和成对性高亮变化（由刷新调度器调用）"""
+        start_row, self._row_numbers_from = self._row_numbers_from, None
+        pairing_dirty, self._pairing_dirty = self._pairing_dirty, False
+        if pairing_dirty:
+            self.emit_pairing_changed()
+        if start_row is not None:
+            self.emit_row_numbers_changed(start_row)
+
+    def emit_pairing_changed(self):
+        """成对性高亮可能发生变化"""
+        row_count = self.rowCount()
+        if row_count > 0:
+            self.dataChanged.emit(
+                self.index(0, 0),
+                self.index(row_count - 1, len(COLUMN_HEADERS) - 1),
+                [Qt.ItemDataRole.BackgroundRole, Qt.ItemDataRole.ToolTipRole]
+            )
+
+    def emit_row_numbers_changed(self, start_row):
+        """插入或删除后，后续行的行号发生变化（start_row 为视图行号）"""
+        row_count = self.rowCount()
+        if start_row < row_count:
+            self.dataChanged.emit(
+                self.index(start_row, COLUMN_ROW_NUMBER),
+                self.index(row_count - 1, COLUMN_ROW_NUMBER)
+            )
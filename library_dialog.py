@@ -0,0 +1,219 @@
+# library_dialog.py - 项目库对话框
+"""
+项目库对话框，浏览、检索、添加和打开项目库中的项目。
+
+检索条件直接编译为 SQL 在数据库中执行，输入时即时刷新结果。
+"""
+
+from datetime import datetime
+
+from PyQt6.QtWidgets import (QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QTableWidget,
+                             QTableWidgetItem, QAbstractItemView, QHeaderView)
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QFont
+
+# 导入共享模块
+from styles import UnifiedStyleHelper, ChineseMessageBox, ModernGroupBox, ModernLineEdit, StyledDialog
+from utils import VK_MAPPING, KEY_NAME_MAPPING, get_key_chinese_name, load_icon_universal
+from event_query import QueryError
+from project_library import LibraryQuery
+from debug_tools import get_global_debug_logger
+
+# 表格列标题
+LIBRARY_HEADERS = ["项目名称", "事件数", "单次时长", "预计总时间", "分辨率", "缩放", "常用按键", "更新时间"]
+
+
+def library_key_codes():
+    """项目库查询使用的按键名称（小写） -> 键码，英文名和中文名都可以使用"""
+    key_codes = {}
+    for keycode, key_name in VK_MAPPING.items():
+        key_codes.setdefault(key_name.lower(), keycode)
+        key_codes.setdefault(KEY_NAME_MAPPING.get(key_name, key_name).lower(), keycode)
+    return key_codes
+
+
+def format_duration(time_ms):
+    """格式化时长显示"""
+    if time_ms < 1000:
+        return f"{time_ms:.0f} ms"
+    elif time_ms < 60000:
+        return f"{time_ms / 1000:.1f} s"
+    return f"{time_ms / 60000:.1f} min"
+
+
+class ProjectLibraryDialog(StyledDialog):
+    """项目库对话框"""
+
+    def __init__(self, parent=None, library=None, default_name=""):
+        """初始化项目库对话框
+
+        Args:
+            parent: 主窗口，提供 add_project_to_library() 和 open_library_project()
+            library: ProjectLibrary 实例
+            default_name: 添加当前项目时默认使用的名称
+        """
+        super().__init__(parent)
+        self.main_window = parent
+        self.library = library
+        self.key_codes = library_key_codes()
+        self.projects = []
+        self.debug_logger = get_global_debug_logger()
+        self.setWindowTitle("项目库")
+        self.resize(860, 560)
+        self.setWindowIcon(load_icon_universal())
+
+        self.setup_ui(default_name)
+        self.refresh()
+
+    def setup_ui(self, default_name):
+        """设置UI界面"""
+        main_layout = QVBoxLayout(self)
+        main_layout.setSpacing(12)
+        main_layout.setContentsMargins(20, 15, 20, 15)
+
+        # 标题区域
+        title_label = QLabel("📚 项目库")
+        UnifiedStyleHelper.get_instance().set_smiley_font(title_label, 16, QFont.Weight.Bold)
+        title_label.setStyleSheet(f"color: {UnifiedStyleHelper.get_instance().COLORS['primary']};")
+        title_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        main_layout.addWidget(title_label)
+
+        # 检索区域
+        self.search_input = ModernLineEdit()
+        self.search_input.setPlaceholderText("检索，例如 key:F12>100 events>=1000 scale:150% type:左键按下>20")
+        self.search_input.textChanged.connect(self.refresh)
+        main_layout.addWidget(self.search_input)
+
+        self.status_label = QLabel("")
+        UnifiedStyleHelper.get_instance().set_source_han_font(self.status_label, 9)
+        main_layout.addWidget(self.status_label)
+
+        # 项目列表
+        self.project_table = QTableWidget(0, len(LIBRARY_HEADERS))
+        self.project_table.setHorizontalHeaderLabels(LIBRARY_HEADERS)
+        self.project_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.project_table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.project_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.project_table.verticalHeader().setVisible(False)
+        self.project_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.project_table.setStyleSheet(UnifiedStyleHelper.get_instance().get_table_style())
+        self.project_table.cellDoubleClicked.connect(self.on_open_project)
+        main_layout.addWidget(self.project_table, 1)
+
+        # 添加当前项目
+        add_group = ModernGroupBox("添加当前项目")
+        add_layout = QHBoxLayout(add_group)
+        add_layout.setContentsMargins(15, 20, 15, 12)
+        self.name_input = ModernLineEdit(default_name)
+        self.name_input.setPlaceholderText("项目名称，与已有项目同名时替换")
+        add_layout.addWidget(self.name_input, 1)
+        add_btn = QPushButton("➕ 添加到项目库")
+        add_btn.setStyleSheet(UnifiedStyleHelper.get_instance().get_button_style(accent=True))
+        add_btn.setMinimumHeight(30)
+        add_btn.clicked.connect(self.on_add_project)
+        add_layout.addWidget(add_btn)
+        main_layout.addWidget(add_group)
+
+        # 按钮区域
+        button_layout = QHBoxLayout()
+        button_layout.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        open_btn = QPushButton("📂 打开")
+        open_btn.setStyleSheet(UnifiedStyleHelper.get_instance().get_button_style(accent=True))
+        open_btn.clicked.connect(self.on_open_project)
+        remove_btn = QPushButton("🗑️ 删除")
+        remove_btn.setStyleSheet(UnifiedStyleHelper.get_instance().get_button_style())
+        remove_btn.clicked.connect(self.on_remove_project)
+        close_btn = QPushButton("关闭")
+        close_btn.setStyleSheet(UnifiedStyleHelper.get_instance().get_button_style())
+        close_btn.clicked.connect(self.reject)
+        for button in (open_btn, remove_btn, close_btn):
+            button.setMinimumHeight(30)
+            button_layout.addWidget(button)
+        main_layout.addLayout(button_layout)
+
+    def refresh(self):
+        """按检索条件重新查询项目列表"""
+        try:
+            query = LibraryQuery(self.search_input.text(), self.key_codes)
+        except QueryError as e:
+            # 输入过程中的不完整条件只提示，不清空上一次的结果
+            self.set_status(str(e), error=True)
+            return
+        try:
+            self.projects = self.library.find_projects(query)
+            top_keys = self.library.top_keys([project['id'] for project in self.projects])
+        except Exception as e:
+            self.debug_logger.log_error(f"检索项目库失败: {e}", exc_info=True)
+            self.set_status(f"检索项目库失败: {e}", error=True)
+            return
+
+        table = self.project_table
+        table.setRowCount(len(self.projects))
+        for row, project in enumerate(self.projects):
+            resolution = f"{project['width']}×{project['height']}" if project['width'] and project['height'] else ""
+            keys = "、".join(f"{get_key_chinese_name(keycode)}×{presses}" for keycode, presses in top_keys[project['id']])
+            values = [
+                project['name'],
+                str(project['event_count']),
+                format_duration(project['duration']),
+                format_duration(project['total_time']),
+                resolution,
+                project['scale'] or "",
+                keys,
+                datetime.fromtimestamp(project['updated_at']).strftime('%Y-%m-%d %H:%M')
+            ]
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if column:
+                    item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
+                table.setItem(row, column, item)
+        table.resizeColumnsToContents()
+        self.set_status(f"共 {len(self.projects)} 个项目")
+
+    def set_status(self, text, error=False):
+        """显示检索状态"""
+        color = UnifiedStyleHelper.get_instance().COLORS['error' if error else 'text_secondary']
+        self.status_label.setStyleSheet(f"color: {color};")
+        self.status_label.setText(text)
+
+    def selected_project(self):
+        """当前选中的项目，没有选中时返回None"""
+        row = self.project_table.currentRow()
+        if 0 <= row < len(self.projects):
+            return self.projects[row]
+        return None
+
+    def on_add_project(self):
+        """把当前项目添加到项目库（在持久化线程中写入，完成后刷新列表）"""
+        name = self.name_input.text().strip()
+        if not name:
+            ChineseMessageBox.show_warning(self, "提示", "请输入项目名称")
+            return
+        self.main_window.add_project_to_library(name)
+        self.set_status(f"正在添加项目: {name}")
+
+    def on_open_project(self, *args):
+        """打开选中的项目"""
+        project = self.selected_project()
+        if project is None:
+            ChineseMessageBox.show_warning(self, "提示", "请先选择一个项目")
+            return
+        if self.main_window.open_library_project(project['id'], project['name']):
+            self.accept()
+
+    def on_remove_project(self):
+        """从项目库删除选中的项目"""
+        project = self.selected_project()
+        if project is None:
+            ChineseMessageBox.show_warning(self, "提示", "请先选择一个项目")
+            return
+        if not ChineseMessageBox.show_question(self, "删除项目", f"确定要从项目库删除“{project['name']}”吗？"):
+            return
+        try:
+            self.library.remove_project(project['id'])
+            self.debug_logger.log_info(f"已从项目库删除: {project['name']}")
+        except Exception as e:
+            error_msg = f"删除项目失败: {str(e)}"
+            self.debug_logger.log_error(error_msg)
+            ChineseMessageBox.show_error(self, "错误", error_msg)
+        self.refresh()
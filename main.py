@@ -6,6 +6,7 @@ import time
 import threading
 import json
 import re
+import multiprocessing
 
 # PyQt6 核心组件导入
 from PyQt6.QtWidgets import QApplication
@@ -858,4 +859,6 @@ def main():
 
 # 应用程序入口点
 if __name__ == "__main__":
+    # 打包后的程序中，脚本并行编码的子进程需要先经过 freeze_support 处理
+    multiprocessing.freeze_support()
     sys.exit(main())
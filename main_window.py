@@ -9,8 +9,8 @@ from datetime import datetime
 
 from PyQt6.QtWidgets import (
                             QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
-                            QLabel, QLineEdit, QComboBox, QPushButton, QTableWidget,
-                            QTableWidgetItem, QTextEdit, QFrame, QGroupBox, QGridLayout,
+                            QLabel, QLineEdit, QComboBox, QPushButton, QTableView,
+                            QTextEdit, QFrame, QGroupBox, QGridLayout,
                             QHeaderView, QScrollArea, QSizePolicy, QSplitter,
                             QMessageBox, QStatusBar, QFileDialog, QDialog, QMenu, QMenuBar,
                             QCheckBox)
@@ -27,6 +27,7 @@ from styles import UnifiedStyleHelper, get_global_font_manager, ChineseMessageBo
 from styles import WindowIconMixin, DialogFactory
 
 from utils import VK_MAPPING, KEY_NAME_MAPPING, EVENT_TYPE_MAP, convert_event_type_num_to_str_with_button, generate_key_event_name, load_icon_universal, load_logo, get_current_version, get_current_app_info
+from batch_edit import BatchEdit, EditError, key_event_choices
 
 # 导入关于窗口模块
 
@@ -55,6 +56,20 @@ from script_manager import ScriptManager
 
 from time_analysis import EventTimeAnalyzerDialog
 
+from undo_history import UndoHistory, UndoJournal
+
+from state_log import StateLog
+
+from project_file import capture_state, load_project, save_project, PROJECT_EXTENSION
+
+from project_library import ProjectLibrary, estimate_total_time
+from library_dialog import ProjectLibraryDialog
+from refresh_scheduler import RefreshScheduler, REFRESH_STATS, REFRESH_TOTAL_TIME
+from task_executor import TaskExecutor
+
+from persistence import (PersistenceWorker, update_json_file, STATE_LOG_TASK, STATE_SNAPSHOT_TASK,
+                         SETTINGS_TASK, PROJECT_TASK_PREFIX, LIBRARY_TASK_PREFIX)
+
 # 导入版本管理器
 
 
@@ -80,12 +95,13 @@ class BatchEditDialog(StyledDialog):
     
 
 
-    def __init__(self, parent=None, selected_rows=None, events_table=None):
+    def __init__(self, parent=None, selected_rows=None, event_store=None):
 
         super().__init__(parent)
 
-        self.selected_rows = selected_rows or []
-        self.events_table = events_table
+        self.selected_rows = selected_rows if selected_rows is not None else []
+        self.event_store = event_store
+        self.batch_edit = None
 
         self.setup_ui()
 
@@ -98,7 +114,7 @@ class BatchEditDialog(StyledDialog):
 
         self.setWindowTitle("批量编辑事件")
 
-        self.setFixedSize(485, 400)  # 调整窗口大小，宽度再缩小50px，高度保持不变
+        self.setFixedSize(485, 490)  # 宽度保持不变，高度容纳时间缩放和表达式两行
 
         
 
@@ -186,19 +202,7 @@ class BatchEditDialog(StyledDialog):
 
         # 3. 事件类型替换
         # 提取所有按键事件（使用字典保存，事件名称为键，(event_type, keycode)为值）
-        self.key_events = {}
-        if self.events_table:
-            for row in range(self.events_table.rowCount()):
-                event_name_item = self.events_table.item(row, 1)
-                event_type_item = self.events_table.item(row, 2)
-                keycode_item = self.events_table.item(row, 3)
-                if event_name_item and event_type_item and keycode_item:
-                    event_name = event_name_item.text()
-                    event_type = event_type_item.text()
-                    keycode = keycode_item.text()
-                    if event_type in ["按键按下", "按键释放"] and keycode:
-                        # 只保存每个事件名称对应的事件类型和键码
-                        self.key_events[event_name] = (event_type, keycode)
+        self.key_events = key_event_choices(self.event_store) if self.event_store else {}
         
         # 基本事件类型（移除了"按键按下"和"按键释放"）
         base_event_types = ["鼠标移动", "左键按下", "左键释放", "右键按下", "右键释放", "中键按下", "中键释放", "鼠标滚轮"]
@@ -277,12 +281,42 @@ class BatchEditDialog(StyledDialog):
         
         # 将整个水平布局添加到GridLayout中
         operation_layout.addLayout(unified_coords_layout, 3, 0, 1, 5, Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter)
+
+        # 5. 时间缩放（选中事件的相对时间乘以倍数）
+        time_scale_label = QLabel("时间缩放:")
+        time_scale_label.setFixedWidth(120)
+        self.time_scale_input = ModernDoubleSpinBox()
+        self.time_scale_input.setMinimum(0.01)
+        self.time_scale_input.setMaximum(100)
+        self.time_scale_input.setValue(1)
+        self.time_scale_input.setDecimals(2)
+        self.time_scale_input.setSingleStep(0.1)
+        self.time_scale_input.setFixedWidth(input_width)
+
+        time_scale_label_unit = QLabel("倍")
+        time_scale_label_unit.setFixedWidth(20)
+        time_scale_label_unit.setAlignment(Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignCenter)
+
+        operation_layout.addWidget(time_scale_label, 4, 0)
+        operation_layout.addWidget(self.time_scale_input, 4, 1)
+        operation_layout.addWidget(time_scale_label_unit, 4, 2)
+
+        # 6. 表达式（最后执行）
+        self.expression_input = ModernLineEdit()
+        self.expression_input.setAlignment(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter)
+        self.expression_input.setPlaceholderText("例如 x = x * 1.5; rel = max(rel, 16)")
+        self.expression_input.setToolTip("可读取 x、y、rel、time、key、row，可修改 x、y、rel、time；\n"
+                                         "支持 + - * / // % 和 min、max、abs、round、int，多条语句用分号分隔")
+
+        operation_layout.addWidget(QLabel("表达式:"), 5, 0)
+        operation_layout.addWidget(self.expression_input, 5, 1, 1, 3)
         
         # 将操作选项组添加到主布局
         layout.addWidget(operation_group)
 
         # 添加提示信息
-        hint_label = QLabel("💡 提示：按键事件替换支持将事件列表中已有的按键事件替换为另一个已有的按键事件")
+        hint_label = QLabel("💡 提示：按键事件替换支持将事件列表中已有的按键事件替换为另一个已有的按键事件；\n"
+                            "时间类修改保持未选中事件的绝对时间不变，表达式在其他操作之后执行")
         hint_label.setStyleSheet(f"color: {UnifiedStyleHelper.get_instance().COLORS['text_secondary']}; font-size: 10px; font-style: italic; margin-top: 5px; background-color: transparent;")
         hint_label.setAlignment(Qt.AlignmentFlag.AlignLeft)
         layout.addWidget(hint_label)
@@ -376,9 +410,51 @@ class BatchEditDialog(StyledDialog):
             y = int(self.y_input.text())
         except ValueError:
             y = 0
-        
+
         return apply_coords, x, y
 
+    def get_time_scale(self):
+        """获取时间缩放倍数"""
+        return self.time_scale_input.value()
+
+    def get_expression(self):
+        """获取表达式文本"""
+        return self.expression_input.text().strip()
+
+    def build_batch_edit(self):
+        """根据对话框中的设置生成批量编辑参数
+
+        Raises:
+            EditError: 表达式错误
+        """
+        old_type_info, new_type_info = self.get_type_replacement()
+        apply_coords, x, y = self.get_unified_coordinates()
+        return BatchEdit(
+            offset=self.get_offset_adjustment(),
+            unified_rel_time=self.get_unified_rel_time(),
+            old_type_info=old_type_info,
+            new_type_info=new_type_info,
+            apply_coords=apply_coords,
+            unified_x=x,
+            unified_y=y,
+            time_scale=self.get_time_scale(),
+            expression=self.get_expression()
+        )
+
+    def get_batch_edit(self):
+        """获取确认时生成的批量编辑参数"""
+        return self.batch_edit
+
+    def accept(self):
+        """确认前检查表达式，有错误时提示并保留对话框"""
+        try:
+            self.batch_edit = self.build_batch_edit()
+        except EditError as e:
+            ChineseMessageBox.show_warning(self, "表达式错误", str(e))
+            self.expression_input.setFocus()
+            return
+        super().accept()
+
 
 
 
@@ -768,13 +844,13 @@ class CustomInputDialog(StyledDialog):
 
 
 
-class ModernTableWidget(QTableWidget):
+class ModernTableView(QTableView):
 
-    """现代化的表格控件"""
+    """现代化的表格视图，数据由模型按需提供"""
 
-    def __init__(self, rows=0, columns=0, parent=None):
+    def __init__(self, parent=None):
 
-        super().__init__(rows, columns, parent)
+        super().__init__(parent)
 
         self.setStyleSheet(UnifiedStyleHelper.get_instance().get_table_style())
 
@@ -786,9 +862,12 @@ class ModernTableWidget(QTableWidget):
 
         self.setAlternatingRowColors(False)
 
-        self.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        self.setSelectionBehavior(QTableView.SelectionBehavior.SelectRows)
+
+        self.setSelectionMode(QTableView.SelectionMode.ExtendedSelection)
 
-        self.setSelectionMode(QTableWidget.SelectionMode.ExtendedSelection)
+        # 表格只是事件存储的视图，编辑统一通过事件编辑对话框进行
+        self.setEditTriggers(QTableView.EditTrigger.NoEditTriggers)
 
         self.horizontalHeader().setStretchLastSection(True)
 
@@ -799,7 +878,9 @@ class ModernTableWidget(QTableWidget):
 
         
 
-        # 设置行高
+        # 设置行高（固定行高，避免大数据量时逐行计算尺寸）
+
+        self.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
 
         self.verticalHeader().setDefaultSectionSize(32)
 
@@ -1005,9 +1086,8 @@ class MainWindow(StyledMainWindow, WindowIconMixin):
         # 核心属性初始化
         self.script = None  # 存储生成的脚本
         self.copied_events = []  # 存储复制的事件
-        self.undo_stack = []  # 撤销栈
-        self.redo_stack = []  # 重做栈
-        self.max_undo_steps = 50  # 最大撤销步骤数
+        self.undo_history = None  # 撤销历史，事件管理器创建后初始化
+        self.max_undo_steps = 1000  # 最大撤销步骤数
         self._table_changing = False  # 防止表格变化时的递归调用
         self._batch_operation = False  # 批量操作标志
 
@@ -1031,8 +1111,26 @@ class MainWindow(StyledMainWindow, WindowIconMixin):
 
         # 初始化调试日志记录器
         self.debug_logger = get_global_debug_logger()
+        self._last_total_time_ms = None  # 上一次显示的预计总时间
+        # 界面刷新调度器和后台任务执行器，需在事件管理器之前创建
+        self.refresh_scheduler = RefreshScheduler(self)
+        self.task_executor = TaskExecutor(self)
         # 初始化事件管理器和脚本管理器
         self.event_manager = EventManager(self)
+
+        self.undo_history = UndoHistory(self.event_manager.event_store, self.max_undo_steps)
+
+        # 状态日志：自动保存只追加修改，日志过大时在后台重写状态文件
+        self.state_log = StateLog(self.event_manager.event_store, self.get_app_file_path("BetterGI_StellTrack_state" + PROJECT_EXTENSION))
+        self.state_snapshot_pending = False
+        # 持久化线程：序列化和写文件都在后台按顺序进行
+        self.persistence_worker = PersistenceWorker()
+        self.persistence_worker.task_finished.connect(self.on_persistence_task_finished)
+        self.persistence_worker.task_failed.connect(self.on_persistence_task_failed)
+        # 项目库：多个项目保存在同一个 SQLite 数据库中，可跨项目检索
+        self.project_library = ProjectLibrary(self.get_app_file_path("BetterGI_StellTrack_library.db"))
+        self.library_dialog = None
+        self.current_project_name = ""
         self.script_manager = ScriptManager(self)
         
         # 初始化自动保存定时器
@@ -1138,21 +1236,32 @@ class MainWindow(StyledMainWindow, WindowIconMixin):
 
             self.load_saved_state()
 
+            # 没有可用的状态文件时，第一次保存写入完整的状态文件
+            if not self.state_log.is_open():
+                self.state_log.open(None)
+
             
 
 
             # 如果没有加载到保存的状态，添加示例数据用于测试
 
-            if self.event_manager.events_table.rowCount() == 0:
+            if self.event_manager.event_store.row_count() == 0:
 
                 self.event_manager.add_sample_data()
 
+            # 恢复与加载的事件一致的撤销历史，启动时加载的内容本身不可撤销
+            self.open_undo_journal()
+
             
 
 
             # 窗口显示后设置任务栏图标
             QTimer.singleShot(100, self.fix_taskbar_icon)
             
+            # 统计信息和预计总时间由刷新调度器合并刷新
+            self.refresh_scheduler.register(REFRESH_STATS, self.stats_panel.update_stats)
+            self.refresh_scheduler.register(REFRESH_TOTAL_TIME, self.on_calculate_total_time)
+            
             # 初始化统计信息和预计总时间
             self.stats_panel.update_stats()
             self.on_calculate_total_time()
@@ -1236,6 +1345,19 @@ class MainWindow(StyledMainWindow, WindowIconMixin):
         
 
 
+        # 项目库
+
+        library_action = QAction('项目库', self)
+
+        library_action.setShortcut('Ctrl+L')
+
+        library_action.triggered.connect(self.on_open_library)
+
+        file_menu.addAction(library_action)
+
+        
+
+
         file_menu.addSeparator()
 
         
@@ -1799,45 +1921,15 @@ class MainWindow(StyledMainWindow, WindowIconMixin):
             
 
 
-            # 读取现有设置
-
-            settings = {}
-
-            if os.path.exists(settings_file):
-
-                try:
-
-                    with open(settings_file, 'r', encoding='utf-8') as f:
-
-                        settings = json.load(f)
-
-                except:
-
-                    settings = {}
-
-            
-
-
-            # 更新时间逻辑设置
-
-            settings['delete_logic'] = self.get_delete_logic()
-
-            settings['paste_logic'] = self.get_paste_logic()
-            settings['skip_end_events_prompt'] = self.get_skip_end_events_prompt()
-
-            
-
-
-            # 保存设置
-
-            with open(settings_file, 'w', encoding='utf-8') as f:
-
-                json.dump(settings, f, ensure_ascii=False, indent=2)
-
-            
+            # 在后台合并写入设置文件
 
+            updates = {
+                'delete_logic': self.get_delete_logic(),
+                'paste_logic': self.get_paste_logic(),
+                'skip_end_events_prompt': self.get_skip_end_events_prompt()
+            }
 
-            self.debug_logger.log_info(f"时间逻辑设置已保存: 删除={self.delete_logic}, 粘贴={self.paste_logic}")
+            self.persistence_worker.submit(SETTINGS_TASK, update_json_file, settings_file, updates)
 
         except Exception as e:
 
@@ -2007,7 +2099,11 @@ class MainWindow(StyledMainWindow, WindowIconMixin):
 
         try:
 
-            dialog = EventTimeAnalyzerDialog(self, self.event_manager.events_table)
+            # 正在搜索过滤时，只分析查询命中的事件
+
+            rows = self.event_manager.current_query_rows()
+
+            dialog = EventTimeAnalyzerDialog(self, self.event_manager.event_store, rows)
 
             dialog.exec()
 
@@ -2327,9 +2423,10 @@ class MainWindow(StyledMainWindow, WindowIconMixin):
         
         # 设置面板信号
         self.settings_panel.detect_screen_btn.clicked.connect(self.on_detect_screen_info)
-        self.settings_panel.loop_count_input.valueChanged.connect(self.on_calculate_total_time)
-        self.settings_panel.interval_input.valueChanged.connect(self.on_calculate_total_time)
-        self.settings_panel.time_unit_combo.currentTextChanged.connect(self.on_calculate_total_time)
+        # 统计信息中也显示循环设置，连续调整时合并刷新
+        self.settings_panel.loop_count_input.valueChanged.connect(self.event_manager.update_stats)
+        self.settings_panel.interval_input.valueChanged.connect(self.event_manager.update_stats)
+        self.settings_panel.time_unit_combo.currentTextChanged.connect(self.event_manager.update_stats)
 
 
 
@@ -2428,20 +2525,20 @@ class MainWindow(StyledMainWindow, WindowIconMixin):
 
 
     def on_calculate_total_time(self):
-        """计算并显示总时间"""
+        """计算并显示总时间
+
+        单次循环时间取自事件统计的累计值，不需要计算最后一个事件的绝对时间；
+        结果与上一次相同时不重复更新显示和记录日志。
+        """
         try:
-            if self.event_manager.events_table.rowCount() == 0:
-                self.settings_panel.update_total_time_display(0)
-                return
-                
-            # 获取最后一个事件的绝对时间
-            last_row = self.event_manager.events_table.rowCount() - 1
-            last_abs_time_item = self.event_manager.events_table.item(last_row, 7)
-            if not last_abs_time_item:
-                self.settings_panel.update_total_time_display(0)
+            if self.event_manager.event_store.row_count() == 0:
+                if self._last_total_time_ms != 0:
+                    self._last_total_time_ms = 0
+                    self.settings_panel.update_total_time_display(0)
                 return
                 
-            single_loop_time_ms = int(last_abs_time_item.text()) if last_abs_time_item.text().isdigit() else 0
+            # 获取单次循环时间（最后一个事件的绝对时间）
+            single_loop_time_ms = self.event_manager.event_stats.single_loop_time()
             
             # 获取循环次数
             loop_count = self.settings_panel.get_safe_loop_count()
@@ -2450,16 +2547,11 @@ class MainWindow(StyledMainWindow, WindowIconMixin):
             interval = self.settings_panel.interval_input.value()
             time_unit = self.settings_panel.time_unit_combo.currentText()
             
-            # 转换间隔时间为毫秒
-            if time_unit == "s":
-                interval_ms = interval * 1000
-            elif time_unit == "min":
-                interval_ms = interval * 60000
-            else:  # ms
-                interval_ms = interval
-            
             # 计算总时间：单次循环时间 * 循环次数 + 间隔时间 * (循环次数 - 1)
-            total_time_ms = single_loop_time_ms * loop_count + interval_ms * (loop_count - 1)
+            total_time_ms = estimate_total_time(single_loop_time_ms, loop_count, interval, time_unit)
+            if total_time_ms == self._last_total_time_ms:
+                return
+            self._last_total_time_ms = total_time_ms
             
             # 更新设置面板的总时间显示
             self.settings_panel.update_total_time_display(total_time_ms)
@@ -2469,39 +2561,48 @@ class MainWindow(StyledMainWindow, WindowIconMixin):
             error_msg = f"计算总时间失败: {str(e)}"
             self.debug_logger.log_error(error_msg)
             # 显示错误信息但不崩溃
+            self._last_total_time_ms = None
             self.settings_panel.update_total_time_display(0)
 
 
 
 
     def save_state_to_undo_stack(self):
-        """保存当前状态到撤销栈"""
+        """设置撤销检查点，此前的修改合并为一个撤销步骤
+
+        撤销历史只记录每次修改的逆操作，不再复制整个事件列表。
+        """
         if self._batch_operation:
             # 如果是批量操作，暂时不保存状态
             return
             
-        # 添加到撤销栈
-        state = {
-            'events': []
-        }
-        
-        # 收集事件数据
-        for row in range(self.event_manager.events_table.rowCount()):
-            event_data = []
-            for col in range(1, 8):  # 跳过行号列
-                item = self.event_manager.events_table.item(row, col)
-                event_data.append(item.text() if item else "")
-            state['events'].append(event_data)
-        
-        # 限制撤销栈大小
-        self.undo_stack.append(state)
-        if len(self.undo_stack) > self.max_undo_steps:
-            self.undo_stack.pop(0)
-        
-        # 清空重做栈
-        self.redo_stack.clear()
-        
-        self.debug_logger.log_info(f"状态已保存到撤销栈，当前撤销栈大小: {len(self.undo_stack)}")
+        if self.undo_history.checkpoint():
+            self.debug_logger.log_info(f"已生成撤销步骤，当前撤销栈大小: {self.undo_history.undo_count()}")
+
+
+
+
+    def get_app_file_path(self, filename):
+        """获取程序所在目录下的文件路径"""
+        if getattr(sys, 'frozen', False):
+            app_dir = os.path.dirname(sys.executable)
+        else:
+            app_dir = os.path.dirname(os.path.abspath(__file__))
+        return os.path.join(app_dir, filename)
+
+
+
+
+    def open_undo_journal(self):
+        """把撤销历史保存到磁盘日志，并恢复上次退出前的撤销历史"""
+        journal_file = self.get_app_file_path("BetterGI_StellTrack_undo.journal")
+        try:
+            restored = self.undo_history.use_journal(UndoJournal(journal_file))
+            self.debug_logger.log_info(f"已打开撤销日志 {journal_file}，恢复 {restored} 个撤销步骤")
+        except Exception as e:
+            # 无法使用日志时撤销历史保留在内存中
+            self.undo_history.clear()
+            self.debug_logger.log_error(f"打开撤销日志失败: {e}", exc_info=True)
 
 
 
@@ -2529,25 +2630,12 @@ class MainWindow(StyledMainWindow, WindowIconMixin):
 
     def on_undo(self):
         """撤销操作"""
-        if not self.undo_stack:
+        if not self.undo_history.can_undo():
             self.status_bar.showMessage("⚠️ 没有可撤销的操作")
             return
             
-        # 保存当前状态到重做栈
-        current_state = {
-            'events': []
-        }
-        for row in range(self.event_manager.events_table.rowCount()):
-            event_data = []
-            for col in range(1, 8):  # 跳过行号列
-                item = self.event_manager.events_table.item(row, col)
-                event_data.append(item.text() if item else "")
-            current_state['events'].append(event_data)
-        self.redo_stack.append(current_state)
-        
-        # 恢复上一个状态
-        previous_state = self.undo_stack.pop()
-        self._restore_state(previous_state)
+        # 按记录的逆操作还原最近一个撤销步骤
+        self._apply_history(self.undo_history.undo)
         
         # 保存状态到文件
         self.save_saved_state()
@@ -2560,25 +2648,12 @@ class MainWindow(StyledMainWindow, WindowIconMixin):
 
     def on_redo(self):
         """重做操作"""
-        if not self.redo_stack:
+        if not self.undo_history.can_redo():
             self.status_bar.showMessage("⚠️ 没有可重做的操作")
             return
             
-        # 保存当前状态到撤销栈
-        current_state = {
-            'events': []
-        }
-        for row in range(self.event_manager.events_table.rowCount()):
-            event_data = []
-            for col in range(1, 8):  # 跳过行号列
-                item = self.event_manager.events_table.item(row, col)
-                event_data.append(item.text() if item else "")
-            current_state['events'].append(event_data)
-        self.undo_stack.append(current_state)
-        
-        # 恢复下一个状态
-        next_state = self.redo_stack.pop()
-        self._restore_state(next_state)
+        # 重新执行最近撤销的步骤
+        self._apply_history(self.undo_history.redo)
         
         # 保存状态到文件
         self.save_saved_state()
@@ -2589,26 +2664,17 @@ class MainWindow(StyledMainWindow, WindowIconMixin):
 
 
 
-    def _restore_state(self, state):
-        """恢复状态"""
-        # 清空当前事件
-        self.event_manager.events_table.setRowCount(0)
-        
+    def _apply_history(self, action):
+        """执行撤销或重做"""
         # 开始批量操作
         self._batch_operation = True
         
         try:
-            # 恢复事件
-            for i, event_data in enumerate(state['events']):
-                # 创建行数据，包括行号
-                row_data = [str(i + 1)] + event_data
-                self.event_manager.add_table_row(row_data)
+            # 还原事件
+            action()
             
-            # 更新统计信息
+            # 更新统计信息和预计总时间
             self.event_manager.update_stats()
-            
-            # 立即更新预计总时间
-            self.on_calculate_total_time()
         finally:
             # 结束批量操作
             self._batch_operation = False
@@ -2624,7 +2690,7 @@ class MainWindow(StyledMainWindow, WindowIconMixin):
             return
             
         # 清空当前事件
-        self.event_manager.events_table.setRowCount(0)
+        self.event_manager.event_store.clear()
         
         # 保存当前状态到撤销栈
         self.save_state_to_undo_stack()
@@ -2632,8 +2698,8 @@ class MainWindow(StyledMainWindow, WindowIconMixin):
         # 保存状态到文件
         self.save_saved_state()
         
-        # 立即更新预计总时间
-        self.on_calculate_total_time()
+        # 更新统计信息和预计总时间
+        self.event_manager.update_stats()
         
         self.status_bar.showMessage("✅ 已新建文件")
         self.debug_logger.log_info("已新建文件")
@@ -2653,20 +2719,17 @@ class MainWindow(StyledMainWindow, WindowIconMixin):
             self, 
             "打开文件", 
             "", 
-            "BetterGI StellTrack 文件 (*.json);;所有文件 (*.*)"
+            f"BetterGI StellTrack 文件 (*{PROJECT_EXTENSION} *.json);;所有文件 (*.*)"
         )
         
         if not file_path:
             return
             
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                state = json.load(f)
-            
-            # 清空当前事件
-            self.event_manager.events_table.setRowCount(0)
+            # 二进制项目文件内存映射加载，JSON文件整体读取后按列转换
+            project = load_project(file_path)
             
-            # 保存当前状态到撤销栈
+            # 设置撤销检查点，打开的文件替换当前事件后可以整体撤销
             self.save_state_to_undo_stack()
             
             # 开始批量操作
@@ -2674,17 +2737,12 @@ class MainWindow(StyledMainWindow, WindowIconMixin):
             
             try:
                 # 恢复事件
-                for i, event_data in enumerate(state['events']):
-                    # 创建行数据，包括行号
-                    row_data = [str(i + 1)] + event_data
-                    self.event_manager.add_table_row(row_data)
+                self.event_manager.event_store.reset_columns(project['columns'], project['origin'])
                 
                 # 更新统计信息
                 self.event_manager.update_stats()
                 
-                # 立即更新预计总时间
-                self.on_calculate_total_time()
-                
+                self.current_project_name = os.path.splitext(os.path.basename(file_path))[0]
                 self.status_bar.showMessage(f"✅ 已打开文件: {os.path.basename(file_path)}")
                 self.debug_logger.log_info(f"已打开文件: {file_path}")
             finally:
@@ -2711,40 +2769,21 @@ class MainWindow(StyledMainWindow, WindowIconMixin):
             self, 
             "保存文件", 
             "", 
-            "BetterGI StellTrack 文件 (*.json);;所有文件 (*.*)"
+            f"BetterGI StellTrack 项目 (*{PROJECT_EXTENSION});;BetterGI StellTrack JSON 文件 (*.json);;所有文件 (*.*)"
         )
         
         if not file_path:
             return
+        if not os.path.splitext(file_path)[1]:
+            file_path += PROJECT_EXTENSION
             
         try:
-            # 构建状态数据
-            state = {
-                'events': [],
-                'settings': {
-                    'loop_count': self.settings_panel.loop_count_input.value(),
-                    'interval': self.settings_panel.interval_input.value(),
-                    'time_unit': self.settings_panel.time_unit_combo.currentText(),
-                    'width': self.settings_panel.width_input.text(),
-                    'height': self.settings_panel.height_input.text(),
-                    'scale': self.settings_panel.scale_combo.currentText()
-                }
-            }
-            
-            # 收集事件数据
-            for row in range(self.event_manager.events_table.rowCount()):
-                event_data = []
-                for col in range(1, 8):  # 跳过行号列
-                    item = self.event_manager.events_table.item(row, col)
-                    event_data.append(item.text() if item else "")
-                state['events'].append(event_data)
+            # 复制当前状态，序列化和写入在持久化线程中完成
+            snapshot = capture_state(self.event_manager.event_store, self.collect_state_settings())
+            self.persistence_worker.submit(PROJECT_TASK_PREFIX + file_path, save_project, file_path, snapshot)
             
-            # 保存到文件
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(state, f, ensure_ascii=False, indent=2)
-            
-            self.status_bar.showMessage(f"✅ 已保存文件: {os.path.basename(file_path)}")
-            self.debug_logger.log_info(f"已保存文件: {file_path}")
+            self.current_project_name = os.path.splitext(os.path.basename(file_path))[0]
+            self.status_bar.showMessage(f"正在保存文件: {os.path.basename(file_path)}")
             # 保存状态到文件
             self.save_saved_state()
         except Exception as e:
@@ -2755,48 +2794,109 @@ class MainWindow(StyledMainWindow, WindowIconMixin):
 
 
 
+    def on_open_library(self):
+        """打开项目库对话框"""
+        try:
+            self.library_dialog = ProjectLibraryDialog(self, self.project_library, self.current_project_name)
+            self.library_dialog.exec()
+        except Exception as e:
+            error_msg = f"打开项目库失败: {str(e)}"
+            self.debug_logger.log_error(error_msg, exc_info=True)
+            ChineseMessageBox.show_error(self, "错误", error_msg)
+        finally:
+            self.library_dialog = None
+
+
+
+
+    def add_project_to_library(self, name):
+        """把当前项目添加到项目库，写入在持久化线程中进行"""
+        snapshot = capture_state(self.event_manager.event_store, self.collect_state_settings())
+        self.persistence_worker.submit(LIBRARY_TASK_PREFIX + name, self.project_library.add_project, name, snapshot)
+        self.current_project_name = name
+        self.status_bar.showMessage(f"正在添加到项目库: {name}")
+
+
+
+
+    def open_library_project(self, project_id, name):
+        """从项目库打开项目
+
+        Returns:
+            bool: 是否成功打开
+        """
+        try:
+            project = self.project_library.load_project(project_id)
+        except Exception as e:
+            error_msg = f"从项目库打开项目失败: {str(e)}"
+            self.debug_logger.log_error(error_msg, exc_info=True)
+            ChineseMessageBox.show_error(self, "错误", error_msg)
+            return False
+        
+        # 设置撤销检查点，打开的项目替换当前事件后可以整体撤销
+        self.save_state_to_undo_stack()
+        self._batch_operation = True
+        try:
+            self.event_manager.event_store.reset_columns(project['columns'], project['origin'])
+            settings = project['meta'].get('settings')
+            if settings:
+                self.settings_panel.restore_settings(settings)
+            self.event_manager.update_stats()
+            self.current_project_name = name
+            self.status_bar.showMessage(f"✅ 已从项目库打开: {name}")
+            self.debug_logger.log_info(f"已从项目库打开: {name}，包含 {len(project['columns'][0])} 个事件")
+        finally:
+            self._batch_operation = False
+            self.save_saved_state()
+        return True
+
+
+
+
     def load_saved_state(self):
         """加载保存的状态"""
         try:
-            # 获取程序所在目录
-            if getattr(sys, 'frozen', False):
-                app_dir = os.path.dirname(sys.executable)
-            else:
-                app_dir = os.path.dirname(os.path.abspath(__file__))
-            
-            # 设置文件路径
-            state_file = os.path.join(app_dir, "BetterGI_StellTrack_state.json")
+            state_file = self.state_log.path
+            # 旧版本的状态文件是JSON格式，加载后改写为二进制格式
+            legacy_file = self.get_app_file_path("BetterGI_StellTrack_state.json")
+            if os.path.exists(state_file):
+                if os.path.exists(legacy_file):
+                    os.remove(legacy_file)
+            elif os.path.exists(legacy_file):
+                state_file = legacy_file
             self.debug_logger.log_info(f"尝试从 {state_file} 加载保存的状态")
             
             if os.path.exists(state_file):
                 try:
-                    with open(state_file, 'r', encoding='utf-8') as f:
-                        state = json.load(f)
+                    project = load_project(state_file)
+                    meta = project['meta']
                     
-                    # 验证状态数据的完整性
-                    if isinstance(state, dict) and 'events' in state and isinstance(state['events'], list):
-                        # 恢复事件
-                        event_count = len(state['events'])
-                        self.debug_logger.log_info(f"开始恢复 {event_count} 个事件")
-                        
-                        for i, event_data in enumerate(state['events']):
-                            # 创建行数据，包括行号
-                            row_data = [str(i + 1)] + event_data
-                            self.event_manager.add_table_row(row_data)
-                        
-                        # 加载设置
-                        if 'settings' in state:
-                            self.settings_panel.restore_settings(state['settings'])
-                            self.debug_logger.log_info(f"已成功加载保存的设置")
-                        
-                        self.debug_logger.log_info(f"已成功加载保存的状态，包含 {event_count} 个事件")
-                        return True
-                    else:
-                        self.debug_logger.log_error(f"状态文件格式不正确，缺少必要的events字段或格式错误")
-                        return False
+                    # 恢复事件
+                    event_count = len(project['columns'][0])
+                    self.debug_logger.log_info(f"开始恢复 {event_count} 个事件")
+                    self.event_manager.event_store.reset_columns(project['columns'], project['origin'])
+                    
+                    # 重放状态文件之后的修改日志
+                    settings = self.state_log.open(meta.get('wal_generation', 0), meta.get('settings'))
+                    if settings is None:
+                        settings = meta.get('settings')
+                    if state_file == legacy_file:
+                        self.state_log.request_snapshot()
+                    event_count = self.event_manager.event_store.row_count()
+                    
+                    # 加载设置
+                    if settings is not None:
+                        self.settings_panel.restore_settings(settings)
+                        self.debug_logger.log_info(f"已成功加载保存的设置")
+                    
+                    self.debug_logger.log_info(f"已成功加载保存的状态，包含 {event_count} 个事件")
+                    return True
                 except json.JSONDecodeError as e:
                     self.debug_logger.log_error(f"解析状态文件失败: {e}")
                     return False
+                except ValueError as e:
+                    self.debug_logger.log_error(f"状态文件格式不正确: {e}")
+                    return False
                 except Exception as e:
                     self.debug_logger.log_error(f"恢复事件数据失败: {e}", exc_info=True)
                     return False
@@ -2810,68 +2910,42 @@ class MainWindow(StyledMainWindow, WindowIconMixin):
 
 
 
+    def collect_state_settings(self):
+        """收集需要随状态保存的设置"""
+        return {
+            'loop_count': self.settings_panel.loop_count_input.value(),
+            'interval': self.settings_panel.interval_input.value(),
+            'time_unit': self.settings_panel.time_unit_combo.currentText(),
+            'width': self.settings_panel.width_input.text(),
+            'height': self.settings_panel.height_input.text(),
+            'scale': self.settings_panel.scale_combo.currentText()
+        }
+
+
+
+
     def save_saved_state(self):
-        """保存当前状态到文件"""
+        """保存当前状态
+
+        上次保存之后的修改在持久化线程中追加到状态日志，没有修改时不写入；
+        日志增长到一定大小后，在持久化线程中重写完整的状态文件。
+        """
         try:
-            # 获取程序所在目录
-            if getattr(sys, 'frozen', False):
-                app_dir = os.path.dirname(sys.executable)
-            else:
-                app_dir = os.path.dirname(os.path.abspath(__file__))
-            
-            # 设置文件路径
-            state_file = os.path.join(app_dir, "BetterGI_StellTrack_state.json")
-            self.debug_logger.log_info(f"尝试将状态保存到 {state_file}")
-            
-            # 构建状态数据
-            state = {
-                'events': [],
-                'settings': {
-                    'loop_count': self.settings_panel.loop_count_input.value(),
-                    'interval': self.settings_panel.interval_input.value(),
-                    'time_unit': self.settings_panel.time_unit_combo.currentText(),
-                    'width': self.settings_panel.width_input.text(),
-                    'height': self.settings_panel.height_input.text(),
-                    'scale': self.settings_panel.scale_combo.currentText()
-                }
-            }
-            
-            # 收集事件数据
-            table_row_count = self.event_manager.events_table.rowCount()
-            self.debug_logger.log_info(f"开始收集 {table_row_count} 个事件的数据")
-            
-            for row in range(table_row_count):
-                event_data = []
-                for col in range(1, 8):  # 跳过行号列
-                    item = self.event_manager.events_table.item(row, col)
-                    event_data.append(item.text() if item else "")
-                state['events'].append(event_data)
-            
-            # 验证收集的数据
-            collected_event_count = len(state['events'])
-            if collected_event_count != table_row_count:
-                self.debug_logger.log_error(f"收集事件数据时出现不一致: 表格中有 {table_row_count} 行，但只收集到 {collected_event_count} 个事件")
-                return False
-            
-            # 确保目录存在
-            state_dir = os.path.dirname(state_file)
-            if not os.path.exists(state_dir):
-                os.makedirs(state_dir)
-                self.debug_logger.log_info(f"已创建状态文件目录: {state_dir}")
-            
-            # 保存到文件
-            try:
-                with open(state_file, 'w', encoding='utf-8') as f:
-                    json.dump(state, f, ensure_ascii=False, indent=2)
-                
-                self.debug_logger.log_info(f"状态已成功保存到文件: {state_file}，包含 {collected_event_count} 个事件")
-                return True
-            except IOError as e:
-                self.debug_logger.log_error(f"写入状态文件失败: {e}")
-                return False
-            except json.JSONDecodeError as e:
-                self.debug_logger.log_error(f"序列化状态数据失败: {e}")
-                return False
+            settings = self.collect_state_settings()
+            worker = self.persistence_worker
+            if self.state_log.needs_snapshot() and not self.state_snapshot_pending:
+                snapshot = self.state_log.begin_snapshot(settings)
+                # 旧一代日志必须先写完，再写入快照并删除旧日志
+                worker.submit(STATE_LOG_TASK, self.state_log.write_staged)
+                worker.submit(STATE_SNAPSHOT_TASK, self.state_log.write_snapshot, snapshot)
+                self.state_snapshot_pending = True
+                self.debug_logger.log_info(f"开始在后台重写状态文件 {snapshot['path']}，包含 {len(snapshot['columns'][0])} 个事件")
+            elif self.state_log.stage(settings):
+                worker.submit(STATE_LOG_TASK, self.state_log.write_staged)
+            
+            # 撤销日志记录保存点，重启后据此恢复撤销历史
+            self.undo_history.mark_saved()
+            return True
         except Exception as e:
             self.debug_logger.log_error(f"保存状态到文件失败: {e}", exc_info=True)
             return False
@@ -2879,6 +2953,56 @@ class MainWindow(StyledMainWindow, WindowIconMixin):
 
 
 
+    def on_persistence_task_finished(self, key, result):
+        """持久化任务完成回调"""
+        if key == STATE_SNAPSHOT_TASK:
+            snapshot, size = result
+            self.state_log.finish_snapshot(snapshot, size)
+            self.state_snapshot_pending = False
+            self.debug_logger.log_info(f"状态文件已重写: {snapshot['path']}，{size} 字节")
+        elif key == STATE_LOG_TASK:
+            if result:
+                self.debug_logger.log_info(f"已将修改追加到状态日志，{result} 字节")
+        elif key == SETTINGS_TASK:
+            self.debug_logger.log_info(f"时间逻辑设置已保存: 删除={self.delete_logic}, 粘贴={self.paste_logic}")
+        elif key.startswith(PROJECT_TASK_PREFIX):
+            file_path = key[len(PROJECT_TASK_PREFIX):]
+            self.status_bar.showMessage(f"✅ 已保存文件: {os.path.basename(file_path)}")
+            self.debug_logger.log_info(f"已保存文件: {file_path}")
+        elif key.startswith(LIBRARY_TASK_PREFIX):
+            name = key[len(LIBRARY_TASK_PREFIX):]
+            self.status_bar.showMessage(f"✅ 已添加到项目库: {name}")
+            self.debug_logger.log_info(f"已添加到项目库: {name}（编号 {result}）")
+            if self.library_dialog is not None:
+                self.library_dialog.refresh()
+
+
+
+
+    def on_persistence_task_failed(self, key, error_msg):
+        """持久化任务失败回调"""
+        if key == STATE_SNAPSHOT_TASK:
+            # 旧日志仍然保留，状态不会丢失，日志继续增长后会再次重写
+            self.state_snapshot_pending = False
+            self.debug_logger.log_error(f"写入状态文件失败: {error_msg}")
+        elif key == STATE_LOG_TASK:
+            self.debug_logger.log_error(f"追加状态日志失败: {error_msg}")
+        elif key == SETTINGS_TASK:
+            self.debug_logger.log_error(f"保存时间逻辑设置失败: {error_msg}")
+        elif key.startswith(LIBRARY_TASK_PREFIX):
+            error_msg = f"添加到项目库失败: {error_msg}"
+            self.status_bar.showMessage(f"❌ {error_msg}")
+            self.debug_logger.log_error(error_msg)
+            ChineseMessageBox.show_error(self.library_dialog or self, "错误", error_msg)
+        elif key.startswith(PROJECT_TASK_PREFIX):
+            error_msg = f"保存文件失败: {error_msg}"
+            self.status_bar.showMessage(f"❌ {error_msg}")
+            self.debug_logger.log_error(error_msg)
+            ChineseMessageBox.show_error(self, "错误", error_msg)
+
+
+
+
     def on_add_event(self):
         """添加事件 - 调用事件管理器"""
         self.event_manager.on_add_event()
@@ -2996,8 +3120,14 @@ class MainWindow(StyledMainWindow, WindowIconMixin):
     def closeEvent(self, event):
         """关闭事件 - 确保状态保存"""
         self.debug_logger.log_info("主窗口关闭中...")
+        # 未合并的修改作为最后一个撤销步骤
+        self.save_state_to_undo_stack()
         # 保存当前状态到文件
         self.save_saved_state()
+        # 取消进行中的后台计算，等待排队的保存任务全部写完
+        self.task_executor.shutdown()
+        self.persistence_worker.stop()
+        self.undo_history.close()
         self.debug_logger.log_info("程序正常关闭")
         event.accept()
 
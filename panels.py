@@ -7,10 +7,13 @@ from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel,
                             QLineEdit, QComboBox, QPushButton, QGroupBox, 
                             QTextEdit, QGridLayout, QDialog)
 from PyQt6.QtCore import Qt
-from PyQt6.QtGui import QIntValidator
+from PyQt6.QtGui import QIntValidator, QTextCursor
 
 from styles import UnifiedStyleHelper
 from styles import ModernGroupBox, ModernLineEdit, ModernComboBox, ModernSpinBox, ModernDoubleSpinBox, ChineseMessageBox, DialogFactory
+from script_engine import PREVIEW_MAX_EVENTS
+from event_index import estimate_total_time
+from refresh_scheduler import REFRESH_TOTAL_TIME
 from debug_tools import get_global_debug_logger
 
 # =============================================================================
@@ -314,7 +317,13 @@ class OperationsPanel(QWidget):
             script_text = QTextEdit()
             script_text.setReadOnly(True)
             script_text.setStyleSheet(UnifiedStyleHelper.get_instance().get_script_text_style())
-            script_text.setPlainText(json.dumps(self.parent_window.script, ensure_ascii=False, indent=2))
+            # 大脚本只展示前若干个事件，避免一次性展开全部循环
+            script = self.parent_window.script
+            preview_text = json.dumps(script.to_dict(max_events=PREVIEW_MAX_EVENTS), ensure_ascii=False, indent=2)
+            if script.event_count() > PREVIEW_MAX_EVENTS:
+                preview_text = (f"// 脚本共 {script.event_count()} 个事件，此处仅预览前 {PREVIEW_MAX_EVENTS} 个\n"
+                                + preview_text)
+            script_text.setPlainText(preview_text)
             layout.addWidget(script_text)
             
             # 使用DialogFactory创建关闭按钮布局
@@ -373,6 +382,8 @@ class StatsPanel(QWidget):
         super().__init__(parent)
         self.parent_window = parent  # 保存父窗口引用，避免使用main_window命名
         self.debug_logger = get_global_debug_logger()
+        self._stats_values = None  # 上一次显示的统计值
+        self._stats_lines = None  # 上一次显示的文本行
         self.setup_ui()
     
     def setup_ui(self):
@@ -412,7 +423,11 @@ class StatsPanel(QWidget):
         layout.addWidget(group)
     
     def update_stats(self):
-        """更新统计信息"""
+        """更新统计信息
+
+        事件统计来自 EventManager.event_stats 的累计值，与事件总数无关；
+        统计值没有变化时不重新生成文本，有变化时只替换内容不同的行。
+        """
         try:
             if not self.parent_window:
                 return
@@ -425,93 +440,76 @@ class StatsPanel(QWidget):
                 self.debug_logger.log_warning("无法获取事件管理器或设置面板")
                 return
             
-            row_count = event_manager.events_table.rowCount()
-            
-            # 计算单次循环总时间
-            single_loop_time_ms = self.calculate_single_loop_time_ms(event_manager)
+            stats = event_manager.event_stats.snapshot()
             
             # 获取循环次数 - 使用安全获取方法
             loop_count = settings_panel.get_safe_loop_count()
             
             # 获取间隔时间
             interval = settings_panel.interval_input.value()
-            
             time_unit = settings_panel.time_unit_combo.currentText()
-            if time_unit == "s":
-                interval_ms = interval * 1000
-            elif time_unit == "min":
-                interval_ms = interval * 60000
-            else:  # ms
-                interval_ms = interval
-            
-            # 计算总执行时间
-            total_time_ms = self.calculate_total_time_ms(single_loop_time_ms, loop_count, interval_ms)
-            
-            # 统计各类事件数量
-            key_press_count, key_release_count, mouse_move_count, mouse_click_count = self.count_events(event_manager)
             
             # 获取窗口设置
             width = settings_panel.width_input.text() or "1920"
             height = settings_panel.height_input.text() or "1080"
             scale = settings_panel.scale_combo.currentText()
             
-            # 计算时间分布
-            avg_interval = 0
-            if row_count > 1:
-                avg_interval = single_loop_time_ms / (row_count - 1)
-            
-            # 生成统计信息文本
-            stats_text = self.generate_stats_text(
-                row_count,
-                key_press_count,
-                key_release_count,
-                mouse_move_count,
-                mouse_click_count,
-                single_loop_time_ms,
-                total_time_ms,
-                avg_interval,
-                loop_count,
-                interval,
-                time_unit,
-                width,
-                height,
-                scale
-            )
-            
-            self.stats_text.setPlainText(stats_text)
+            values = (stats['event_count'], stats['key_press'], stats['key_release'], stats['mouse_move'],
+                      stats['mouse_click'], stats['single_loop_time'], loop_count, interval, time_unit,
+                      width, height, scale)
+            if values != self._stats_values:
+                # 计算总执行时间
+                total_time_ms = estimate_total_time(stats['single_loop_time'], loop_count, interval, time_unit)
+                
+                # 生成统计信息文本
+                stats_text = self.generate_stats_text(
+                    stats['event_count'],
+                    stats['key_press'],
+                    stats['key_release'],
+                    stats['mouse_move'],
+                    stats['mouse_click'],
+                    stats['single_loop_time'],
+                    total_time_ms,
+                    stats['avg_interval'],
+                    loop_count,
+                    interval,
+                    time_unit,
+                    width,
+                    height,
+                    scale
+                )
+                self.render_stats_text(stats_text)
+                self._stats_values = values
             
-            # 同时更新预计总时间标签
-            if hasattr(self.parent_window, 'on_calculate_total_time'):
+            # 同时更新预计总时间标签（有刷新调度器时在同一轮刷新中进行）
+            refresh_scheduler = getattr(self.parent_window, 'refresh_scheduler', None)
+            if refresh_scheduler is not None:
+                refresh_scheduler.invalidate(REFRESH_TOTAL_TIME)
+            elif hasattr(self.parent_window, 'on_calculate_total_time'):
                 self.parent_window.on_calculate_total_time()
             
         except Exception as e:
             error_msg = f"更新统计信息时出错: {e}"
             self.debug_logger.log_error(error_msg)
-            self.stats_text.setPlainText(f"统计信息更新失败: {error_msg}")
+            self.update_stats_display(f"统计信息更新失败: {error_msg}")
     
-    def count_events(self, event_manager):
-        """统计各类事件数量"""
-        key_press_count = 0
-        key_release_count = 0
-        mouse_move_count = 0
-        mouse_click_count = 0
-        
-        for row in range(event_manager.events_table.rowCount()):
-            type_item = event_manager.events_table.item(row, 2)  # 事件类型列
-            if type_item:
-                event_type = type_item.text()
-                if event_type == "按键按下":
-                    key_press_count += 1
-                elif event_type == "按键释放":
-                    key_release_count += 1
-                elif event_type == "鼠标移动":
-                    mouse_move_count += 1
-                elif event_type in ["左键按下", "左键释放", "右键按下", "右键释放", "中键按下", "中键释放"]:
-                    mouse_click_count += 1
-                elif event_type == "鼠标滚轮":
-                    mouse_move_count += 1
-        
-        return key_press_count, key_release_count, mouse_move_count, mouse_click_count
+    def render_stats_text(self, stats_text):
+        """显示统计信息文本，行数不变时只替换内容不同的行"""
+        lines = stats_text.split("\n")
+        old_lines = self._stats_lines
+        document = self.stats_text.document()
+        if old_lines is None or len(old_lines) != len(lines) or document.blockCount() != len(lines):
+            self.stats_text.setPlainText(stats_text)
+        else:
+            cursor = QTextCursor(document)
+            cursor.beginEditBlock()
+            for number, (old_line, line) in enumerate(zip(old_lines, lines)):
+                if line != old_line:
+                    cursor.setPosition(document.findBlockByNumber(number).position())
+                    cursor.movePosition(QTextCursor.MoveOperation.EndOfBlock, QTextCursor.MoveMode.KeepAnchor)
+                    cursor.insertText(line)
+            cursor.endEditBlock()
+        self._stats_lines = lines
     
     def generate_stats_text(self, row_count, key_press_count, key_release_count, mouse_move_count, 
                           mouse_click_count, single_loop_time_ms, total_time_ms, avg_interval, 
@@ -558,32 +556,8 @@ class StatsPanel(QWidget):
             minutes = time_ms / 60000
             return f"{time_ms:.0f} ms ({minutes:.1f} min)"
     
-    def calculate_single_loop_time_ms(self, event_manager):
-        """计算单次循环的总时间（毫秒）"""
-        try:
-            # 获取单次循环时间（最后一个事件的绝对时间）
-            if event_manager.events_table.rowCount() == 0:
-                return 0
-            last_row = event_manager.events_table.rowCount() - 1
-            time_item = event_manager.events_table.item(last_row, 7)  # 绝对偏移列
-            if time_item and time_item.text().isdigit():
-                return int(time_item.text())
-            else:
-                return 0
-        except Exception as e:
-            self.debug_logger.log_error(f"计算单次循环时间失败: {e}")
-            return 0
-    
-    def calculate_total_time_ms(self, single_loop_time, loop_count, interval_ms):
-        """计算整个脚本的总时间（毫秒）"""
-        try:
-            # 总时间 = 单次循环时间 * 循环次数 + 间隔时间 * (循环次数 - 1)
-            total_time = single_loop_time * loop_count + interval_ms * (loop_count - 1)
-            return total_time
-        except Exception as e:
-            self.debug_logger.log_error(f"计算总时间失败: {e}")
-            return 0
-    
     def update_stats_display(self, stats_text):
         """更新统计信息显示 - 保持向后兼容"""
         self.stats_text.setPlainText(stats_text)
+        self._stats_values = None
+        self._stats_lines = None
@@ -0,0 +1,123 @@
+# persistence.py - 后台持久化模块
+"""
+后台持久化模块，在独立线程中执行所有保存任务。
+
+主线程只负责复制需要保存的数据（事件各列的内存拷贝、设置字典），
+序列化和文件写入都在持久化线程中按提交顺序进行，大型项目保存时界面不会卡顿。
+
+任务按键合并：同一个键的任务尚未开始执行时再次提交，只替换任务内容而不重复排队，
+短时间内的多次保存因此只写入一次。
+"""
+
+import json
+import os
+import threading
+
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from project_file import atomic_write_json
+
+# 任务键
+STATE_LOG_TASK = "state_log"  # 追加状态日志
+STATE_SNAPSHOT_TASK = "state_snapshot"  # 重写状态文件
+SETTINGS_TASK = "settings"  # 保存时间逻辑设置
+PROJECT_TASK_PREFIX = "project:"  # 保存项目文件，键后接文件路径
+LIBRARY_TASK_PREFIX = "library:"  # 添加到项目库，键后接项目名称
+
+
+def update_json_file(path, updates):
+    """读取JSON对象文件，合并 updates 后原子地写回
+
+    文件不存在或无法解析时从空对象开始。
+
+    Args:
+        path: 文件路径
+        updates: 要更新的键值
+
+    Returns:
+        int: 写入的字节数
+    """
+    data = {}
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        if not isinstance(data, dict):
+            data = {}
+    data.update(updates)
+    return atomic_write_json(path, data, indent=2)
+
+
+class PersistenceWorker(QThread):
+    """持久化线程类，按提交顺序在后台执行保存任务"""
+
+    # 信号定义
+    task_finished = pyqtSignal(str, object)  # 任务完成信号（任务键, 返回值）
+    task_failed = pyqtSignal(str, str)  # 任务失败信号（任务键, 错误信息）
+
+    def __init__(self):
+        super().__init__()
+        self._tasks = {}  # 任务键 -> (函数, 参数)，按首次提交的顺序执行
+        self._condition = threading.Condition()
+        self._busy = False
+        self._stopping = False
+
+    def submit(self, key, func, *args):
+        """提交保存任务
+
+        同一个键的任务尚未开始执行时，新任务替换旧任务并保留原来的排队位置。
+
+        Args:
+            key: 任务键
+            func: 在持久化线程中调用的函数
+            *args: 函数参数
+        """
+        with self._condition:
+            self._tasks[key] = (func, args)
+            self._condition.notify_all()
+        if not self.isRunning():
+            self._stopping = False
+            self.start()
+
+    def is_pending(self, key):
+        """指定任务是否在排队或正在执行"""
+        with self._condition:
+            return key in self._tasks or self._busy == key
+
+    def wait_idle(self):
+        """等待所有已提交的任务执行完毕"""
+        with self._condition:
+            while self._tasks or self._busy:
+                if not self.isRunning():
+                    break
+                self._condition.wait(0.1)
+
+    def stop(self):
+        """执行完已提交的任务后结束线程"""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        self.wait()
+
+    def run(self):
+        """线程运行方法，依次执行排队的任务"""
+        while True:
+            with self._condition:
+                while not self._tasks and not self._stopping:
+                    self._condition.wait()
+                if not self._tasks:
+                    return
+                key = next(iter(self._tasks))
+                func, args = self._tasks.pop(key)
+                self._busy = key
+            try:
+                result = func(*args)
+                self.task_finished.emit(key, result)
+            except Exception as e:
+                self.task_failed.emit(key, str(e))
+            finally:
+                with self._condition:
+                    self._busy = False
+                    self._condition.notify_all()
@@ -0,0 +1,288 @@
+# project_file.py - 项目文件模块
+"""
+项目文件模块，负责项目文件和状态文件的读写。
+
+支持两种格式：
+- 二进制格式（.stproj）：文件头 + 元数据JSON + 名称字符串表 + 各数值列的定长数组。
+  加载时内存映射文件，数值列按内存块直接复制到事件存储，不需要逐个解析数字；
+  事件名称重复度很高，只保存一份不重复的名称表和每行的名称序号。
+- JSON格式（.json）：7列字符串行，与旧版本兼容，用于导入导出。
+
+读取时根据文件头自动识别格式，写入时根据扩展名选择格式。
+
+二进制文件布局（小端序）：
+    文件头       HEADER（魔数、版本、事件数、时间原点、元数据长度、名称数）
+    元数据       UTF-8 JSON（settings 等）
+    名称偏移     uint32 × (名称数 + 1)
+    名称数据     UTF-8
+    对齐到8字节
+    键码、X、Y、相对时间   int64 × 事件数（各一列）
+    名称序号     uint32 × 事件数
+    类型码、鼠标按钮       int8 × 事件数（各一列）
+
+本模块不依赖Qt。
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+import numpy as np
+
+from event_store import record_from_strings, record_to_strings, columns_from_records
+
+# 文件头：魔数、格式版本、保留、事件数、时间原点、元数据长度、名称数
+HEADER = struct.Struct('<4sHHQqII')
+MAGIC = b"STPJ"
+FORMAT_VERSION = 1
+
+PROJECT_EXTENSION = ".stproj"
+JSON_EXTENSION = ".json"
+
+# 数值列在文件中的顺序：(列序号, array类型码, 每项字节数)
+_WIDE_COLUMNS = ((3, 'q', 8), (4, 'q', 8), (5, 'q', 8), (6, 'q', 8))
+_NARROW_COLUMNS = ((1, 'b', 1), (2, 'b', 1))
+
+
+def atomic_write_json(path, data, indent=None):
+    """原子地写入JSON文件
+
+    先写入临时文件并同步到磁盘，再替换目标文件，写入中途异常退出不会损坏原文件。
+
+    Args:
+        path: 目标文件路径
+        data: 要写入的数据
+        indent: JSON缩进，None表示紧凑格式
+
+    Returns:
+        int: 写入的字节数
+    """
+    temp_path = path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=indent)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+    return os.path.getsize(path)
+
+
+def capture_state(event_store, settings):
+    """复制当前事件和设置，得到可以交给后台线程序列化的不可变快照
+
+    事件部分来自 EventStore.snapshot()，各列只做内存拷贝，大型项目也只需几毫秒。
+
+    Args:
+        event_store: 事件存储实例
+        settings: 设置字典
+
+    Returns:
+        dict: 快照（columns、origin、version、settings）
+    """
+    snapshot = event_store.snapshot()
+    return {
+        'columns': snapshot.columns,
+        'origin': snapshot.time_origin,
+        'version': snapshot.version,
+        'settings': dict(settings)
+    }
+
+
+def state_to_dict(snapshot):
+    """把快照转换为状态文件格式（events 为7列字符串行）"""
+    names, types, buttons, keycodes, xs, ys, rel_times = snapshot['columns']
+    abs_times = np.cumsum(np.array(rel_times, dtype=np.int64)) + snapshot['origin']
+    records = zip(names, types, buttons, keycodes, xs, ys, rel_times, abs_times.tolist())
+    return {
+        'events': [record_to_strings(record) for record in records],
+        'settings': snapshot['settings']
+    }
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+def is_binary_project(path):
+    """文件是否为二进制项目文件"""
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def _encode_names(names):
+    """把名称列表编码为不重复的名称表和每行的名称序号"""
+    table = {}
+    indices = array('I', [table.setdefault(name, len(table)) for name in names])
+    encoded = [name.encode('utf-8') for name in table]
+    offsets = np.zeros(len(encoded) + 1, dtype='<u4')
+    if encoded:
+        np.cumsum([len(data) for data in encoded], out=offsets[1:])
+    return indices, offsets.tobytes(), b"".join(encoded)
+
+
+def _to_little_endian(column):
+    if sys.byteorder != 'little' and column.itemsize > 1:
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column
+
+
+def write_binary_project(path, snapshot, meta):
+    """把快照写入二进制项目文件（先写临时文件再原子替换）
+
+    Args:
+        path: 文件路径
+        snapshot: capture_state() 得到的快照
+        meta: 写入元数据的字典（settings 等）
+
+    Returns:
+        int: 写入的字节数
+    """
+    columns = snapshot['columns']
+    count = len(columns[0])
+    indices, offsets, blob = _encode_names(columns[0])
+    meta_data = json.dumps(meta, ensure_ascii=False).encode('utf-8')
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, 0, count, snapshot['origin'],
+                         len(meta_data), len(offsets) // 4 - 1)
+
+    temp_path = path + ".tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(header)
+        f.write(meta_data)
+        f.write(offsets)
+        f.write(blob)
+        position = len(header) + len(meta_data) + len(offsets) + len(blob)
+        f.write(b"\0" * (_align(position) - position))
+        for index, _, _ in _WIDE_COLUMNS:
+            _to_little_endian(columns[index]).tofile(f)
+        _to_little_endian(indices).tofile(f)
+        for index, _, _ in _NARROW_COLUMNS:
+            columns[index].tofile(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+    return os.path.getsize(path)
+
+
+def read_binary_project(path):
+    """内存映射读取二进制项目文件
+
+    Returns:
+        dict: {'columns', 'origin', 'meta'}，columns 可直接交给 EventStore.reset_columns()
+
+    Raises:
+        ValueError: 文件格式不正确或已损坏
+    """
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < HEADER.size:
+            raise ValueError("项目文件已损坏")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                return _parse_binary_project(view, size)
+            finally:
+                view.release()
+
+
+def _parse_binary_project(view, size):
+    """解析映射到内存的二进制项目文件（返回的数据不引用映射内存）"""
+    magic, version, _, count, origin, meta_len, name_count = HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise ValueError("不是二进制项目文件")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"不支持的项目文件版本: {version}")
+
+    position = HEADER.size
+    offsets_end = position + meta_len + 4 * (name_count + 1)
+    if offsets_end > size:
+        raise ValueError("项目文件已损坏")
+    meta = json.loads(bytes(view[position:position + meta_len]).decode('utf-8'))
+    position += meta_len
+    offsets = np.frombuffer(view, dtype='<u4', count=name_count + 1, offset=position).tolist()
+    position = offsets_end
+    blob_end = position + offsets[-1]
+    columns_start = _align(blob_end)
+    if columns_start + count * (8 * len(_WIDE_COLUMNS) + 4 + len(_NARROW_COLUMNS)) != size:
+        raise ValueError("项目文件已损坏")
+    blob = view[position:blob_end]
+    table = [str(blob[start:end], 'utf-8') for start, end in zip(offsets, offsets[1:])]
+
+    columns = [None] * 7
+    position = columns_start
+    for index, typecode, itemsize in _WIDE_COLUMNS:
+        columns[index] = _read_column(view, position, count, typecode)
+        position += count * itemsize
+    indices = np.frombuffer(view, dtype='<u4', count=count, offset=position)
+    position += count * 4
+    for index, typecode, itemsize in _NARROW_COLUMNS:
+        columns[index] = _read_column(view, position, count, typecode)
+        position += count * itemsize
+
+    if count:
+        if not table or int(indices.max()) >= len(table):
+            raise ValueError("项目文件已损坏")
+        columns[0] = np.array(table, dtype=object)[indices].tolist()
+    else:
+        columns[0] = []
+    return {'columns': tuple(columns), 'origin': origin, 'meta': meta}
+
+
+def _read_column(view, position, count, typecode):
+    """从映射内存中按块复制一列"""
+    column = array(typecode)
+    column.frombytes(view[position:position + count * column.itemsize])
+    if sys.byteorder != 'little' and column.itemsize > 1:
+        column.byteswap()
+    return column
+
+
+def read_json_project(path):
+    """读取JSON项目文件（7列字符串行格式）
+
+    Returns:
+        dict: 与 read_binary_project() 相同的格式，meta 为除 events 以外的字段
+
+    Raises:
+        json.JSONDecodeError: 文件不是有效的JSON
+        ValueError: 缺少 events 字段
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        state = json.load(f)
+    if not isinstance(state, dict) or not isinstance(state.get('events'), list):
+        raise ValueError("文件格式不正确，缺少必要的events字段或格式错误")
+    columns, origin = columns_from_records([record_from_strings(row) for row in state.pop('events')])
+    return {'columns': columns, 'origin': origin, 'meta': state}
+
+
+def load_project(path):
+    """读取项目文件，根据文件头自动识别格式
+
+    Returns:
+        dict: {'columns', 'origin', 'meta'}
+    """
+    if is_binary_project(path):
+        return read_binary_project(path)
+    return read_json_project(path)
+
+
+def save_project(path, snapshot, meta=None):
+    """保存项目文件，扩展名为 .json 时写入JSON格式，否则写入二进制格式（可在后台线程中调用）
+
+    Args:
+        path: 文件路径
+        snapshot: capture_state() 得到的快照
+        meta: 额外写入的字段（可选）
+
+    Returns:
+        int: 写入的字节数
+    """
+    if path.lower().endswith(JSON_EXTENSION):
+        state = state_to_dict(snapshot)
+        state.update(meta or {})
+        return atomic_write_json(path, state, indent=2)
+    data = {'settings': snapshot['settings']}
+    data.update(meta or {})
+    return write_binary_project(path, snapshot, data)
@@ -0,0 +1,459 @@
+# project_library.py - 项目库模块
+"""
+项目库模块，把多个项目保存在一个本地 SQLite 数据库中，支持跨项目检索。
+
+数据库包含三张表：
+- projects：每个项目一行，保存事件数、单次循环时长、预计总时间、窗口分辨率、
+  缩放比例（DPI）和循环设置等元数据
+- events：全部项目的事件，按 (项目, 序号) 聚簇存储，可直接从库中打开项目；
+  按 (类型, 鼠标按钮, 项目) 和 (键码, 类型, 项目) 建立覆盖索引，统计某类事件的数量不需要回表
+- key_usage：每个项目每个键码的按下次数，按 (键码, 次数) 建立索引
+
+检索使用与事件搜索框相同风格的查询语言，编译为一条 SQL 语句，例如::
+
+    key:F12>100 events>=1000 scale:150%
+
+支持的条件：
+- 普通文本、name:文本：项目名称包含该文本
+- events、time、total、width、height、loops：事件数、单次循环时长（毫秒）、预计总时间（毫秒）、
+  窗口宽度、高度、循环次数；写法与事件搜索相同（字段:值、字段:起..止、字段>值 等）
+- scale:150%：缩放比例
+- key:按键[比较]：该键的按下次数，例如 key:F12>100、key:"Page Up":1..5；省略比较表示至少按下一次
+- type:事件类型[比较]：该类事件的数量，例如 type:左键按下>=20
+- 条件前加 - 表示取反
+
+每次操作使用独立的数据库连接，可以在持久化线程和主线程中同时使用。
+
+本模块不依赖Qt。
+"""
+
+import json
+import re
+import shlex
+import sqlite3
+import time
+from array import array
+from contextlib import closing
+from itertools import repeat
+
+import numpy as np
+
+from event_store import NO_KEYCODE, TYPE_STR_TO_CODES
+from event_query import QueryError
+from event_index import estimate_total_time
+
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    source_path TEXT,
+    event_count INTEGER NOT NULL,
+    duration INTEGER NOT NULL,
+    total_time INTEGER NOT NULL,
+    loop_count INTEGER,
+    width INTEGER,
+    height INTEGER,
+    scale TEXT,
+    origin INTEGER NOT NULL,
+    settings TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS events (
+    project_id INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    type INTEGER NOT NULL,
+    button INTEGER NOT NULL,
+    keycode INTEGER NOT NULL,
+    x INTEGER NOT NULL,
+    y INTEGER NOT NULL,
+    rel_time INTEGER NOT NULL,
+    abs_time INTEGER NOT NULL,
+    PRIMARY KEY (project_id, seq)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS events_type ON events (type, button, project_id);
+CREATE INDEX IF NOT EXISTS events_keycode ON events (keycode, type, project_id);
+CREATE TABLE IF NOT EXISTS key_usage (
+    project_id INTEGER NOT NULL,
+    keycode INTEGER NOT NULL,
+    presses INTEGER NOT NULL,
+    PRIMARY KEY (project_id, keycode)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS key_usage_keycode ON key_usage (keycode, presses);
+"""
+
+# 列表中返回的项目字段
+PROJECT_FIELDS = ("id", "name", "source_path", "event_count", "duration", "total_time",
+                  "loop_count", "width", "height", "scale", "updated_at")
+
+# 查询字段别名 -> 字段名
+FIELD_ALIASES = {
+    "name": "name", "名称": "name",
+    "events": "events", "事件数": "events",
+    "time": "time", "时长": "time",
+    "total": "total", "总时间": "total",
+    "width": "width", "宽度": "width",
+    "height": "height", "高度": "height",
+    "loops": "loops", "循环": "loops",
+    "scale": "scale", "dpi": "scale", "缩放": "scale",
+    "key": "key", "按键": "key", "键码": "key",
+    "type": "type", "类型": "type"
+}
+
+# 数值字段 -> projects 表中的列
+_NUMERIC_COLUMNS = {
+    "events": "p.event_count",
+    "time": "p.duration",
+    "total": "p.total_time",
+    "width": "p.width",
+    "height": "p.height",
+    "loops": "p.loop_count"
+}
+
+_KEY_DOWN_TYPE = TYPE_STR_TO_CODES["按键按下"][0]
+
+_TERM_PATTERN = re.compile(r'^([^\s:<>=!]+)\s*(>=|<=|!=|:|=|>|<)(.*)$', re.DOTALL)
+_COUNT_PATTERN = re.compile(r'^(.*?)\s*(>=|<=|!=|=|>|<|:)\s*([^:<>=!]*)$', re.DOTALL)
+_INTEGER_PATTERN = re.compile(r'^[+-]?\d+$')
+
+
+def _parse_optional_int(text):
+    try:
+        return int(str(text).strip())
+    except (TypeError, ValueError):
+        return None
+
+
+# =============================================================================
+# 查询
+# =============================================================================
+
+def _parse_integer(text, field):
+    text = text.strip()
+    if not _INTEGER_PATTERN.match(text):
+        raise QueryError(f"{field} 的取值必须是整数: {text or '(空)'}")
+    return int(text)
+
+
+def _compile_comparison(expression, op, value, field):
+    """把数值比较编译为 SQL 片段
+
+    Returns:
+        tuple: (SQL片段, 参数列表, 0是否满足该比较)
+    """
+    if op in (":", "="):
+        if ".." in value:
+            low_text, high_text = value.split("..", 1)
+            low = _parse_integer(low_text, field) if low_text.strip() else None
+            high = _parse_integer(high_text, field) if high_text.strip() else None
+            if low is None and high is None:
+                raise QueryError(f"{field} 的范围至少需要一个端点")
+            if low is None:
+                return f"{expression} <= ?", [high], 0 <= high
+            if high is None:
+                return f"{expression} >= ?", [low], low <= 0
+            return f"{expression} BETWEEN ? AND ?", [low, high], low <= 0 <= high
+        choices = [_parse_integer(part, field) for part in value.split(",")]
+        placeholders = ", ".join("?" * len(choices))
+        return f"{expression} IN ({placeholders})", choices, 0 in choices
+    number = _parse_integer(value, field)
+    zero_matches = {
+        "!=": 0 != number, ">": 0 > number, ">=": 0 >= number,
+        "<": 0 < number, "<=": 0 <= number
+    }[op]
+    return f"{expression} {op} ?", [number], zero_matches
+
+
+class LibraryQuery:
+    """编译后的项目库查询
+
+    用法::
+
+        query = LibraryQuery("key:F12>100", key_codes)
+        projects = library.find_projects(query)
+    """
+
+    def __init__(self, text="", key_codes=None):
+        """解析并编译查询
+
+        Args:
+            text: 查询文本
+            key_codes: 按键名称（小写） -> 键码，用于解析 key:F12 这样的条件；键码数字总是可以直接使用
+
+        Raises:
+            QueryError: 查询语法错误
+        """
+        self.text = text
+        self.key_codes = key_codes or {}
+        try:
+            tokens = shlex.split(text)
+        except ValueError as e:
+            raise QueryError(f"查询语法错误: {e}")
+
+        clauses = []
+        self.params = []
+        for token in tokens:
+            clause, params = self._compile_term(token)
+            clauses.append(clause)
+            self.params.extend(params)
+        self.where = " AND ".join(clauses) if clauses else "1"
+
+    def _compile_term(self, token):
+        """把一个查询词编译为 SQL 条件
+
+        Returns:
+            tuple: (SQL片段, 参数列表)
+        """
+        negate = False
+        if len(token) > 1 and token[0] == "-":
+            negate = True
+            token = token[1:]
+
+        match = _TERM_PATTERN.match(token)
+        field = FIELD_ALIASES.get(match.group(1).lower()) if match else None
+        if field is None:
+            clause, params = "p.name LIKE ? ESCAPE '\\'", [_like_pattern(token)]
+        else:
+            op = match.group(2)
+            value = match.group(3)
+            if not value.strip():
+                raise QueryError(f"条件缺少取值: {token}")
+            if field == "name":
+                clause, params = self._compile_text(field, op, value, "p.name", _like_pattern(value))
+            elif field == "scale":
+                scale = value.strip()
+                if not scale.endswith("%"):
+                    scale += "%"
+                clause, params = self._compile_text(field, op, value, "p.scale", scale)
+            elif field in _NUMERIC_COLUMNS:
+                clause, params, _ = _compile_comparison(_NUMERIC_COLUMNS[field], op, value, field)
+            elif op not in (":", "="):
+                raise QueryError(f"{field} 条件的写法为 {field}:名称>次数")
+            else:
+                clause, params = self._compile_count(field, value)
+        if negate:
+            clause = f"NOT ({clause})"
+        return clause, params
+
+    def _compile_text(self, field, op, value, expression, pattern):
+        if op == ":":
+            if field == "name":
+                return f"{expression} LIKE ? ESCAPE '\\'", [pattern]
+            return f"{expression} = ?", [pattern]
+        if op == "=":
+            return f"{expression} = ?", [value if field == "name" else pattern]
+        if op == "!=":
+            return f"{expression} != ?", [value if field == "name" else pattern]
+        raise QueryError(f"{field} 只支持 :、= 和 != 比较")
+
+    def _compile_count(self, field, value):
+        """编译按键次数或事件类型数量条件"""
+        match = _COUNT_PATTERN.match(value)
+        if match and match.group(1).strip() and match.group(3).strip():
+            subject, op, count_text = match.group(1).strip(), match.group(2), match.group(3)
+        else:
+            subject, op, count_text = value.strip(), ">=", "1"
+
+        if field == "key":
+            keycode = self._resolve_key(subject)
+            comparison, params, zero_matches = _compile_comparison("presses", op, count_text, field)
+            if not zero_matches:
+                # 只需在键码索引中查找满足条件的项目
+                return (f"p.id IN (SELECT project_id FROM key_usage WHERE keycode = ? AND {comparison})",
+                        [keycode] + params)
+            comparison, params, _ = _compile_comparison(
+                "COALESCE((SELECT presses FROM key_usage WHERE project_id = p.id AND keycode = ?), 0)",
+                op, count_text, field)
+            return comparison, [keycode] + params
+
+        codes = TYPE_STR_TO_CODES.get(subject)
+        if codes is None:
+            raise QueryError(f"未知的事件类型: {subject}")
+        comparison, params, zero_matches = _compile_comparison("COUNT(*)", op, count_text, field)
+        if not zero_matches:
+            return (f"p.id IN (SELECT project_id FROM events WHERE type = ? AND button = ? "
+                    f"GROUP BY project_id HAVING {comparison})", list(codes) + params)
+        comparison, params, _ = _compile_comparison(
+            "(SELECT COUNT(*) FROM events WHERE project_id = p.id AND type = ? AND button = ?)",
+            op, count_text, field)
+        return comparison, list(codes) + params
+
+    def _resolve_key(self, text):
+        """把按键名称或键码文本解析为键码"""
+        if _INTEGER_PATTERN.match(text):
+            return int(text)
+        keycode = self.key_codes.get(text.lower())
+        if keycode is None:
+            raise QueryError(f"未知的按键: {text}")
+        return keycode
+
+
+def _like_pattern(text):
+    """把文本转换为包含匹配的 LIKE 模式"""
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+# =============================================================================
+# 项目库
+# =============================================================================
+
+class ProjectLibrary:
+    """保存在 SQLite 数据库中的项目库"""
+
+    def __init__(self, path):
+        """初始化项目库
+
+        Args:
+            path: 数据库文件路径，不存在时自动创建
+        """
+        self.path = path
+        self._initialized = False
+
+    def _connect(self):
+        """打开一个新的数据库连接，第一次打开时创建表和索引"""
+        connection = sqlite3.connect(self.path)
+        if not self._initialized:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(_SCHEMA)
+            connection.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+            connection.commit()
+            self._initialized = True
+        return connection
+
+    def add_project(self, name, snapshot, source_path=None):
+        """把项目保存到库中，同名项目会被替换（可在后台线程中调用）
+
+        Args:
+            name: 项目名称
+            snapshot: capture_state() 得到的快照
+            source_path: 项目文件路径（可选）
+
+        Returns:
+            int: 项目编号
+        """
+        names, types, buttons, keycodes, xs, ys, rel_times = snapshot['columns']
+        settings = snapshot['settings']
+        count = len(names)
+        abs_times = np.cumsum(np.array(rel_times, dtype=np.int64)) + snapshot['origin']
+        duration = max(0, int(abs_times[-1])) if count else 0
+        loop_count = _parse_optional_int(settings.get('loop_count')) or 1
+        total_time = estimate_total_time(duration, loop_count, settings.get('interval', 0) or 0,
+                                         settings.get('time_unit', 's')) if count else 0
+
+        # 按键使用次数
+        type_values = np.frombuffer(types, dtype=np.int8) if count else np.zeros(0, dtype=np.int8)
+        keycode_values = np.array(keycodes, dtype=np.int64)
+        pressed = keycode_values[(type_values == _KEY_DOWN_TYPE) & (keycode_values != NO_KEYCODE)]
+        usage_keys, usage_counts = np.unique(pressed, return_counts=True)
+
+        row = (source_path, count, duration, int(total_time), loop_count,
+               _parse_optional_int(settings.get('width')), _parse_optional_int(settings.get('height')),
+               settings.get('scale'), snapshot['origin'] if count else 0,
+               json.dumps(settings, ensure_ascii=False), time.time())
+        with closing(self._connect()) as connection, connection:
+            existing = connection.execute("SELECT id FROM projects WHERE name = ?", (name,)).fetchone()
+            if existing is not None:
+                project_id = existing[0]
+                connection.execute("DELETE FROM events WHERE project_id = ?", (project_id,))
+                connection.execute("DELETE FROM key_usage WHERE project_id = ?", (project_id,))
+                connection.execute(
+                    "UPDATE projects SET source_path = ?, event_count = ?, duration = ?, total_time = ?, "
+                    "loop_count = ?, width = ?, height = ?, scale = ?, origin = ?, settings = ?, updated_at = ? "
+                    "WHERE id = ?", row + (project_id,))
+            else:
+                project_id = connection.execute(
+                    "INSERT INTO projects (name, source_path, event_count, duration, total_time, loop_count, "
+                    "width, height, scale, origin, settings, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (name,) + row).lastrowid
+            connection.executemany(
+                "INSERT INTO events VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                zip(repeat(project_id), range(count), names, types, buttons, keycodes, xs, ys,
+                    rel_times, abs_times.tolist()))
+            connection.executemany(
+                "INSERT INTO key_usage VALUES (?, ?, ?)",
+                zip(repeat(project_id), usage_keys.tolist(), usage_counts.tolist()))
+        return project_id
+
+    def remove_project(self, project_id):
+        """从库中删除项目"""
+        with closing(self._connect()) as connection, connection:
+            connection.execute("DELETE FROM events WHERE project_id = ?", (project_id,))
+            connection.execute("DELETE FROM key_usage WHERE project_id = ?", (project_id,))
+            connection.execute("DELETE FROM projects WHERE id = ?", (project_id,))
+
+    def find_projects(self, query=None):
+        """检索项目
+
+        Args:
+            query: LibraryQuery 实例，None表示全部项目
+
+        Returns:
+            list: 项目元数据字典列表，按名称排序
+        """
+        where, params = ("1", []) if query is None else (query.where, query.params)
+        columns = ", ".join(f"p.{field}" for field in PROJECT_FIELDS)
+        with closing(self._connect()) as connection:
+            rows = connection.execute(
+                f"SELECT {columns} FROM projects p WHERE {where} ORDER BY p.name", params).fetchall()
+        return [dict(zip(PROJECT_FIELDS, row)) for row in rows]
+
+    def key_usage(self, project_id, limit=None):
+        """项目中各按键的按下次数
+
+        Returns:
+            list: [(键码, 次数), ...]，按次数从多到少排列
+        """
+        sql = "SELECT keycode, presses FROM key_usage WHERE project_id = ? ORDER BY presses DESC, keycode"
+        params = [project_id]
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with closing(self._connect()) as connection:
+            return connection.execute(sql, params).fetchall()
+
+    def top_keys(self, project_ids, limit=3):
+        """一批项目中各自按下次数最多的按键
+
+        Returns:
+            dict: 项目编号 -> [(键码, 次数), ...]
+        """
+        result = {project_id: [] for project_id in project_ids}
+        if not result:
+            return result
+        placeholders = ", ".join("?" * len(result))
+        with closing(self._connect()) as connection:
+            rows = connection.execute(
+                f"SELECT project_id, keycode, presses FROM key_usage WHERE project_id IN ({placeholders}) "
+                f"ORDER BY project_id, presses DESC, keycode", list(result)).fetchall()
+        for project_id, keycode, presses in rows:
+            if len(result[project_id]) < limit:
+                result[project_id].append((keycode, presses))
+        return result
+
+    def load_project(self, project_id):
+        """从库中读取项目
+
+        Returns:
+            dict: 与 project_file.load_project() 相同的格式 {'columns', 'origin', 'meta'}
+
+        Raises:
+            KeyError: 项目不存在
+        """
+        with closing(self._connect()) as connection:
+            project = connection.execute(
+                "SELECT origin, settings FROM projects WHERE id = ?", (project_id,)).fetchone()
+            if project is None:
+                raise KeyError(project_id)
+            rows = connection.execute(
+                "SELECT name, type, button, keycode, x, y, rel_time FROM events "
+                "WHERE project_id = ? ORDER BY seq", (project_id,)).fetchall()
+        if rows:
+            names, types, buttons, keycodes, xs, ys, rel_times = zip(*rows)
+        else:
+            names = types = buttons = keycodes = xs = ys = rel_times = ()
+        columns = (list(names), array('b', types), array('b', buttons), array('q', keycodes),
+                   array('q', xs), array('q', ys), array('q', rel_times))
+        return {'columns': columns, 'origin': project[0], 'meta': {'settings': json.loads(project[1])}}
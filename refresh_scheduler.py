@@ -0,0 +1,81 @@
+# refresh_scheduler.py - 界面刷新调度模块
+"""
+界面刷新调度模块，合并同一轮事件循环中的重复刷新。
+
+各组件修改数据后只把受影响的界面区域标记为待刷新（invalidate），
+调度器在当前事件处理结束后的下一轮事件循环中统一刷新一次，
+批量操作中的多次修改因此只引起一次搜索过滤、统计、总时间和表格背景的重新计算。
+
+刷新按区域注册的顺序进行；刷新过程中再标记的区域（例如统计信息刷新后需要刷新总时间）
+如果排在后面，会在同一轮中处理。
+"""
+
+from PyQt6.QtCore import QObject, QTimer
+
+from debug_tools import get_global_debug_logger
+
+# 界面区域
+REFRESH_SEARCH = "search"  # 按生效的搜索查询重新过滤事件表格
+REFRESH_TABLE = "table"  # 事件表格的行号和成对性高亮
+REFRESH_STATS = "stats"  # 统计信息面板
+REFRESH_TOTAL_TIME = "total_time"  # 预计总时间
+
+
+class RefreshScheduler(QObject):
+    """界面刷新调度器"""
+
+    def __init__(self, parent=None):
+        """初始化刷新调度器
+
+        Args:
+            parent: 父对象
+        """
+        super().__init__(parent)
+        self.debug_logger = get_global_debug_logger()
+        self._handlers = {}  # 区域 -> 刷新函数（按注册顺序）
+        self._dirty = set()
+        self._flushing = False
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(0)
+        self._timer.timeout.connect(self.flush)
+
+    def register(self, region, handler):
+        """注册区域的刷新函数，同一区域重复注册时替换
+
+        Args:
+            region: 区域名称
+            handler: 无参刷新函数
+        """
+        self._handlers[region] = handler
+
+    def invalidate(self, *regions):
+        """标记区域待刷新，在下一轮事件循环中统一刷新"""
+        self._dirty.update(regions)
+        if not self._flushing and not self._timer.isActive():
+            self._timer.start()
+
+    def is_dirty(self, region):
+        """区域是否等待刷新"""
+        return region in self._dirty
+
+    def flush(self):
+        """立即刷新所有待刷新的区域，每个区域最多刷新一次"""
+        self._timer.stop()
+        if self._flushing:
+            return
+        self._flushing = True
+        try:
+            for region, handler in list(self._handlers.items()):
+                if region not in self._dirty:
+                    continue
+                self._dirty.discard(region)
+                try:
+                    handler()
+                except Exception as e:
+                    self.debug_logger.log_error(f"刷新界面区域 {region} 失败: {e}", exc_info=True)
+        finally:
+            self._flushing = False
+        # 没有注册刷新函数的区域，或刷新时标记的靠前区域，留到下一轮
+        if self._dirty & self._handlers.keys():
+            self._timer.start()
@@ -0,0 +1,721 @@
+# script_engine.py - 脚本生成引擎模块
+"""
+脚本生成引擎模块，负责把事件存储转换为BetterGI脚本并流式写出。
+
+生成阶段只保存单次循环的基础事件列（EventColumns），循环展开在写出时按需进行：
+第 n 次循环的事件时间 = 基础时间 + n * (最后一个事件时间 + 间隔时间)。
+展开使用NumPy按循环块整体计算时间列，序列化时每个基础事件的JSON片段只生成一次，
+写出时按块直接写入文件，内存峰值与循环次数无关。
+事件数量很大时，各循环块在进程池中并行编码，再由写出方按顺序拼接，输出保持确定。
+
+本模块不依赖Qt，可在任意线程中使用。
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from event_store import EventStore, EVENT_TYPES, KEY_EVENT_TYPES, MOUSE_BUTTON_NAMES, NO_KEYCODE, type_codes_from_str
+
+# 脚本描述
+SCRIPT_DESCRIPTION = "由BetterGI StellTrack创建"
+
+# 每次写入文件的事件数量（至少写出一个完整循环）
+WRITE_CHUNK_EVENTS = 65536
+
+# 事件总数达到该值时启用多进程并行编码
+PARALLEL_MIN_EVENTS = 2_000_000
+
+# 并行编码时每个任务的事件数量
+PARALLEL_CHUNK_EVENTS = 262144
+
+# 预览时最多展示的事件数量
+PREVIEW_MAX_EVENTS = 1000
+
+# 键盘事件的脚本类型码（只有它们输出keyCode）
+KEY_TYPE_CODES = [type_codes_from_str(type_str)[0] for type_str in KEY_EVENT_TYPES]
+
+# 编码器基准测试的默认事件规模
+BENCHMARK_SIZES = (10_000, 1_000_000, 10_000_000)
+
+# 与 json.dump(script, f, ensure_ascii=False, separators=(',', ':')) 保持一致的序列化参数
+_JSON_SEPARATORS = (',', ':')
+
+
+def interval_to_ms(interval, time_unit):
+    """将间隔时间转换为毫秒
+
+    Args:
+        interval: 间隔数值
+        time_unit: 时间单位（"ms"、"s"、"min"）
+
+    Returns:
+        int: 间隔毫秒数
+    """
+    if time_unit == "s":
+        return int(interval * 1000)
+    if time_unit == "min":
+        return int(interval * 60000)
+    return int(interval)
+
+
+def interval_from_ms(interval_ms):
+    """将毫秒间隔转换为设置面板使用的数值和单位
+
+    整秒使用秒为单位，否则使用毫秒，保证 interval_to_ms 转换回来的值不变。
+
+    Args:
+        interval_ms: 间隔毫秒数
+
+    Returns:
+        tuple: (间隔数值, 时间单位)
+    """
+    if interval_ms % 1000 == 0:
+        return interval_ms // 1000, "s"
+    return interval_ms, "ms"
+
+
+def build_script_info(width, height, record_dpi):
+    """构建脚本信息字段
+
+    Args:
+        width: 录制分辨率宽度
+        height: 录制分辨率高度
+        record_dpi: 录制缩放比例（小数）
+
+    Returns:
+        dict: 脚本info字段
+    """
+    return {
+        "description": SCRIPT_DESCRIPTION,
+        "x": 0,
+        "y": 0,
+        "width": width,
+        "height": height,
+        "recordDpi": record_dpi
+    }
+
+
+class EventColumns:
+    """单次循环的脚本事件列
+
+    以NumPy数组按列保存事件的类型、坐标、时间、键码和鼠标按键，
+    keyCode 为 NO_KEYCODE、mouseButton 为 0 表示脚本中不输出该字段。
+    """
+
+    def __init__(self, types, xs, ys, times, keycodes, buttons):
+        """初始化事件列
+
+        Args:
+            types: 事件类型数组
+            xs: X坐标数组
+            ys: Y坐标数组
+            times: 绝对时间数组（毫秒）
+            keycodes: 键码数组
+            buttons: 鼠标按键代码数组
+        """
+        self.types = np.asarray(types, dtype=np.int64)
+        self.xs = np.asarray(xs, dtype=np.int64)
+        self.ys = np.asarray(ys, dtype=np.int64)
+        self.times = np.asarray(times, dtype=np.int64)
+        self.keycodes = np.asarray(keycodes, dtype=np.int64)
+        self.buttons = np.asarray(buttons, dtype=np.int64)
+        self._templates = None
+        self._joints = None
+
+    @classmethod
+    def from_store(cls, event_store):
+        """从事件存储构建事件列（跳过名称为空的事件）
+
+        Args:
+            event_store: 事件存储实例或其快照（EventSnapshot，可在后台线程中使用）
+
+        Returns:
+            EventColumns: 事件列
+        """
+        names = event_store.names
+        mask = np.fromiter(map(bool, names), dtype=bool, count=len(names))
+
+        types = np.array(event_store.types, dtype=np.int64)[mask]
+        keycodes = np.array(event_store.keycodes, dtype=np.int64)[mask]
+        # 只有键盘事件输出keyCode
+        keycodes[~np.isin(types, KEY_TYPE_CODES)] = NO_KEYCODE
+
+        return cls(
+            types,
+            np.array(event_store.xs, dtype=np.int64)[mask],
+            np.array(event_store.ys, dtype=np.int64)[mask],
+            np.array(event_store.abs_times, dtype=np.int64)[mask],
+            keycodes,
+            np.array(event_store.buttons, dtype=np.int64)[mask]
+        )
+
+    def __len__(self):
+        return len(self.times)
+
+    def last_time(self):
+        """最后一个事件的时间"""
+        return int(self.times[-1]) if len(self.times) else 0
+
+    def event_dict(self, index, time):
+        """构建单个脚本事件字典
+
+        Args:
+            index: 事件索引
+            time: 事件的最终时间
+
+        Returns:
+            dict: 脚本事件
+        """
+        event = {
+            "type": int(self.types[index]),
+            "mouseX": int(self.xs[index]),
+            "mouseY": int(self.ys[index]),
+            "time": int(time)
+        }
+        keycode = int(self.keycodes[index])
+        if keycode != NO_KEYCODE:
+            event["keyCode"] = keycode
+        mouse_button = MOUSE_BUTTON_NAMES.get(int(self.buttons[index]))
+        if mouse_button:
+            event["mouseButton"] = mouse_button
+        return event
+
+    def templates(self):
+        """获取每个事件时间值前后的JSON片段
+
+        前缀以逗号开头，便于直接拼接；结果会被缓存。
+
+        Returns:
+            tuple: (前缀列表, 后缀列表)
+        """
+        if self._templates is None:
+            prefixes = []
+            suffixes = []
+            for event_type, x, y, keycode, button in zip(
+                    self.types.tolist(), self.xs.tolist(), self.ys.tolist(),
+                    self.keycodes.tolist(), self.buttons.tolist()):
+                prefixes.append(f',{{"type":{event_type},"mouseX":{x},"mouseY":{y},"time":')
+                suffix = ""
+                if keycode != NO_KEYCODE:
+                    suffix += f',"keyCode":{keycode}'
+                mouse_button = MOUSE_BUTTON_NAMES.get(button)
+                if mouse_button:
+                    suffix += ',"mouseButton":' + json.dumps(mouse_button, ensure_ascii=False)
+                suffixes.append(suffix + "}")
+            self._templates = (prefixes, suffixes)
+        return self._templates
+
+    def joints(self):
+        """获取相邻两个事件时间值之间的JSON片段
+
+        第 i 个片段 = 第 i 个事件的后缀 + 第 i+1 个事件的前缀，
+        最后一个片段连接到下一次循环的第一个事件，
+        这样序列化时每个事件只需拼接“时间 + 片段”两部分。
+
+        Returns:
+            list: 片段列表，长度与事件数相同
+        """
+        if self._joints is None:
+            prefixes, suffixes = self.templates()
+            self._joints = [suffix + prefix for suffix, prefix in zip(suffixes, prefixes[1:] + prefixes[:1])]
+        return self._joints
+
+
+def build_script(columns, settings):
+    """根据事件列和生成设置构建宏脚本
+
+    Args:
+        columns: 单次循环的事件列
+        settings: 生成设置字典（loop_count、interval_ms、width、height、record_dpi）
+
+    Returns:
+        MacroScript: 宏脚本
+    """
+    info = build_script_info(settings["width"], settings["height"], settings["record_dpi"])
+    return MacroScript(columns, settings["loop_count"], settings["interval_ms"], info)
+
+
+def loop_period_ms(columns, interval_ms):
+    """计算相邻两次循环之间的时间偏移
+
+    Args:
+        columns: 单次循环的事件列
+        interval_ms: 循环间隔毫秒数
+
+    Returns:
+        int: 循环周期毫秒数
+    """
+    if not len(columns):
+        return 0
+    return columns.last_time() + interval_ms
+
+
+def expand_loop_times(base_times, period, first_loop, last_loop):
+    """计算一段循环范围内所有事件的最终时间
+
+    Args:
+        base_times: 单次循环的事件时间数组
+        period: 循环周期毫秒数
+        first_loop: 起始循环索引（包含）
+        last_loop: 结束循环索引（不包含）
+
+    Returns:
+        numpy.ndarray: 按循环顺序展开的时间数组
+    """
+    offsets = np.arange(first_loop, last_loop, dtype=np.int64) * period
+    return (offsets[:, None] + base_times[None, :]).ravel()
+
+
+def expand_loops(columns, loop_count, interval_ms, first_loop=0, last_loop=None):
+    """向量化展开循环，返回各字段的完整数组
+
+    Args:
+        columns: 单次循环的事件列
+        loop_count: 循环次数
+        interval_ms: 循环间隔毫秒数
+        first_loop: 起始循环索引（包含）
+        last_loop: 结束循环索引（不包含），None表示到最后一次循环
+
+    Returns:
+        dict: 字段名到数组的映射（type、mouseX、mouseY、time、keyCode、mouseButton）
+    """
+    if last_loop is None:
+        last_loop = loop_count
+    repeat = max(0, last_loop - first_loop)
+    return {
+        "type": np.tile(columns.types, repeat),
+        "mouseX": np.tile(columns.xs, repeat),
+        "mouseY": np.tile(columns.ys, repeat),
+        "time": expand_loop_times(columns.times, loop_period_ms(columns, interval_ms), first_loop, last_loop),
+        "keyCode": np.tile(columns.keycodes, repeat),
+        "mouseButton": np.tile(columns.buttons, repeat)
+    }
+
+
+class LoopBlockEncoder:
+    """循环块编码器
+
+    只保存序列化所需的纯数据（JSON片段和基础时间），可以整体传递给子进程。
+    """
+
+    def __init__(self, columns, period):
+        """初始化循环块编码器
+
+        Args:
+            columns: 单次循环的事件列
+            period: 循环周期毫秒数
+        """
+        prefixes, suffixes = columns.templates()
+        self.head = prefixes[0] if prefixes else ""
+        self.joints = columns.joints()
+        self.tail = suffixes[-1] if suffixes else ""
+        self.base_times = columns.times
+        self.period = period
+
+    def encode(self, first_loop, last_loop):
+        """将一段循环范围内的事件编码为UTF-8字节
+
+        Args:
+            first_loop: 起始循环索引（包含）
+            last_loop: 结束循环索引（不包含）
+
+        Returns:
+            bytes: 以逗号开头、逗号分隔的事件JSON
+        """
+        times = expand_loop_times(self.base_times, self.period, first_loop, last_loop)
+        if not len(times):
+            return b""
+        parts = [None] * (2 * len(times) + 1)
+        parts[0] = self.head
+        parts[1::2] = map(str, times.tolist())
+        parts[2::2] = self.joints * (last_loop - first_loop)
+        # 最后一个事件之后不再连接下一个事件
+        parts[-1] = self.tail
+        return "".join(parts).encode("utf-8")
+
+
+# 子进程中的编码器实例，由进程池初始化函数设置
+_worker_encoder = None
+
+
+def _init_encode_worker(encoder):
+    """进程池初始化函数，每个子进程只接收一次编码器数据"""
+    global _worker_encoder
+    _worker_encoder = encoder
+
+
+def _encode_in_worker(loop_range):
+    """在子进程中编码一段循环"""
+    return _worker_encoder.encode(*loop_range)
+
+
+def resolve_worker_count(workers, total_events):
+    """确定编码使用的进程数
+
+    Args:
+        workers: 指定的进程数，None表示自动
+        total_events: 事件总数
+
+    Returns:
+        int: 进程数，1表示在当前线程中顺序编码
+    """
+    if workers is not None:
+        return max(1, int(workers))
+    if total_events < PARALLEL_MIN_EVENTS:
+        return 1
+    return os.cpu_count() or 1
+
+
+class MacroScript:
+    """生成的宏脚本
+
+    只保存单次循环的基础事件列和循环参数，
+    完整的事件序列在写出或预览时按需展开。
+    """
+
+    def __init__(self, columns, loop_count, interval_ms, info):
+        """初始化宏脚本
+
+        Args:
+            columns: 单次循环的事件列
+            loop_count: 循环次数
+            interval_ms: 循环间隔毫秒数
+            info: 脚本info字段
+        """
+        self.columns = columns
+        self.loop_count = max(1, int(loop_count))
+        self.interval_ms = int(interval_ms)
+        self.info = info
+
+    def event_count(self):
+        """展开循环后的事件总数"""
+        return len(self.columns) * self.loop_count
+
+    def iter_events(self):
+        """按顺序产出展开循环后的所有事件字典"""
+        columns = self.columns
+        period = loop_period_ms(columns, self.interval_ms)
+        for loop in range(self.loop_count):
+            offset = loop * period
+            for index, event_time in enumerate(columns.times.tolist()):
+                yield columns.event_dict(index, event_time + offset)
+
+    def to_dict(self, max_events=None):
+        """转换为脚本字典
+
+        Args:
+            max_events: 最多包含的事件数量，None表示全部（仅适合小脚本）
+
+        Returns:
+            dict: 与写出文件结构相同的脚本字典
+        """
+        events = []
+        for event in self.iter_events():
+            if max_events is not None and len(events) >= max_events:
+                break
+            events.append(event)
+        return {"macroEvents": events, "info": self.info}
+
+    def _loop_ranges(self, chunk_size):
+        """按事件数量把循环范围切分为若干块，每块至少包含一个完整循环"""
+        loops_per_block = max(1, chunk_size // max(1, len(self.columns)))
+        for first_loop in range(0, self.loop_count, loops_per_block):
+            yield first_loop, min(self.loop_count, first_loop + loops_per_block)
+
+    def _iter_encoded_blocks(self, encoder, loop_ranges, workers):
+        """按顺序产出编码后的循环块
+
+        多进程时最多同时提交 workers * 2 个任务，保证内存占用有界；
+        生成器提前关闭（取消）时会取消尚未开始的任务。
+
+        Yields:
+            tuple: (编码后的字节, 块内事件数)
+        """
+        event_count = len(self.columns)
+        if workers <= 1:
+            for first_loop, last_loop in loop_ranges:
+                yield encoder.encode(first_loop, last_loop), (last_loop - first_loop) * event_count
+            return
+
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_encode_worker, initargs=(encoder,))
+        pending = deque()
+        try:
+            for loop_range in loop_ranges:
+                pending.append((executor.submit(_encode_in_worker, loop_range), loop_range))
+                if len(pending) >= workers * 2:
+                    future, (first_loop, last_loop) = pending.popleft()
+                    yield future.result(), (last_loop - first_loop) * event_count
+            while pending:
+                future, (first_loop, last_loop) = pending.popleft()
+                yield future.result(), (last_loop - first_loop) * event_count
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def write(self, file, progress_callback=None, is_cancelled=None, chunk_size=None, workers=None):
+        """将脚本流式写入文件
+
+        输出与 json.dump(script, f, ensure_ascii=False, separators=(',', ':')) 的UTF-8编码完全一致。
+        每次展开并写出若干个完整循环；事件数量很大时在进程池中并行编码，按循环顺序写出。
+
+        Args:
+            file: 以二进制模式打开的文件对象
+            progress_callback: 进度回调 callback(written, total)
+            is_cancelled: 取消检查函数，返回True时停止写出
+            chunk_size: 每块的事件数量，None表示按是否并行自动选择
+            workers: 编码进程数，None表示自动（事件数达到 PARALLEL_MIN_EVENTS 时使用全部CPU核心）
+
+        Returns:
+            bool: 全部写出返回True，被取消返回False
+        """
+        total = self.event_count()
+        workers = resolve_worker_count(workers, total)
+        if chunk_size is None:
+            chunk_size = PARALLEL_CHUNK_EVENTS if workers > 1 else WRITE_CHUNK_EVENTS
+
+        encoder = LoopBlockEncoder(self.columns, loop_period_ms(self.columns, self.interval_ms))
+        blocks = self._iter_encoded_blocks(encoder, self._loop_ranges(chunk_size), workers)
+        written = 0
+
+        file.write(b'{"macroEvents":[')
+        try:
+            for block, block_events in blocks:
+                # 第一个事件前没有逗号
+                file.write(block if written else block[1:])
+                written += block_events
+
+                if progress_callback:
+                    progress_callback(written, total)
+                if written < total and is_cancelled and is_cancelled():
+                    return False
+        finally:
+            blocks.close()
+
+        info_text = json.dumps(self.info, ensure_ascii=False, separators=_JSON_SEPARATORS)
+        file.write(('],"info":' + info_text + '}').encode("utf-8"))
+        return True
+
+
+class ScriptGenerationCache:
+    """脚本生成缓存
+
+    以事件存储的版本号为键缓存单次循环的事件列，
+    以版本号加生成设置为键缓存最终脚本：
+    事件和设置都未变化时直接复用脚本；只有设置变化时复用事件列，仅重新展开循环。
+    """
+
+    def __init__(self):
+        """初始化脚本生成缓存"""
+        self.clear()
+
+    def clear(self):
+        """清空所有缓存"""
+        self._columns_version = None
+        self._columns = None
+        self._script_key = None
+        self._script = None
+
+    @staticmethod
+    def _script_key_for(version, settings):
+        return (version, tuple(sorted(settings.items())))
+
+    def get_columns(self, version):
+        """获取缓存的事件列
+
+        Returns:
+            EventColumns: 事件列，未命中返回None
+        """
+        if version == self._columns_version:
+            return self._columns
+        return None
+
+    def get_script(self, version, settings):
+        """获取缓存的脚本
+
+        Returns:
+            MacroScript: 宏脚本，未命中返回None
+        """
+        if self._script_key == self._script_key_for(version, settings):
+            return self._script
+        return None
+
+    def set_script(self, version, settings, script):
+        """缓存生成的脚本及其事件列"""
+        self._script_key = self._script_key_for(version, settings)
+        self._script = script
+        self._columns_version = version
+        self._columns = script.columns
+
+
+# =============================================================================
+# 编码器基准测试
+# =============================================================================
+
+def _make_benchmark_store(count, seed=0):
+    """生成用于基准测试的随机事件存储（含没有键码和名称为空的事件）"""
+    rng = np.random.default_rng(seed)
+    type_strs = rng.choice(EVENT_TYPES, count).tolist()
+    keycodes = rng.integers(8, 256, count).tolist()
+    xs = rng.integers(0, 3840, count).tolist()
+    ys = rng.integers(0, 2160, count).tolist()
+    rel_times = rng.integers(0, 100, count).tolist()
+    no_keycode = (rng.random(count) < 0.05).tolist()
+    no_name = (rng.random(count) < 0.01).tolist()
+    records = []
+    for i, type_str in enumerate(type_strs):
+        type_code, mouse_button = type_codes_from_str(type_str)
+        keycode = keycodes[i] if type_str in KEY_EVENT_TYPES and not no_keycode[i] else NO_KEYCODE
+        records.append(("" if no_name[i] else type_str, type_code, mouse_button, keycode,
+                        xs[i], ys[i], rel_times[i], rel_times[0] if i == 0 else 0))
+    return EventStore(records)
+
+
+def _baseline_events(event_store):
+    """按旧流程从表格文本构建单次循环的脚本事件（仅用于基准对比）"""
+    events = []
+    for name, type_str, keycode, x, y, _, abs_time in event_store.to_string_rows():
+        if not name:
+            continue
+        event = {
+            "type": type_codes_from_str(type_str)[0],
+            "mouseX": int(x) if x else 0,
+            "mouseY": int(y) if y else 0,
+            "time": int(abs_time) if abs_time else 0
+        }
+        if type_str in KEY_EVENT_TYPES and keycode:
+            event["keyCode"] = int(keycode)
+        if type_str in ("左键按下", "左键释放"):
+            event["mouseButton"] = "Left"
+        elif type_str in ("右键按下", "右键释放"):
+            event["mouseButton"] = "Right"
+        elif type_str in ("中键按下", "中键释放"):
+            event["mouseButton"] = "Middle"
+        events.append(event)
+    return events
+
+
+def _materialize_events(base_events, loop_count, interval_ms):
+    """按旧流程展开为完整的事件字典列表（仅用于基准对比）"""
+    last_event_time = base_events[-1]["time"] if base_events else 0
+    events = []
+    for loop in range(loop_count):
+        offset = loop * (last_event_time + interval_ms)
+        for event in base_events:
+            new_event = event.copy()
+            new_event["time"] = event["time"] + offset
+            events.append(new_event)
+    return events
+
+
+def benchmark_encoder(sizes=BENCHMARK_SIZES, base_count=10_000, skip_json_above=None, directory=None, workers=None):
+    """对比流式编码器与 json.dump 的写出耗时，并校验输出是否逐字节一致
+
+    编码器的输入由 EventColumns.from_store() 从随机事件存储得到，
+    json.dump 的输入按旧流程从同一存储的表格文本构建，因此同时校验事件列的转换。
+    两者都只计写出文件的时间；json.dump 所需的完整事件列表在计时前构建。
+
+    Args:
+        sizes: 事件总数列表
+        base_count: 单次循环的事件数（超过事件总数时取事件总数）
+        skip_json_above: 事件数超过该值时跳过 json.dump 对比（避免内存不足），None表示不跳过
+        directory: 临时文件目录，None表示系统临时目录
+        workers: 编码进程数，None表示与保存脚本时相同的自动选择
+
+    Returns:
+        list: 每个规模的结果字典（events、encoder_seconds、json_seconds、identical）
+    """
+    info = build_script_info(1920, 1080, 1.0)
+    results = []
+
+    for size in sizes:
+        count = max(1, min(base_count, size))
+        event_store = _make_benchmark_store(count)
+        script = MacroScript(EventColumns.from_store(event_store), max(1, size // count), 1000, info)
+
+        fd, encoder_path = tempfile.mkstemp(suffix=".json", dir=directory)
+        os.close(fd)
+        json_path = None
+        try:
+            start = time.perf_counter()
+            with open(encoder_path, 'wb') as f:
+                script.write(f, workers=workers)
+            encoder_seconds = time.perf_counter() - start
+
+            json_seconds = None
+            identical = None
+            if skip_json_above is None or script.event_count() <= skip_json_above:
+                events = _materialize_events(_baseline_events(event_store), script.loop_count, script.interval_ms)
+                data = {"macroEvents": events, "info": script.info}
+                del events
+                fd, json_path = tempfile.mkstemp(suffix=".json", dir=directory)
+                os.close(fd)
+                start = time.perf_counter()
+                with open(json_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False, separators=_JSON_SEPARATORS)
+                json_seconds = time.perf_counter() - start
+                del data
+                identical = _files_equal(encoder_path, json_path)
+        finally:
+            for path in (encoder_path, json_path):
+                if path and os.path.exists(path):
+                    os.remove(path)
+
+        results.append({
+            "events": script.event_count(),
+            "encoder_seconds": encoder_seconds,
+            "json_seconds": json_seconds,
+            "identical": identical
+        })
+
+    return results
+
+
+def _files_equal(path_a, path_b, block_size=1 << 20):
+    """逐块比较两个文件内容是否一致"""
+    if os.path.getsize(path_a) != os.path.getsize(path_b):
+        return False
+    with open(path_a, 'rb') as fa, open(path_b, 'rb') as fb:
+        while True:
+            block_a = fa.read(block_size)
+            if block_a != fb.read(block_size):
+                return False
+            if not block_a:
+                return True
+
+
+def _print_benchmark_results(results):
+    """打印基准测试结果"""
+    print(f"{'事件数':>12} {'json.dump(s)':>14} {'编码器(s)':>12} {'加速比':>8} {'输出一致':>8}")
+    for result in results:
+        json_seconds = result["json_seconds"]
+        if json_seconds is None:
+            json_text, speedup_text, identical_text = "跳过", "-", "-"
+        else:
+            json_text = f"{json_seconds:.3f}"
+            speedup_text = f"{json_seconds / max(result['encoder_seconds'], 1e-9):.1f}x"
+            identical_text = "是" if result["identical"] else "否"
+        print(f"{result['events']:>12} {json_text:>14} {result['encoder_seconds']:>12.3f} "
+              f"{speedup_text:>8} {identical_text:>8}")
+
+
+if __name__ == "__main__":
+    # 用法: python script_engine.py [事件数 ...] [--skip-json-above N] [--workers N]
+    args = sys.argv[1:]
+    options = {}
+    for option in ("--skip-json-above", "--workers"):
+        if option in args:
+            index = args.index(option)
+            options[option] = int(args[index + 1])
+            del args[index:index + 2]
+    benchmark_sizes = tuple(int(arg) for arg in args) or BENCHMARK_SIZES
+    _print_benchmark_results(benchmark_encoder(
+        benchmark_sizes,
+        skip_json_above=options.get("--skip-json-above"),
+        workers=options.get("--workers")
+    ))
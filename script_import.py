@@ -0,0 +1,293 @@
+# script_import.py - 脚本导入模块
+"""
+脚本导入模块，负责增量解析BetterGI脚本文件。
+
+解析器按固定大小分块读取文件，只对 macroEvents 数组逐个解码事件对象，
+并按批次产出，内存占用与批次大小成正比，而与文件大小无关。
+
+导入完成后可用 detect_loop 识别由本程序展开循环生成的脚本，
+把它还原为单次循环的基础事件加循环次数和间隔时间。
+
+本模块不依赖Qt，可在任意线程中使用。
+"""
+
+import codecs
+import json
+
+import numpy as np
+
+# 每次从文件读取的字节数
+READ_CHUNK_BYTES = 1 << 20
+
+# 每批产出的事件数量
+IMPORT_BATCH_EVENTS = 5000
+
+_WHITESPACE = ' \t\n\r'
+
+
+class MacroEventReader:
+    """BetterGI脚本增量读取器
+
+    用法::
+
+        reader = MacroEventReader(f)
+        for batch in reader.iter_batches():
+            ...
+        if not reader.found_macro_events:
+            ...
+
+    结构错误抛出 json.JSONDecodeError，与 json.load 的行为保持一致。
+    """
+
+    def __init__(self, file, read_size=READ_CHUNK_BYTES):
+        """初始化读取器
+
+        Args:
+            file: 以二进制模式打开的文件对象
+            read_size: 每次读取的字节数
+        """
+        self._file = file
+        self._read_size = read_size
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json_decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+        self.bytes_read = 0  # 已读取的字节数，用于计算进度
+        self.info = None  # 脚本info字段
+        self.found_macro_events = False  # 是否找到macroEvents字段
+
+    # -------------------------------------------------------------------------
+    # 缓冲区管理
+    # -------------------------------------------------------------------------
+
+    def _fill(self):
+        """读取下一块数据，返回是否读到了新内容"""
+        if self._eof:
+            return False
+        data = self._file.read(self._read_size)
+        self.bytes_read += len(data)
+        if not data:
+            self._eof = True
+        text = self._decoder.decode(data, final=self._eof)
+        # 丢弃已解析的部分，避免缓冲区无限增长
+        self._buffer = self._buffer[self._pos:] + text
+        self._pos = 0
+        return bool(text) or not self._eof
+
+    def _peek(self):
+        """跳过空白并返回下一个字符，文件结束时返回空字符串"""
+        while True:
+            buffer = self._buffer
+            pos = self._pos
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            self._pos = pos
+            if pos < len(buffer):
+                return buffer[pos]
+            if not self._fill():
+                return ""
+
+    def _error(self, message):
+        return json.JSONDecodeError(message, self._buffer, self._pos)
+
+    def _expect(self, char):
+        """读取指定的结构字符"""
+        if self._peek() != char:
+            raise self._error(f"Expecting '{char}'")
+        self._pos += 1
+
+    def _decode_value(self):
+        """解码下一个完整的JSON值，数据不足时继续读取"""
+        self._peek()
+        while True:
+            try:
+                value, end = self._json_decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # 数字等值可能恰好在缓冲区末尾被截断，需要读到更多内容再确认
+            if end == len(self._buffer) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    # -------------------------------------------------------------------------
+    # 解析
+    # -------------------------------------------------------------------------
+
+    def iter_batches(self, batch_size=IMPORT_BATCH_EVENTS):
+        """按批次产出macroEvents中的事件
+
+        Args:
+            batch_size: 每批的事件数量
+
+        Yields:
+            list: 事件字典列表
+        """
+        self._expect('{')
+        if self._peek() == '}':
+            self._pos += 1
+            return
+
+        while True:
+            key = self._decode_value()
+            if not isinstance(key, str):
+                raise self._error("Expecting property name enclosed in double quotes")
+            self._expect(':')
+
+            if key == "macroEvents":
+                self.found_macro_events = True
+                for batch in self._iter_array_batches(batch_size):
+                    yield batch
+            else:
+                value = self._decode_value()
+                if key == "info":
+                    self.info = value
+
+            char = self._peek()
+            self._pos += 1
+            if char == '}':
+                break
+            if char != ',':
+                raise self._error("Expecting ',' delimiter")
+
+    def _iter_array_batches(self, batch_size):
+        """逐个解码数组元素并按批次产出"""
+        self._expect('[')
+        if self._peek() == ']':
+            self._pos += 1
+            return
+
+        batch = []
+        while True:
+            batch.append(self._decode_value())
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+
+            char = self._peek()
+            self._pos += 1
+            if char == ']':
+                break
+            if char != ',':
+                raise self._error("Expecting ',' delimiter")
+
+        if batch:
+            yield batch
+
+
+# =============================================================================
+# 循环检测
+# =============================================================================
+
+# 多项式哈希的基数（在 uint64 上自然溢出取模）
+_HASH_BASE = np.uint64(1000003)
+
+
+def _event_key_hashes(types, buttons, keycodes, xs, ys, gaps):
+    """把每个事件的 (类型, 鼠标按键, 键码, X, Y, 与上一事件的时间差) 合成一个 uint64 哈希值"""
+    hashes = np.zeros(len(types), dtype=np.uint64)
+    for column in (types, buttons, keycodes, xs, ys, gaps):
+        hashes = hashes * _HASH_BASE + np.asarray(column, dtype=np.int64).astype(np.uint64)
+    return hashes
+
+
+def _divisors(value):
+    """升序返回 value 的所有因数"""
+    small = []
+    large = []
+    factor = 1
+    while factor * factor <= value:
+        if value % factor == 0:
+            small.append(factor)
+            if factor * factor != value:
+                large.append(value // factor)
+        factor += 1
+    return small + large[::-1]
+
+
+def detect_loop(types, buttons, keycodes, xs, ys, times):
+    """检测事件序列是否由同一段基础事件按固定周期重复而成
+
+    满足条件的最小基础长度 n 需要：总数是 n 的整数倍且至少重复两次；
+    每个事件与 n 个位置之前的事件类型、按键、键码和坐标完全相同；
+    时间差恒为同一个周期 P，且 P 不小于基础事件的最后时间（间隔时间非负）。
+
+    时间差恒定等价于相邻事件的时间差以 n 为周期（第一个事件除外），因此把时间差和
+    其余各列一起做前缀多项式哈希，在 O(1) 内筛选每个候选长度，只对命中的候选做一次
+    精确比较，整体为线性时间。
+
+    Args:
+        types: 事件类型数组
+        buttons: 鼠标按键代码数组
+        keycodes: 键码数组
+        xs: X坐标数组
+        ys: Y坐标数组
+        times: 绝对时间数组
+
+    Returns:
+        tuple: (基础事件数, 循环次数, 间隔毫秒数)，未检测到循环返回None
+    """
+    count = len(times)
+    if count < 2:
+        return None
+
+    times = np.asarray(times, dtype=np.int64)
+    columns = [np.asarray(column, dtype=np.int64) for column in (types, buttons, keycodes, xs, ys)]
+    gaps = np.zeros(count, dtype=np.int64)
+    gaps[1:] = np.diff(times)
+    hashes = _event_key_hashes(*columns, gaps)
+
+    # prefix[i] = sum(hashes[j] * BASE^j, j < i)，powers[i] = BASE^i
+    with np.errstate(over='ignore'):
+        powers = np.empty(count + 1, dtype=np.uint64)
+        powers[0] = 1
+        powers[1:] = np.cumprod(np.full(count, _HASH_BASE, dtype=np.uint64))
+        prefix = np.zeros(count + 1, dtype=np.uint64)
+        prefix[1:] = np.cumsum(hashes * powers[:-1])
+
+    for base_count in _divisors(count)[:-1]:
+        shifted = count - base_count
+        # 以 base_count 为周期 <=> hashes[base_count + 1:] 与 hashes[1:shifted] 相同；
+        # 位置0的时间差没有意义，该位置的其余各列留给下面的精确比较
+        with np.errstate(over='ignore'):
+            if (prefix[shifted] - prefix[1]) * powers[base_count] != prefix[count] - prefix[base_count + 1]:
+                continue
+
+        if not all(np.array_equal(column[base_count:], column[:shifted]) for column in columns):
+            continue
+
+        deltas = times[base_count:] - times[:shifted]
+        period = int(deltas[0])
+        if not np.all(deltas == period):
+            continue
+
+        interval_ms = period - int(times[base_count - 1])
+        if interval_ms < 0:
+            continue
+
+        return base_count, count // base_count, interval_ms
+
+    return None
+
+
+def detect_store_loop(event_store):
+    """对事件存储中的全部事件做循环检测
+
+    Args:
+        event_store: 事件存储实例
+
+    Returns:
+        tuple: (基础事件数, 循环次数, 间隔毫秒数)，未检测到循环返回None
+    """
+    return detect_loop(
+        np.array(event_store.types, dtype=np.int64),
+        np.array(event_store.buttons, dtype=np.int64),
+        np.array(event_store.keycodes, dtype=np.int64),
+        np.array(event_store.xs, dtype=np.int64),
+        np.array(event_store.ys, dtype=np.int64),
+        np.array(event_store.abs_times, dtype=np.int64)
+    )
@@ -1,228 +1,180 @@
 # script_manager.py
 import os
 import json
+import threading
 from datetime import datetime
-from PyQt6.QtWidgets import QFileDialog, QMessageBox
+from PyQt6.QtWidgets import QFileDialog, QMessageBox, QProgressDialog
 from PyQt6.QtGui import QDesktopServices
-from PyQt6.QtCore import QThread, pyqtSignal
+from PyQt6.QtCore import Qt
 
 # 导入共享模块
 from styles import ChineseMessageBox
-from utils import VK_MAPPING, KEY_NAME_MAPPING, EVENT_TYPE_MAP, convert_event_type_str_to_num, convert_event_type_num_to_str, get_key_chinese_name, get_event_data_from_table, check_event_pairing
+from utils import VK_MAPPING, KEY_NAME_MAPPING, EVENT_TYPE_MAP, convert_event_type_str_to_num, convert_event_type_num_to_str_with_button, generate_key_event_name, get_key_chinese_name, check_event_pairing
+from event_store import record_from_strings, parse_int
+from script_engine import EventColumns, ScriptGenerationCache, build_script, interval_to_ms, interval_from_ms
+from script_import import MacroEventReader, detect_store_loop
+from task_executor import (TaskCancelled, GENERATE_SCRIPT_TASK, SAVE_SCRIPT_TASK, IMPORT_SCRIPT_TASK,
+                           PRIORITY_BACKGROUND, PRIORITY_EXPORT)
 from debug_tools import get_global_debug_logger
 
 # =============================================================================
 # 脚本管理类
 # =============================================================================
 
-class GenerateScriptThread(QThread):
-    """脚本生成线程类，负责在后台生成脚本"""
+# 导入时等待主线程处理的最大批次数
+IMPORT_MAX_PENDING_BATCHES = 4
+
+
+def script_event_to_record(event):
+    """将脚本事件转换为事件存储记录（相对偏移为0）
     
-    # 信号定义
-    script_generated = pyqtSignal(dict, str)  # 脚本生成成功信号
-    script_generation_failed = pyqtSignal(str)  # 脚本生成失败信号
-    pairing_check_failed = pyqtSignal(list)  # 事件成对性检查失败信号
-    pairing_check_passed = pyqtSignal()  # 事件成对性检查通过信号
+    事件名称、类型和键码只取决于 (type, mouseButton, keyCode)，
+    转换结果按该组合缓存，大文件导入时无需为每个事件重复查表。
     
-    def __init__(self, main_window, events_table):
-        super().__init__()
-        self.main_window = main_window
-        self.events_table = events_table
-        self.debug_logger = get_global_debug_logger()
+    Args:
+        event: 脚本事件字典
+        
+    Returns:
+        tuple: 事件记录
+    """
+    key = (event["type"], event.get("mouseButton"), event.get("keyCode"))
+    head = _record_head_cache.get(key)
+    if head is None:
+        # 转换事件类型，鼠标点击事件根据mouseButton区分左右中键
+        event_type = convert_event_type_num_to_str_with_button(event["type"], event.get("mouseButton"))
+        keycode = str(event.get("keyCode", "")) if event_type in ["按键按下", "按键释放"] else ""
+        head = record_from_strings([
+            generate_key_event_name(event_type, keycode),  # 事件名称
+            event_type,  # 事件类型
+            keycode,  # 键码
+            "0", "0", "0", "0"
+        ])[:4]
+        _record_head_cache[key] = head
     
-    def run(self):
-        """线程运行方法，执行脚本生成逻辑"""
-        try:
-            self.debug_logger.log_info("开始生成脚本...")
-            
-            # 收集事件数据
-            events = []
-            for row in range(self.events_table.rowCount()):
-                event_data = get_event_data_from_table(self.events_table, row)
-                
-                if event_data[0]:  # 如果事件名称不为空
-                    # 转换为脚本格式
-                    event_type_num = convert_event_type_str_to_num(event_data[1])
-                    script_event = {
-                        "type": event_type_num,
-                        "mouseX": int(event_data[3]) if event_data[3] else 0,
-                        "mouseY": int(event_data[4]) if event_data[4] else 0,
-                        "time": int(event_data[6]) if event_data[6] else 0  # 使用绝对偏移时间
-                    }
-                    
-                    # 如果是键盘事件，添加keyCode
-                    if event_data[1] in ["按键按下", "按键释放"] and event_data[2]:
-                        script_event["keyCode"] = int(event_data[2])
-                    
-                    # 如果是鼠标点击事件，添加mouseButton
-                    if event_data[1] in ["左键按下", "左键释放"]:
-                        script_event["mouseButton"] = "Left"
-                    elif event_data[1] in ["右键按下", "右键释放"]:
-                        script_event["mouseButton"] = "Right"
-                    elif event_data[1] in ["中键按下", "中键释放"]:
-                        script_event["mouseButton"] = "Middle"
-                    
-                    events.append(script_event)
-            
-            if not events:
-                self.script_generation_failed.emit("没有事件可生成脚本")
-                return
-            
-            # 获取循环次数
-            loop_count = self.main_window.settings_panel.get_safe_loop_count()
-            
-            # 获取间隔时间
-            interval = self.main_window.settings_panel.interval_input.value()
-            
-            # 转换时间单位为毫秒
-            time_unit = self.main_window.settings_panel.time_unit_combo.currentText()
-            if time_unit == "s":
-                interval_ms = int(interval * 1000)
-            elif time_unit == "min":
-                interval_ms = int(interval * 60000)
-            else:  # ms
-                interval_ms = int(interval)
-            
-            # 生成完整的事件序列（考虑循环）
-            full_events = []
-            last_event_time = 0
-            
-            for loop in range(loop_count):
-                for i, event in enumerate(events):
-                    # 复制事件
-                    new_event = event.copy()
-                    
-                    # 确保时间值为整数
-                    event_time = int(event["time"])
-                    
-                    # 如果是第一个循环，使用原始时间
-                    if loop == 0:
-                        new_event["time"] = event_time
-                    else:
-                        # 后续循环：时间 = 原始时间 + (循环索引 * (最后一个事件时间 + 间隔时间))
-                        new_event["time"] = event_time + loop * (last_event_time + interval_ms)
-                    
-                    full_events.append(new_event)
-                
-                # 更新最后一个事件的时间
-                if events:
-                    last_event_time = int(events[-1]["time"])
-            
-            # 获取缩放比例并转换为小数
-            scale_str = self.main_window.settings_panel.scale_combo.currentText()
-            try:
-                record_dpi = float(scale_str.strip('%')) / 100.0
-            except ValueError:
-                record_dpi = 1.0  # 如果转换失败，使用默认值1.0
-            
-            # 获取应用信息用于脚本描述
-            from utils import get_current_app_info
-            app_info = get_current_app_info()
-            
-            # 脚本结构
-            script = {
-                "macroEvents": full_events,
-                "info": {
-                    "description": "由BetterGI StellTrack创建",
-                    "x": 0,
-                    "y": 0,
-                    "width": int(self.main_window.settings_panel.width_input.text()),
-                    "height": int(self.main_window.settings_panel.height_input.text()),
-                    "recordDpi": record_dpi
-                }
-            }
-            
-            # 生成默认文件名
-            timestamp = datetime.now().strftime("%Y%m%d%H%M%S%f")[:-3]
-            default_filename = f"BetterGI_GCM_{timestamp}.json"
-            
-            # 发送脚本生成成功信号
-            self.script_generated.emit(script, default_filename)
-            
-        except Exception as e:
-            error_msg = f"生成脚本失败: {str(e)}"
-            self.script_generation_failed.emit(error_msg)
+    return head + (
+        parse_int(event.get("mouseX", 0)),  # X坐标
+        parse_int(event.get("mouseY", 0)),  # Y坐标
+        0,  # 相对偏移
+        parse_int(event.get("time", 0))  # 绝对偏移
+    )
+
+
+# (type, mouseButton, keyCode) -> (事件名称, 类型代码, 鼠标按键, 键码)
+_record_head_cache = {}
+
+
+def make_default_script_filename():
+    """生成默认的脚本文件名"""
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S%f")[:-3]
+    return f"BetterGI_GCM_{timestamp}.json"
+
+
+class ScriptFormatError(ValueError):
+    """脚本格式不正确"""
 
 
-class CheckEventPairingThread(QThread):
-    """事件成对性检查线程类，负责在后台检查事件成对性"""
+def generate_script_task(task, snapshot, settings):
+    """生成脚本（在任务执行器中执行）
     
-    # 信号定义
-    pairing_check_complete = pyqtSignal(bool, list)  # 检查完成信号
+    只构建单次循环的基础事件，循环展开推迟到保存时流式进行。
     
-    def __init__(self, events_table):
-        super().__init__()
-        self.events_table = events_table
-        self.debug_logger = get_global_debug_logger()
+    Args:
+        task: 任务句柄
+        snapshot: 在主线程拍摄的事件快照（EventSnapshot）
+        settings: 在主线程读取的生成设置字典
     
-    def run(self):
-        """线程运行方法，执行事件成对性检查逻辑"""
-        issues = check_event_pairing(self.events_table)
-        
-        # 发送检查完成信号
-        self.pairing_check_complete.emit(len(issues) == 0, issues)
+    Returns:
+        MacroScript: 生成的脚本，没有事件时返回None
+    """
+    events = EventColumns.from_store(snapshot)
+    if not len(events):
+        return None
+    return build_script(events, settings)
 
 
-class ImportScriptThread(QThread):
-    """脚本导入线程类，负责在后台导入脚本"""
+def save_script_task(task, script, filename):
+    """流式写出脚本文件（在任务执行器中执行），先写入临时文件，完成后再替换目标文件
     
-    # 信号定义
-    import_complete = pyqtSignal(list)  # 导入完成信号
-    import_failed = pyqtSignal(str)  # 导入失败信号
+    Args:
+        task: 任务句柄，进度为 (已写出事件数, 事件总数)
+        script: 要保存的脚本
+        filename: 目标文件路径
     
-    def __init__(self, filename, event_manager):
-        super().__init__()
-        self.filename = filename
-        self.event_manager = event_manager
-        self.debug_logger = get_global_debug_logger()
+    Returns:
+        str: 保存的文件路径
     
-    def run(self):
-        """线程运行方法，执行脚本导入逻辑"""
-        try:
-            # 读取并解析脚本文件
-            with open(self.filename, 'r', encoding='utf-8') as f:
-                script_data = json.load(f)
-            
-            # 检查脚本格式是否正确
-            if "macroEvents" not in script_data:
-                self.import_failed.emit("无效的脚本格式: 缺少macroEvents字段")
-                return
-            
-            # 导入事件
-            imported_events = []
-            for i, event in enumerate(script_data["macroEvents"]):
-                # 转换事件类型
-                event_type = convert_event_type_num_to_str(event["type"])
-                
-                # 获取事件数据
-                keycode = str(event.get("keyCode", "")) if event_type in ["按键按下", "按键释放"] else ""
-                mouse_x = str(event.get("mouseX", 0))
-                mouse_y = str(event.get("mouseY", 0))
-                time = str(event.get("time", 0))
-                
-                # 生成事件名称
-                from utils import generate_key_event_name
-                event_name = generate_key_event_name(event_type, keycode)
-                
-                # 添加到导入事件列表
-                imported_events.append([
-                    str(i + 1),  # 行号
-                    event_name,  # 事件名称
-                    event_type,  # 事件类型
-                    keycode,  # 键码
-                    mouse_x,  # X坐标
-                    mouse_y,  # Y坐标
-                    "0",  # 相对偏移（将在后续重新计算）
-                    time  # 绝对偏移
-                ])
-            
-            # 发送导入完成信号
-            self.import_complete.emit(imported_events)
-            
-        except json.JSONDecodeError:
-            self.import_failed.emit("无效的JSON文件格式")
-        except Exception as e:
-            self.import_failed.emit(f"导入脚本失败: {str(e)}")
+    Raises:
+        TaskCancelled: 用户取消保存
+    """
+    temp_filename = filename + ".part"
+    try:
+        with open(temp_filename, 'wb') as f:
+            finished = script.write(
+                f,
+                progress_callback=task.report_progress,
+                is_cancelled=task.is_cancelled
+            )
+        if not finished:
+            raise TaskCancelled()
+        os.replace(temp_filename, filename)
+        return filename
+    except Exception:
+        if os.path.exists(temp_filename):
+            try:
+                os.remove(temp_filename)
+            except OSError:
+                pass
+        raise
+
+
+def import_script_task(task, filename, batch_slots):
+    """增量解析脚本文件（在任务执行器中执行）
+    
+    事件按批次转换为事件存储记录，随进度交给主线程追加；
+    每个批次先占用 batch_slots 的一个名额，主线程处理完后释放，
+    等待主线程处理的批次数因此有上限，内存占用与文件大小无关。
+    
+    Args:
+        task: 任务句柄，进度为 (百分比, 已导入事件数, 本批事件记录)
+        filename: 脚本文件路径
+        batch_slots: threading.Semaphore，初始值为 IMPORT_MAX_PENDING_BATCHES
+    
+    Returns:
+        int: 导入的事件总数
+    
+    Raises:
+        ScriptFormatError: 缺少macroEvents字段
+        json.JSONDecodeError: 文件不是有效的JSON
+    """
+    file_size = max(1, os.path.getsize(filename))
+    imported_count = 0
+    prev_abs_time = None
+    
+    with open(filename, 'rb') as f:
+        reader = MacroEventReader(f)
+        for events in reader.iter_batches():
+            # 等待主线程消化积压的批次
+            while not batch_slots.acquire(timeout=0.1):
+                task.raise_if_cancelled()
+            task.raise_if_cancelled()
+            
+            records = []
+            for event in events:
+                record = script_event_to_record(event)
+                # 相对偏移 = 与上一个事件的绝对时间差，第一个事件为0
+                abs_time = record[7]
+                rel_time = 0 if prev_abs_time is None else abs_time - prev_abs_time
+                prev_abs_time = abs_time
+                records.append(record[:6] + (rel_time, abs_time))
+            
+            imported_count += len(records)
+            task.report_progress(min(100, reader.bytes_read * 100 // file_size), imported_count, records)
+    
+    # 检查脚本格式是否正确
+    if not reader.found_macro_events:
+        raise ScriptFormatError("无效的脚本格式: 缺少macroEvents字段")
+    
+    return imported_count
 
 
 class ScriptManager:
@@ -233,7 +185,7 @@ class ScriptManager:
     - 脚本验证：检查事件成对性和完整性
     - 脚本导出：保存生成的脚本到文件
     - 脚本导入：从文件加载脚本并转换为事件表格数据
-    - 多线程处理：使用线程在后台执行耗时操作，确保UI响应流畅
+    - 多线程处理：耗时操作交给主窗口的任务执行器在后台执行，确保UI响应流畅
     """
     
     def __init__(self, main_window):
@@ -245,28 +197,67 @@ class ScriptManager:
         self.main_window = main_window
         self.debug_logger = get_global_debug_logger()
         self.script = None  # 存储生成的脚本
+        self.generation_cache = ScriptGenerationCache()  # 脚本生成缓存
+        self.pending_generate = None  # 当前生成请求 (事件存储版本号, 生成设置)
+        
+        # 任务执行器：生成、保存和导入脚本在共享线程池中执行
+        self.task_executor = main_window.task_executor
+        self.import_batch_slots = None  # 导入时等待主线程处理的批次名额
+        self.save_progress_dialog = None
+        self.import_progress_dialog = None
+        self.importing = False  # 是否正在导入，取消或失败时通过撤销历史恢复导入前的事件
+    
+    def collect_generate_settings(self):
+        """在主线程读取脚本生成设置
         
-        # 线程实例，用于处理耗时操作
-        self.generate_script_thread = None
-        self.check_pairing_thread = None
-        self.import_script_thread = None
+        Returns:
+            dict: 生成设置（loop_count、interval_ms、width、height、record_dpi）
+        """
+        settings_panel = self.main_window.settings_panel
+        
+        # 转换时间单位为毫秒
+        interval_ms = interval_to_ms(settings_panel.interval_input.value(), settings_panel.time_unit_combo.currentText())
+        
+        # 获取缩放比例并转换为小数
+        scale_str = settings_panel.scale_combo.currentText()
+        try:
+            record_dpi = float(scale_str.strip('%')) / 100.0
+        except ValueError:
+            record_dpi = 1.0  # 如果转换失败，使用默认值1.0
+        
+        return {
+            "loop_count": settings_panel.get_safe_loop_count(),
+            "interval_ms": interval_ms,
+            "width": int(settings_panel.width_input.text()),
+            "height": int(settings_panel.height_input.text()),
+            "record_dpi": record_dpi
+        }
     
     def on_generate_script(self):
         """启动脚本生成流程
         
-        首先检查事件成对性，然后启动脚本生成线程。
+        事件和设置都未变化时直接复用缓存的脚本；
+        否则先从成对性索引读取当前问题（无需扫描事件），再生成脚本。
         处理脚本生成过程中的异常并显示错误信息。
         """
         try:
             self.debug_logger.log_info("开始生成脚本...")
             
-            # 检查事件成对性
             event_manager = self.main_window.event_manager
+            version = event_manager.event_store.version
+            settings = self.collect_generate_settings()
+            self.pending_generate = (version, settings)
+            
+            # 事件和设置都未变化，直接复用
+            cached_script = self.generation_cache.get_script(version, settings)
+            if cached_script is not None:
+                self.debug_logger.log_info("事件和设置均未变化，复用已生成的脚本")
+                self.on_script_generated(cached_script, make_default_script_filename())
+                return
             
-            # 创建并启动事件成对性检查线程
-            self.check_pairing_thread = CheckEventPairingThread(event_manager.events_table)
-            self.check_pairing_thread.pairing_check_complete.connect(self.on_pairing_check_complete)
-            self.check_pairing_thread.start()
+            # 检查事件成对性
+            issues = check_event_pairing(event_manager.event_store, event_manager.pairing_index)
+            self.on_pairing_check_complete(len(issues) == 0, issues)
             
         except Exception as e:
             error_msg = f"生成脚本失败: {str(e)}"
@@ -294,20 +285,44 @@ class ScriptManager:
         self.debug_logger.log_info("事件成对性检查通过")
         
         # 成对性检查通过，开始生成脚本
-        self.start_generate_script_thread()
+        self.start_generate_script_task()
     
-    def start_generate_script_thread(self):
-        """启动脚本生成线程
+    def start_generate_script_task(self):
+        """启动脚本生成任务
         
-        创建并启动脚本生成线程，连接相关信号处理程序。
+        事件未变化时复用缓存的事件列，只按新设置重新构建脚本；
+        否则拍摄事件快照，交给任务执行器生成，之前尚未完成的生成随之取消。
         """
         event_manager = self.main_window.event_manager
+        version, settings = self.pending_generate
+        
+        columns = self.generation_cache.get_columns(version)
+        if columns is not None:
+            self.debug_logger.log_info("事件未变化，复用已转换的事件，仅重新展开循环")
+            script = build_script(columns, settings)
+            self.generation_cache.set_script(version, settings, script)
+            self.on_script_generated(script, make_default_script_filename())
+            return
         
-        # 创建并启动脚本生成线程
-        self.generate_script_thread = GenerateScriptThread(self.main_window, event_manager.events_table)
-        self.generate_script_thread.script_generated.connect(self.on_script_generated)
-        self.generate_script_thread.script_generation_failed.connect(self.on_script_generation_failed)
-        self.generate_script_thread.start()
+        # 任务只读取快照，结果按快照的版本号缓存
+        snapshot = event_manager.event_store.snapshot()
+        self.task_executor.submit(
+            GENERATE_SCRIPT_TASK,
+            generate_script_task,
+            snapshot,
+            settings,
+            priority=PRIORITY_BACKGROUND,
+            on_finished=lambda script: self.on_generate_task_complete(script, snapshot.version, settings),
+            on_failed=lambda error: self.on_script_generation_failed(f"生成脚本失败: {error}")
+        )
+    
+    def on_generate_task_complete(self, script, version, settings):
+        """脚本生成任务完成回调，缓存生成结果"""
+        if script is None:
+            self.on_script_generation_failed("没有事件可生成脚本")
+            return
+        self.generation_cache.set_script(version, settings, script)
+        self.on_script_generated(script, make_default_script_filename())
     
     def on_script_generated(self, script, default_filename):
         """脚本生成成功回调"""
@@ -322,11 +337,12 @@ class ScriptManager:
             self.main_window.stats_panel.update_stats()
             
             # 获取循环次数
-            loop_count = self.main_window.settings_panel.get_safe_loop_count()
+            loop_count = script.loop_count
+            event_count = script.event_count()
             
             self.main_window.status_bar.showMessage("✅ 脚本生成成功")
-            self.debug_logger.log_info(f"脚本生成成功: {len(script['macroEvents'])} 个事件, {loop_count} 次循环")
-            ChineseMessageBox.show_info(self.main_window, "成功", f"脚本已成功生成！\n包含 {len(script['macroEvents'])} 个事件 ({loop_count} 次循环)\n文件名: {default_filename}")
+            self.debug_logger.log_info(f"脚本生成成功: {event_count} 个事件, {loop_count} 次循环")
+            ChineseMessageBox.show_info(self.main_window, "成功", f"脚本已成功生成！\n包含 {event_count} 个事件 ({loop_count} 次循环)\n文件名: {default_filename}")
         except Exception as e:
             error_msg = f"处理生成的脚本时失败: {str(e)}"
             self.debug_logger.log_error(error_msg, exc_info=True)
@@ -340,7 +356,7 @@ class ScriptManager:
     def check_event_pairing(self):
         """检查事件成对性"""
         event_manager = self.main_window.event_manager
-        issues = check_event_pairing(event_manager.events_table)
+        issues = check_event_pairing(event_manager.event_store, event_manager.pairing_index)
         
         if issues:
             # 显示详细的问题信息，并询问是否继续
@@ -362,8 +378,7 @@ class ScriptManager:
                 return
             
             # 生成默认文件名
-            timestamp = datetime.now().strftime("%Y%m%d%H%M%S%f")[:-3]
-            default_filename = f"BetterGI_GCM_{timestamp}.json"
+            default_filename = make_default_script_filename()
             
             filename, _ = QFileDialog.getSaveFileName(
                 self.main_window,
@@ -376,18 +391,72 @@ class ScriptManager:
                 self.debug_logger.log_info("用户取消保存脚本")
                 return
             
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(self.script, f, ensure_ascii=False, separators=(',', ':'))
+            if self.task_executor.is_active(SAVE_SCRIPT_TASK):
+                ChineseMessageBox.show_warning(self.main_window, "警告", "正在保存脚本，请稍候")
+                return
             
-            self.main_window.status_bar.showMessage(f"✅ 脚本已保存到: {filename}")
-            self.debug_logger.log_info(f"脚本已保存到: {filename}")
-            ChineseMessageBox.show_info(self.main_window, "成功", f"脚本已保存到:\n{filename}")
+            total = self.script.event_count()
+            
+            # 进度对话框，允许用户取消
+            self.save_progress_dialog = QProgressDialog("正在保存脚本...", "取消", 0, total, self.main_window)
+            self.save_progress_dialog.setWindowTitle("保存脚本")
+            self.save_progress_dialog.setWindowModality(Qt.WindowModality.WindowModal)
+            self.save_progress_dialog.setMinimumDuration(500)
+            self.save_progress_dialog.setAutoClose(False)
+            self.save_progress_dialog.setAutoReset(False)
+            
+            # 在任务执行器中流式写出脚本
+            task = self.task_executor.submit(
+                SAVE_SCRIPT_TASK,
+                save_script_task,
+                self.script,
+                filename,
+                priority=PRIORITY_EXPORT,
+                on_finished=self.on_save_complete,
+                on_failed=lambda error: self.on_save_failed(f"保存脚本失败: {error}"),
+                on_progress=self.on_save_progress,
+                on_cancelled=self.on_save_cancelled,
+                cancel_running=False
+            )
+            self.save_progress_dialog.canceled.connect(task.cancel)
+            
+            self.main_window.status_bar.showMessage("正在保存脚本...")
             
         except Exception as e:
             error_msg = f"保存脚本失败: {str(e)}"
             self.debug_logger.log_error(error_msg, exc_info=True)
             ChineseMessageBox.show_error(self.main_window, "错误", error_msg)
     
+    def on_save_progress(self, written, total, payload=None):
+        """脚本保存进度回调"""
+        if self.save_progress_dialog:
+            self.save_progress_dialog.setValue(written)
+    
+    def close_save_progress_dialog(self):
+        """关闭保存进度对话框"""
+        if self.save_progress_dialog:
+            self.save_progress_dialog.close()
+            self.save_progress_dialog = None
+    
+    def on_save_complete(self, filename):
+        """脚本保存完成回调"""
+        self.close_save_progress_dialog()
+        self.main_window.status_bar.showMessage(f"✅ 脚本已保存到: {filename}")
+        self.debug_logger.log_info(f"脚本已保存到: {filename}")
+        ChineseMessageBox.show_info(self.main_window, "成功", f"脚本已保存到:\n{filename}")
+    
+    def on_save_cancelled(self):
+        """脚本保存取消回调"""
+        self.close_save_progress_dialog()
+        self.main_window.status_bar.showMessage("已取消保存脚本")
+        self.debug_logger.log_info("用户取消保存脚本")
+    
+    def on_save_failed(self, error_msg):
+        """脚本保存失败回调"""
+        self.close_save_progress_dialog()
+        self.debug_logger.log_error(error_msg)
+        ChineseMessageBox.show_error(self.main_window, "错误", error_msg)
+    
     def on_import_script(self):
         """导入脚本"""
         try:
@@ -403,69 +472,179 @@ class ScriptManager:
                 self.debug_logger.log_info("用户取消导入脚本")
                 return
             
-            event_manager = self.main_window.event_manager
+            if self.task_executor.is_active(IMPORT_SCRIPT_TASK):
+                ChineseMessageBox.show_warning(self.main_window, "警告", "正在导入脚本，请稍候")
+                return
             
-            # 创建并启动脚本导入线程
-            self.import_script_thread = ImportScriptThread(filename, event_manager)
-            self.import_script_thread.import_complete.connect(self.on_import_complete)
-            self.import_script_thread.import_failed.connect(self.on_import_failed)
-            self.import_script_thread.start()
+            self.begin_import()
+            
+            # 进度对话框，允许用户取消
+            self.import_progress_dialog = QProgressDialog("正在导入脚本...", "取消", 0, 100, self.main_window)
+            self.import_progress_dialog.setWindowTitle("导入脚本")
+            self.import_progress_dialog.setWindowModality(Qt.WindowModality.WindowModal)
+            self.import_progress_dialog.setMinimumDuration(500)
+            self.import_progress_dialog.setAutoClose(False)
+            self.import_progress_dialog.setAutoReset(False)
+            
+            # 在任务执行器中增量解析，每批事件随进度交给主线程追加
+            self.import_batch_slots = threading.Semaphore(IMPORT_MAX_PENDING_BATCHES)
+            task = self.task_executor.submit(
+                IMPORT_SCRIPT_TASK,
+                import_script_task,
+                filename,
+                self.import_batch_slots,
+                priority=PRIORITY_EXPORT,
+                on_finished=self.on_import_complete,
+                on_failed=self.on_import_task_failed,
+                on_progress=self.on_import_task_progress,
+                on_cancelled=self.on_import_cancelled,
+                cancel_running=False
+            )
+            self.import_progress_dialog.canceled.connect(task.cancel)
+            
+            self.main_window.status_bar.showMessage("正在导入脚本...")
             
         except Exception as e:
             error_msg = f"导入脚本失败: {str(e)}"
             self.debug_logger.log_error(error_msg, exc_info=True)
             ChineseMessageBox.show_error(self.main_window, "错误", error_msg)
     
-    def on_import_complete(self, imported_events):
+    def begin_import(self):
+        """导入开始前清空当前事件，导入的全部修改作为一个撤销步骤，取消时整体撤回"""
+        event_manager = self.main_window.event_manager
+        
+        # 设置撤销检查点，之后的清空和导入属于同一个撤销步骤
+        self.main_window.save_state_to_undo_stack()
+        self.importing = True
+        
+        # 清空当前事件
+        event_manager.event_store.clear()
+        
+        # 重置搜索筛选条件，确保导入的事件都能显示出来
+        event_manager.on_reset_search_filter()
+        
+        # 开始批量操作，导入期间不记录中间状态
+        self.main_window._batch_operation = True
+    
+    def end_import(self):
+        """结束导入，关闭进度对话框"""
+        self.main_window._batch_operation = False
+        self.importing = False
+        if self.import_progress_dialog:
+            self.import_progress_dialog.close()
+            self.import_progress_dialog = None
+    
+    def rollback_import(self):
+        """撤回导入期间的全部修改，恢复导入前的事件"""
+        if self.importing:
+            self.main_window.undo_history.discard_pending()
+        self.end_import()
+        self.main_window.event_manager.update_stats()
+    
+    def on_import_task_progress(self, percent, imported_count, records):
+        """导入任务进度回调，追加本批事件并更新进度"""
+        self.on_import_batch(records)
+        self.on_import_progress(percent, imported_count)
+    
+    def on_import_batch(self, records):
+        """一批导入事件就绪回调，直接追加到事件存储"""
+        try:
+            if not self.importing:
+                return
+            self.main_window.event_manager.event_store.append_rows(records)
+        finally:
+            # 允许导入任务继续解析
+            if self.import_batch_slots is not None:
+                self.import_batch_slots.release()
+    
+    def on_import_progress(self, percent, imported_count):
+        """脚本导入进度回调"""
+        # 模态进度对话框的 setValue() 会处理事件，期间导入可能已经结束并关闭对话框
+        dialog = self.import_progress_dialog
+        if dialog:
+            dialog.setLabelText(f"正在导入脚本... 已导入 {imported_count} 个事件")
+            dialog.setValue(percent)
+    
+    def on_import_complete(self, imported_count):
         """脚本导入完成回调"""
         try:
             event_manager = self.main_window.event_manager
             
-            # 清空当前事件
-            event_manager.events_table.setRowCount(0)
-            
-            # 重置搜索筛选条件，确保导入的事件都能显示出来
-            event_manager.on_reset_search_filter()
+            # 本程序生成的循环脚本还原为单次循环
+            loop_info = self.collapse_imported_loops()
             
-            # 保存当前状态到撤销栈
-            self.main_window.save_state_to_undo_stack()
+            self.end_import()
             
-            # 开始批量操作
-            self.main_window._batch_operation = True
-            
-            try:
-                # 导入事件
-                event_manager.add_table_rows(imported_events)
-                
-                # 重新计算相对时间
-                event_manager.recalculate_relative_times()
-                
-                # 更新行号
-                event_manager.update_row_numbers()
-                
-                # 更新统计信息
-                event_manager.update_stats()
-                
-                # 标记状态变更
-                self.main_window.mark_state_dirty()
-                
-                self.main_window.status_bar.showMessage("✅ 脚本导入成功")
-                self.debug_logger.log_info(f"脚本导入成功: {len(imported_events)} 个事件")
-                ChineseMessageBox.show_info(self.main_window, "成功", f"脚本导入成功！\n包含 {len(imported_events)} 个事件")
-                
-                # 立即更新预计总时间
-                self.main_window.on_calculate_total_time()
-            finally:
-                # 结束批量操作
-                self.main_window._batch_operation = False
+            # 更新统计信息
+            event_manager.update_stats()
+            
+            # 标记状态变更
+            self.main_window.mark_state_dirty()
+            
+            self.main_window.status_bar.showMessage("✅ 脚本导入成功")
+            if loop_info:
+                base_count, loop_count, interval_ms = loop_info
+                self.debug_logger.log_info(f"脚本导入成功: {imported_count} 个事件，检测到 {loop_count} 次循环，"
+                                           f"还原为 {base_count} 个基础事件，间隔 {interval_ms}ms")
+                ChineseMessageBox.show_info(self.main_window, "成功",
+                                            f"脚本导入成功！\n包含 {imported_count} 个事件\n"
+                                            f"检测到脚本由 {base_count} 个事件循环 {loop_count} 次组成，"
+                                            f"已还原为单次循环并设置循环次数和间隔时间")
+            else:
+                self.debug_logger.log_info(f"脚本导入成功: {imported_count} 个事件")
+                ChineseMessageBox.show_info(self.main_window, "成功", f"脚本导入成功！\n包含 {imported_count} 个事件")
                 
         except Exception as e:
             error_msg = f"处理导入的脚本时失败: {str(e)}"
             self.debug_logger.log_error(error_msg, exc_info=True)
             ChineseMessageBox.show_error(self.main_window, "错误", error_msg)
     
+    def collapse_imported_loops(self):
+        """检测导入的事件是否为固定周期的循环，是则只保留一次循环
+        
+        同时把循环次数和间隔时间写回设置面板，重新生成时得到与原文件相同的脚本。
+        
+        Returns:
+            tuple: (基础事件数, 循环次数, 间隔毫秒数)，未还原返回None
+        """
+        store = self.main_window.event_manager.event_store
+        loop_info = detect_store_loop(store)
+        if not loop_info:
+            return None
+        
+        base_count, loop_count, interval_ms = loop_info
+        settings_panel = self.main_window.settings_panel
+        interval, time_unit = interval_from_ms(interval_ms)
+        
+        # 超出设置范围的循环无法通过设置还原，保留全部事件
+        if loop_count > settings_panel.loop_count_input.maximum() or interval > settings_panel.interval_input.maximum():
+            self.debug_logger.log_warning(f"检测到 {loop_count} 次循环，但循环次数或间隔时间超出设置范围，保留全部事件")
+            return None
+        
+        store.remove_range(base_count, store.row_count() - base_count)
+        settings_panel.loop_count_input.setValue(loop_count)
+        settings_panel.time_unit_combo.setCurrentText(time_unit)
+        settings_panel.interval_input.setValue(interval)
+        return loop_info
+    
+    def on_import_cancelled(self):
+        """脚本导入取消回调"""
+        self.rollback_import()
+        self.main_window.status_bar.showMessage("已取消导入脚本")
+        self.debug_logger.log_info("用户取消导入脚本")
+    
+    def on_import_task_failed(self, error):
+        """导入任务失败回调"""
+        if isinstance(error, json.JSONDecodeError):
+            self.on_import_failed("无效的JSON文件格式")
+        elif isinstance(error, ScriptFormatError):
+            self.on_import_failed(str(error))
+        else:
+            self.on_import_failed(f"导入脚本失败: {error}")
+    
     def on_import_failed(self, error_msg):
         """脚本导入失败回调"""
+        self.rollback_import()
         self.debug_logger.log_error(f"导入脚本失败: {error_msg}")
         ChineseMessageBox.show_error(self.main_window, "错误", error_msg)
     
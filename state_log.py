@@ -0,0 +1,352 @@
+# state_log.py - 状态日志模块
+"""
+状态日志模块，以"快照 + 预写日志（WAL）"的方式持久化事件和设置。
+
+状态文件（快照）只在日志增长到一定大小时才整体重写，平时自动保存只把
+上次保存以来的修改作为一行行 JSON 记录追加到日志文件，没有修改时不写入任何内容。
+启动时先加载快照，再按顺序重放快照之后的日志，得到退出前的状态。
+
+日志按代编号：重写快照时新的修改写入下一代日志，快照中记录它之后的第一代，
+快照写入成功后才删除旧的日志，因此任何时刻异常退出都能恢复。
+
+收集修改在主线程进行，编码和写入文件（stage() 之后的 write_staged()、
+write_snapshot()）可以交给后台线程，所有文件都先写临时文件再原子替换。
+状态文件使用二进制项目格式（见 project_file 模块），启动时内存映射加载。
+
+本模块不依赖Qt。
+"""
+
+import glob
+import json
+import os
+import re
+import threading
+
+from event_store import CHANGE_INSERT, CHANGE_REMOVE, CHANGE_UPDATE, CHANGE_RESET, CHANGE_TIMES
+from project_file import capture_state, write_binary_project
+
+# 日志超过该大小且超过快照大小时重写快照
+DEFAULT_COMPACT_BYTES = 4 * 1024 * 1024
+
+# 日志记录类型
+_LOG_INSERT = "insert"      # ["insert", 位置, 记录列表]
+_LOG_REMOVE = "remove"      # ["remove", 第一行, 行数]
+_LOG_UPDATE = "update"      # ["update", 第一行, 记录列表]
+_LOG_RESET = "reset"        # ["reset", 记录列表]
+_LOG_ORIGIN = "origin"      # ["origin", 时间原点]
+_LOG_SETTINGS = "settings"  # ["settings", 设置字典]
+
+
+def write_state_snapshot(snapshot):
+    """把 StateLog.begin_snapshot() 返回的快照写入状态文件（二进制项目格式）
+
+    Returns:
+        int: 写入的字节数
+    """
+    meta = {'settings': snapshot['settings'], 'wal_generation': snapshot['generation']}
+    return write_binary_project(snapshot['path'], snapshot, meta)
+
+
+class StateLog:
+    """状态文件的预写日志
+
+    作为事件存储的监听器收集修改，stage() 把修改放入待写队列，write_staged() 追加到日志文件。
+    记录中保存的是修改后的数据，重放时直接写入即可，与修改时采用的时间计算方式无关。
+
+    stage()、begin_snapshot() 等方法只能在主线程调用；write_staged() 和 write_snapshot()
+    只访问待写队列和日志文件，可以在同一个后台线程中按提交顺序调用。
+    """
+
+    def __init__(self, event_store, path, compact_bytes=DEFAULT_COMPACT_BYTES):
+        """初始化状态日志
+
+        Args:
+            event_store: 事件存储实例
+            path: 状态文件（快照）路径，日志文件保存在同一目录
+            compact_bytes: 日志超过该大小且超过快照大小时重写快照
+        """
+        self.event_store = event_store
+        self.path = path
+        self.compact_bytes = compact_bytes
+        self._generation = 0
+        self._opened = False
+        self._file = None  # 当前打开的日志文件，只由写入线程使用
+        self._file_generation = None
+        self._staged = []  # 待写入的 (代编号, 记录列表)
+        self._lock = threading.Lock()
+        self._log_size = 0
+        self._snapshot_size = 0
+        self._pending = []
+        self._settings = None  # 最近写入的设置
+        self._origin = None  # 最近写入的时间原点
+        self._snapshot_needed = False
+
+    def _log_path(self, generation):
+        root, _ = os.path.splitext(self.path)
+        return f"{root}.{generation}.wal"
+
+    def _log_generations(self):
+        """磁盘上现有日志的代编号（升序）"""
+        root, _ = os.path.splitext(self.path)
+        pattern = re.compile(re.escape(os.path.basename(root)) + r"\.(\d+)\.wal$")
+        generations = []
+        for file_path in glob.glob(glob.escape(root) + ".*.wal"):
+            match = pattern.match(os.path.basename(file_path))
+            if match:
+                generations.append(int(match.group(1)))
+        return sorted(generations)
+
+    def _store_origin(self):
+        store = self.event_store
+        return store.abs_time(0) - store.rel_time(0) if store.row_count() else 0
+
+    # -------------------------------------------------------------------------
+    # 打开和重放
+    # -------------------------------------------------------------------------
+
+    def open(self, generation, settings=None):
+        """重放快照之后的日志，并开始记录修改
+
+        调用前事件存储中应已加载快照的内容。
+
+        Args:
+            generation: 快照中记录的日志代编号；None表示没有可用的快照，
+                此时丢弃全部旧日志，第一次保存时写入完整快照
+            settings: 快照中的设置
+
+        Returns:
+            dict: 日志中最新的设置，没有设置记录时为None
+        """
+        self.close()
+        latest_settings = None
+        generations = self._log_generations()
+        if generation is None:
+            for old in generations:
+                os.remove(self._log_path(old))
+            generations = []
+            self._generation = 0
+            self._snapshot_needed = True
+        else:
+            for old in generations:
+                if old < generation:
+                    os.remove(self._log_path(old))
+            generations = [g for g in generations if g >= generation]
+            for g in generations:
+                replayed = self._replay(self._log_path(g))
+                if replayed is not None:
+                    latest_settings = replayed
+            self._generation = generations[-1] if generations else generation
+            self._snapshot_needed = False
+            if os.path.exists(self.path):
+                self._snapshot_size = os.path.getsize(self.path)
+
+        log_path = self._log_path(self._generation)
+        self._log_size = os.path.getsize(log_path) if os.path.exists(log_path) else 0
+        self._opened = True
+        self._settings = latest_settings if latest_settings is not None else settings
+        self._origin = self._store_origin()
+        self._pending = []
+        self.event_store.add_listener(self.on_store_changed)
+        return latest_settings
+
+    def is_open(self):
+        """是否已经开始记录修改"""
+        return self._opened
+
+    def _replay(self, log_path):
+        """重放一个日志文件，截断写入中断的最后一条记录
+
+        Returns:
+            dict: 日志中最新的设置，没有设置记录时为None
+        """
+        store = self.event_store
+        settings = None
+        valid_end = 0
+        with open(log_path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                kind = entry[0]
+                if kind == _LOG_INSERT:
+                    store.insert_rows(entry[1], [tuple(record) for record in entry[2]])
+                elif kind == _LOG_REMOVE:
+                    store.remove_range(entry[1], entry[2])
+                elif kind == _LOG_UPDATE:
+                    for offset, record in enumerate(entry[2]):
+                        store.set_record(entry[1] + offset, tuple(record))
+                elif kind == _LOG_RESET:
+                    store.reset([tuple(record) for record in entry[1]])
+                elif kind == _LOG_ORIGIN:
+                    if store.row_count():
+                        store.set_abs_time(0, entry[1] + store.rel_time(0))
+                elif kind == _LOG_SETTINGS:
+                    settings = entry[1]
+                valid_end += len(line)
+        if valid_end != os.path.getsize(log_path):
+            with open(log_path, 'r+b') as f:
+                f.truncate(valid_end)
+        return settings
+
+    def close(self):
+        """停止记录并关闭日志文件（应在写入线程空闲时调用）"""
+        self.event_store.remove_listener(self.on_store_changed)
+        self._opened = False
+        with self._lock:
+            self._staged = []
+            self._close_file()
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._file_generation = None
+
+    # -------------------------------------------------------------------------
+    # 记录修改
+    # -------------------------------------------------------------------------
+
+    def on_store_changed(self, change, first, count):
+        """事件存储变更回调，记录修改后的数据"""
+        store = self.event_store
+        if change == CHANGE_INSERT:
+            self._pending.append([_LOG_INSERT, first, store.get_records(first, first + count)])
+        elif change == CHANGE_REMOVE:
+            self._pending.append([_LOG_REMOVE, first, count])
+        elif change == CHANGE_UPDATE:
+            self._pending.append([_LOG_UPDATE, first, store.get_records(first, first + count)])
+        elif change == CHANGE_RESET:
+            self._pending.append([_LOG_RESET, store.get_records()])
+        elif change == CHANGE_TIMES and first == 0:
+            # 整体时间平移只改变时间原点
+            origin = self._store_origin()
+            if origin != self._origin:
+                self._pending.append([_LOG_ORIGIN, origin])
+        if change != CHANGE_REMOVE and first == 0:
+            self._origin = self._store_origin()
+
+    def is_dirty(self, settings):
+        """上次保存之后事件或设置是否有修改"""
+        return bool(self._pending) or settings != self._settings or self._snapshot_needed
+
+    def stage(self, settings):
+        """把上次保存之后的修改放入待写队列，没有修改时不做任何事
+
+        Args:
+            settings: 当前设置
+
+        Returns:
+            bool: 是否有需要写入的内容
+        """
+        if settings != self._settings:
+            self._pending.append([_LOG_SETTINGS, settings])
+            self._settings = settings
+        if not self._pending:
+            return False
+        with self._lock:
+            self._staged.append((self._generation, self._pending))
+        self._pending = []
+        return True
+
+    def write_staged(self):
+        """把待写队列中的记录追加到各代日志文件并同步到磁盘（可在后台线程中调用）
+
+        Returns:
+            int: 写入的字节数
+        """
+        with self._lock:
+            batches, self._staged = self._staged, []
+        written = 0
+        for generation, entries in batches:
+            data = "".join(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n"
+                           for entry in entries).encode('utf-8')
+            if self._file_generation != generation:
+                self._close_file()
+                self._file = open(self._log_path(generation), 'ab')
+                self._file_generation = generation
+            self._file.write(data)
+            written += len(data)
+            if generation == self._generation:
+                self._log_size += len(data)
+        if self._file is not None and written:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        return written
+
+    def flush(self, settings):
+        """立即把修改追加到日志（在当前线程中写入）
+
+        Returns:
+            bool: 是否写入了内容
+        """
+        if not self.stage(settings):
+            return False
+        self.write_staged()
+        return True
+
+    # -------------------------------------------------------------------------
+    # 重写快照
+    # -------------------------------------------------------------------------
+
+    def needs_snapshot(self):
+        """是否应该重写快照（没有可用快照，或日志已超过快照大小）"""
+        return self._snapshot_needed or (self._log_size > self.compact_bytes
+                                         and self._log_size > self._snapshot_size)
+
+    def request_snapshot(self):
+        """下次保存时重写快照（例如状态文件需要换用新格式）"""
+        self._snapshot_needed = True
+
+    def begin_snapshot(self, settings):
+        """开始重写快照：当前修改放入待写队列，之后的修改记入下一代日志，并复制当前状态
+
+        复制各列只是内存拷贝，序列化和写入由 write_snapshot() 完成。
+
+        Args:
+            settings: 当前设置
+
+        Returns:
+            dict: 快照
+        """
+        if not self._snapshot_needed:
+            self.stage(settings)
+        self._pending = []
+        self._settings = settings
+        self._generation += 1
+        self._log_size = 0
+        snapshot = capture_state(self.event_store, settings)
+        snapshot['path'] = self.path
+        snapshot['generation'] = self._generation
+        return snapshot
+
+    def write_snapshot(self, snapshot):
+        """写入快照，成功后删除已包含在快照中的旧日志（可在后台线程中调用）
+
+        应在之前提交的 write_staged() 之后调用，保证旧一代日志先于新一代写完。
+
+        Returns:
+            tuple: (快照, 写入的字节数)
+        """
+        size = write_state_snapshot(snapshot)
+        with self._lock:
+            if self._file_generation is not None and self._file_generation < snapshot['generation']:
+                self._close_file()
+        for old in self._log_generations():
+            if old < snapshot['generation']:
+                os.remove(self._log_path(old))
+        return snapshot, size
+
+    def finish_snapshot(self, snapshot, size):
+        """快照写入成功后更新记录（主线程调用）
+
+        写入失败时不需要调用：旧日志仍然保留，下次保存时会重新写入快照。
+
+        Args:
+            snapshot: begin_snapshot() 返回的快照
+            size: 写入的字节数
+        """
+        self._snapshot_needed = False
+        self._snapshot_size = size
@@ -476,7 +476,7 @@ class UnifiedStyleHelper:
         """获取表格样式"""
         # 使用系统默认字体，避免硬编码字体名称
         return f"""
-            QTableWidget {{ 
+            QTableView {{ 
                 border: 1px solid {self.COLORS['border']};
                 border-radius: 6px;
                 background-color: white;
@@ -485,16 +485,16 @@ class UnifiedStyleHelper:
                 outline: none;
                 {self.SHADOWS['medium']}
             }}
-            QTableWidget::item {{ 
+            QTableView::item {{ 
                 padding: 6px 8px;
                 border: none;
                 text-align: center;
             }}
-            QTableWidget::item:selected {{ 
+            QTableView::item:selected {{ 
                 background-color: {self.COLORS['primary']};
                 color: white;
             }}
-            QTableWidget::item:hover {{ 
+            QTableView::item:hover {{ 
                 background-color: #f0f8ff;
             }}
             QHeaderView::section {{ 
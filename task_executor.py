@@ -0,0 +1,248 @@
+# task_executor.py - 后台任务执行模块
+"""
+后台任务执行模块，排序、批量编辑、脚本生成、导入导出等耗时计算都在共享线程池中执行。
+
+- 线程池大小固定，频繁操作时不会不断创建新线程。
+- 任务按优先级排队：交互操作（排序、批量编辑）优先于后台计算（脚本生成），再优先于导入导出。
+- 同一个键的任务合并：尚未开始的任务被新提交的任务取代；正在执行的任务默认随之取消，
+  它的结果不会再交给主线程。
+- 任务函数的第一个参数是任务句柄（Task），通过它检查取消请求、报告进度。
+- 完成、失败、取消和进度回调都在主线程中调用。
+
+保存文件必须严格按提交顺序进行，仍由 persistence.PersistenceWorker 单独负责。
+"""
+
+import threading
+
+from PyQt6.QtCore import QObject, QRunnable, QThread, QThreadPool, pyqtSignal
+
+from debug_tools import get_global_debug_logger
+
+# 任务优先级（数值越大越先执行）
+PRIORITY_INTERACTIVE = 30  # 交互操作：排序、批量编辑
+PRIORITY_BACKGROUND = 20  # 后台计算：脚本生成
+PRIORITY_EXPORT = 10  # 导入导出：保存脚本、导入脚本
+
+# 任务键
+SORT_TASK = "sort"  # 按绝对时间排序
+BATCH_EDIT_TASK = "batch_edit"  # 批量编辑
+GENERATE_SCRIPT_TASK = "generate_script"  # 生成脚本
+SAVE_SCRIPT_TASK = "save_script"  # 保存脚本
+IMPORT_SCRIPT_TASK = "import_script"  # 导入脚本
+
+# 任务状态
+TASK_PENDING = "pending"
+TASK_RUNNING = "running"
+TASK_DONE = "done"
+
+
+class TaskCancelled(Exception):
+    """任务已取消，任务函数可以抛出它提前结束"""
+
+
+class Task:
+    """后台任务句柄
+
+    在主线程中由 TaskExecutor.submit() 创建；任务函数在工作线程中通过它检查取消请求和报告进度。
+    """
+
+    def __init__(self, executor, key, func, args, priority, callbacks):
+        self.executor = executor
+        self.key = key
+        self.priority = priority
+        self.state = TASK_PENDING
+        self._func = func
+        self._args = args
+        self._callbacks = callbacks  # 完成、失败、进度、取消回调
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        """请求取消任务（可在任意线程中调用）"""
+        self._cancel_event.set()
+
+    def is_cancelled(self):
+        """是否已请求取消"""
+        return self._cancel_event.is_set()
+
+    def raise_if_cancelled(self):
+        """已请求取消时抛出 TaskCancelled"""
+        if self._cancel_event.is_set():
+            raise TaskCancelled()
+
+    def report_progress(self, done, total, payload=None):
+        """报告进度（在任务函数中调用），主线程的进度回调收到 (done, total, payload)
+
+        Args:
+            done: 已完成量
+            total: 总量
+            payload: 随进度交给主线程的数据（可选，例如一批导入的事件）
+        """
+        if not self._cancel_event.is_set():
+            self.executor._progress.emit(self, (done, total, payload))
+
+    def is_active(self):
+        """任务是否尚未结束"""
+        return self.state != TASK_DONE
+
+
+class _TaskRunnable(QRunnable):
+    """在线程池中执行一个任务"""
+
+    def __init__(self, task):
+        super().__init__()
+        self.task = task
+
+    def run(self):
+        task = self.task
+        executor = task.executor
+        if not executor._start(task):
+            return
+        try:
+            result = task._func(task, *task._args)
+        except TaskCancelled:
+            executor._finished.emit(task, None)
+        except Exception as e:
+            executor._failed.emit(task, e)
+        else:
+            executor._finished.emit(task, result)
+
+
+class TaskExecutor(QObject):
+    """共享线程池任务执行器（在主线程中创建和使用）"""
+
+    # 工作线程 -> 主线程
+    _finished = pyqtSignal(object, object)  # (任务, 结果)
+    _failed = pyqtSignal(object, object)  # (任务, 异常)
+    _progress = pyqtSignal(object, object)  # (任务, (已完成量, 总量, 附带数据))
+
+    def __init__(self, parent=None, max_threads=None):
+        """初始化任务执行器
+
+        Args:
+            parent: 父对象
+            max_threads: 最大线程数，默认为 CPU 核心数（2到4之间）
+        """
+        super().__init__(parent)
+        self.debug_logger = get_global_debug_logger()
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(max_threads or max(2, min(4, QThread.idealThreadCount())))
+        self._lock = threading.Lock()
+        self._pending = {}  # 任务键 -> 排队中的任务
+        self._running = {}  # 任务键 -> 执行中的任务
+        self._finished.connect(self._on_finished)
+        self._failed.connect(self._on_failed)
+        self._progress.connect(self._on_progress)
+
+    def submit(self, key, func, *args, priority=PRIORITY_BACKGROUND, on_finished=None, on_failed=None,
+               on_progress=None, on_cancelled=None, cancel_running=True):
+        """提交任务
+
+        同一个键尚未开始的任务会被取代；cancel_running 为True时同键的执行中任务也会被取消。
+
+        Args:
+            key: 任务键
+            func: 任务函数 func(task, *args)，在工作线程中执行
+            *args: 任务参数，应为不可变数据或快照
+            priority: 优先级
+            on_finished: 完成回调 on_finished(result)
+            on_failed: 失败回调 on_failed(exception)
+            on_progress: 进度回调 on_progress(done, total, payload)
+            on_cancelled: 取消回调 on_cancelled()，被新任务取代时不调用
+
+        Returns:
+            Task: 任务句柄
+        """
+        task = Task(self, key, func, args, priority, (on_finished, on_failed, on_progress, on_cancelled))
+        with self._lock:
+            superseded = self._pending.pop(key, None)
+            running = self._running.get(key)
+            self._pending[key] = task
+        if superseded is not None:
+            # 排队中的旧任务出队时直接跳过
+            superseded._callbacks = (None, None, None, None)
+            superseded.cancel()
+        if cancel_running and running is not None:
+            running._callbacks = (None, None, None, None)
+            running.cancel()
+
+        # QRunnable 交给线程池管理，执行结束后自动释放
+        self._pool.start(_TaskRunnable(task), priority)
+        return task
+
+    def is_active(self, key):
+        """指定键是否有排队中或执行中的任务"""
+        with self._lock:
+            return key in self._pending or key in self._running
+
+    def cancel(self, key):
+        """取消指定键的任务"""
+        with self._lock:
+            tasks = [task for task in (self._pending.get(key), self._running.get(key)) if task is not None]
+        for task in tasks:
+            task.cancel()
+
+    def wait_idle(self, timeout_ms=-1):
+        """等待所有任务执行完毕（回调仍需事件循环处理）
+
+        Returns:
+            bool: 是否在超时前执行完毕
+        """
+        return self._pool.waitForDone(timeout_ms)
+
+    def shutdown(self, timeout_ms=3000):
+        """取消全部任务并等待工作线程结束（程序退出时调用）"""
+        with self._lock:
+            tasks = list(self._pending.values()) + list(self._running.values())
+        for task in tasks:
+            task._callbacks = (None, None, None, None)
+            task.cancel()
+        self._pool.clear()
+        return self._pool.waitForDone(timeout_ms)
+
+    # -------------------------------------------------------------------------
+    # 任务状态（_start 在工作线程中调用，其余在主线程中调用）
+    # -------------------------------------------------------------------------
+
+    def _start(self, task):
+        """任务出队，返回False表示任务已被取代或取消"""
+        with self._lock:
+            if self._pending.get(task.key) is task:
+                del self._pending[task.key]
+            if task.is_cancelled():
+                task.state = TASK_DONE
+                self._finished.emit(task, None)
+                return False
+            task.state = TASK_RUNNING
+            self._running[task.key] = task
+        return True
+
+    def _finish(self, task):
+        """任务结束，返回任务的回调"""
+        task.state = TASK_DONE
+        with self._lock:
+            if self._running.get(task.key) is task:
+                del self._running[task.key]
+        return task._callbacks
+
+    def _on_finished(self, task, result):
+        on_finished, _, _, on_cancelled = self._finish(task)
+        if task.is_cancelled():
+            if on_cancelled is not None:
+                on_cancelled()
+        elif on_finished is not None:
+            on_finished(result)
+
+    def _on_failed(self, task, error):
+        _, on_failed, _, on_cancelled = self._finish(task)
+        if task.is_cancelled():
+            if on_cancelled is not None:
+                on_cancelled()
+            return
+        self.debug_logger.log_warning(f"后台任务 {task.key} 失败: {error}")
+        if on_failed is not None:
+            on_failed(error)
+
+    def _on_progress(self, task, progress):
+        on_progress = task._callbacks[2]
+        if on_progress is not None and not task.is_cancelled():
+            on_progress(*progress)
@@ -12,10 +12,18 @@ from styles import UnifiedStyleHelper, ChineseMessageBox, ModernGroupBox, Center
 class EventTimeAnalyzerDialog(StyledDialog):
     """事件时间分析对话框"""
     
-    def __init__(self, parent=None, events_table=None):
+    def __init__(self, parent=None, event_store=None, rows=None):
+        """初始化事件时间分析对话框
+        
+        Args:
+            parent: 父窗口
+            event_store: 事件存储实例
+            rows: 只分析这些行（例如搜索查询命中的行），None表示全部事件
+        """
         super().__init__(parent)
-        self.events_table = events_table
-        self.setWindowTitle("事件时间分析")
+        self.event_store = event_store
+        self.rows = rows
+        self.setWindowTitle("事件时间分析" if rows is None else f"事件时间分析（搜索结果 {len(rows)} 个事件）")
         self.setFixedSize(600, 480)  # 大幅增加窗口大小以确保内容完全显示
         
         # 设置窗口标志，删除最小化和最大化按钮
@@ -144,31 +152,22 @@ class EventTimeAnalyzerDialog(StyledDialog):
         main_layout.addLayout(reset_layout)
     
     def populate_event_combos(self):
-        """从事件表格中填充事件列表到下拉框，只严格排除鼠标移动事件"""
-        if not self.events_table:
+        """从事件存储中填充事件列表到下拉框，只严格排除鼠标移动事件"""
+        if self.event_store is None:
             return
         
         # 获取所有唯一事件名称，只严格排除鼠标移动事件
         event_names = set()
-        for row in range(self.events_table.rowCount()):
-            item = self.events_table.item(row, 1)  # 事件名称在第2列（索引1）
-            event_type_item = self.events_table.item(row, 2)  # 事件类型在第3列（索引2）
-            
-            # 确保项目存在且有文本内容
-            if item and item.text():
-                # 只排除明确标识为鼠标移动的事件
-                skip_event = False
-                
-                # 通过事件类型判断是否为鼠标移动事件
-                if event_type_item and event_type_item.text() == "鼠标移动":
-                    skip_event = True
-                # 只在事件名称完全匹配"鼠标移动"时才排除
-                elif item.text().strip() == "鼠标移动":
-                    skip_event = True
+        for event_name, type_code in zip(self.event_store.names, self.event_store.types):
+            # 确保事件名称有内容
+            if event_name:
+                # 通过事件类型判断是否为鼠标移动事件（类型码2），
+                # 或者事件名称完全匹配"鼠标移动"时排除
+                if type_code == 2 or event_name.strip() == "鼠标移动":
+                    continue
                     
                 # 添加非鼠标移动事件
-                if not skip_event:
-                    event_names.add(item.text())
+                event_names.add(event_name)
         
         # 转换为列表并排序
         sorted_event_names = sorted(event_names)
@@ -179,7 +178,7 @@ class EventTimeAnalyzerDialog(StyledDialog):
     
     def on_analyze(self):
         """开始分析事件时间"""
-        if not self.events_table:
+        if self.event_store is None:
             ChineseMessageBox.show_error(self, "错误", "未找到事件表格数据")
             return
         
@@ -195,27 +194,23 @@ class EventTimeAnalyzerDialog(StyledDialog):
         time_pairs = []
         start_events = []
         
-        for row in range(self.events_table.rowCount()):
-            event_name_item = self.events_table.item(row, 1)
-            event_time_item = self.events_table.item(row, 7)  # 绝对偏移时间在第8列（索引7）
-            
-            if event_name_item and event_time_item:
-                event_name = event_name_item.text()
-                try:
-                    event_time = int(event_time_item.text())
-                    
-                    if event_name == start_event:
-                        # 记录起始事件
-                        start_events.append(event_time)
-                    elif event_name == end_event and start_events:
-                        # 找到结束事件，匹配最后一个未匹配的起始事件
-                        last_start_time = start_events[-1]
-                        duration = event_time - last_start_time
-                        if duration >= 0:  # 只记录正的时间差
-                            time_pairs.append(duration)
-                            start_events.pop()  # 移除已匹配的起始事件
-                except ValueError:
-                    continue
+        event_names = self.event_store.names
+        event_times = self.event_store.absolute_times()
+        if self.rows is not None:
+            event_names = [event_names[row] for row in self.rows.tolist()]
+            event_times = event_times[self.rows]
+        
+        for event_name, event_time in zip(event_names, event_times.tolist()):
+            if event_name == start_event:
+                # 记录起始事件
+                start_events.append(event_time)
+            elif event_name == end_event and start_events:
+                # 找到结束事件，匹配最后一个未匹配的起始事件
+                last_start_time = start_events[-1]
+                duration = event_time - last_start_time
+                if duration >= 0:  # 只记录正的时间差
+                    time_pairs.append(duration)
+                    start_events.pop()  # 移除已匹配的起始事件
         
         # 计算结果
         if time_pairs:
@@ -0,0 +1,71 @@
+# time_index.py - 时间索引模块
+"""
+时间索引模块，提供基于树状数组（Fenwick树）的前缀和索引。
+
+事件的绝对时间等于时间原点加上到该行为止的相对时间之和，
+用前缀和树维护相对时间后，修改某一行的相对时间只需 O(log n) 更新，
+查询任意一行的绝对时间也只需 O(log n)，无需逐行重算后续事件。
+
+本模块不依赖Qt，可在任意线程中使用。
+"""
+
+from array import array
+
+import numpy as np
+
+
+class PrefixSumTree:
+    """整数前缀和树（树状数组）
+
+    tree[i]（下标从1开始）保存 values[i - lowbit(i), i) 的和，
+    单点增量和前缀和查询都只访问 O(log n) 个节点。
+    """
+
+    def __init__(self, values=()):
+        """初始化前缀和树
+
+        Args:
+            values: 初始整数序列（支持缓冲区协议的数组或列表）
+        """
+        self._size = 0
+        self._tree = array('q', [0])
+        self.rebuild(values)
+
+    def __len__(self):
+        return self._size
+
+    def rebuild(self, values):
+        """用新的整数序列重建整棵树
+
+        直接由前缀和向量化计算每个节点：tree[i] = prefix[i] - prefix[i - lowbit(i)]，
+        整体为一次线性扫描。
+        """
+        values = np.asarray(values, dtype=np.int64)
+        size = len(values)
+        prefix = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(values, out=prefix[1:])
+        indices = np.arange(size + 1, dtype=np.int64)
+        nodes = prefix - prefix[indices - (indices & -indices)]
+
+        self._size = size
+        self._tree = array('q')
+        self._tree.frombytes(nodes.tobytes())
+
+    def add(self, index, delta):
+        """给第 index 个值（从0开始）加上 delta"""
+        tree = self._tree
+        size = self._size
+        i = index + 1
+        while i <= size:
+            tree[i] += delta
+            i += i & -i
+
+    def prefix(self, count):
+        """返回前 count 个值的和"""
+        tree = self._tree
+        total = 0
+        i = min(count, self._size)
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
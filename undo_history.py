@@ -0,0 +1,626 @@
+# undo_history.py - 撤销历史模块
+"""
+撤销历史模块，基于操作记录实现撤销和重做。
+
+事件存储每次修改都会记录一条撤销操作（插入、删除、修改单元格、时间平移、
+重置、重排），操作只保存被修改部分的旧数据。本模块把两次检查点之间的操作
+组织成一个撤销步骤，撤销和重做的代价与修改的规模成正比，
+而不是像整表快照那样与事件总数成正比。
+
+撤销步骤可以保存在内存中，也可以交给 UndoJournal 写入磁盘上只追加的压缩日志，
+内存中只缓存最近用到的步骤；程序重启后，只要事件与上次保存时一致，
+撤销历史即可从日志中恢复，步骤内容在真正撤销时才读取。
+
+本模块不依赖Qt。
+"""
+
+import os
+import struct
+import sys
+import zlib
+from array import array
+from collections import OrderedDict
+
+import numpy as np
+
+from event_store import UNDO_REMOVE, UNDO_INSERT, UNDO_SET, UNDO_ORIGIN, UNDO_RESET, UNDO_REORDER
+
+# 默认最多保留的撤销步骤数
+DEFAULT_MAX_UNDO_STEPS = 1000
+
+# 撤销栈和重做栈
+UNDO_STACK = 0
+REDO_STACK = 1
+
+
+def store_fingerprint(event_store):
+    """计算事件存储内容的指纹，用于确认撤销日志与当前事件一致
+
+    Args:
+        event_store: 事件存储实例
+
+    Returns:
+        bytes: 指纹
+    """
+    checksum = zlib.crc32("\x00".join(event_store.names).encode("utf-8"))
+    for column in (event_store.types, event_store.buttons, event_store.keycodes,
+                   event_store.xs, event_store.ys, event_store.rel_times):
+        checksum = zlib.crc32(column, checksum)
+    origin = event_store.abs_time(0) - event_store.rel_time(0) if event_store.row_count() else 0
+    return struct.pack("<QqI", event_store.row_count(), origin, checksum)
+
+
+class _MemorySteps:
+    """保存在内存中的撤销/重做步骤"""
+
+    def __init__(self):
+        self._stacks = ([], [])
+
+    def push(self, stack, step):
+        self._stacks[stack].append(step)
+
+    def pop(self, stack):
+        return self._stacks[stack].pop()
+
+    def count(self, stack):
+        return len(self._stacks[stack])
+
+    def drop_oldest(self, stack, count):
+        del self._stacks[stack][:count]
+
+    def clear_stack(self, stack):
+        self._stacks[stack].clear()
+
+    def clear(self):
+        self._stacks = ([], [])
+
+
+class UndoHistory:
+    """撤销历史
+
+    用法::
+
+        history = UndoHistory(event_store)
+        history.checkpoint()      # 修改前设置检查点
+        event_store.set_name(0, "新名称")
+        history.undo()            # 撤销检查点之后的全部修改
+        history.redo()
+    """
+
+    def __init__(self, event_store, max_steps=DEFAULT_MAX_UNDO_STEPS):
+        """初始化撤销历史，并开始记录事件存储的修改
+
+        Args:
+            event_store: 事件存储实例
+            max_steps: 最多保留的撤销步骤数
+        """
+        self.event_store = event_store
+        self.max_steps = max_steps
+        self._steps = _MemorySteps()
+        self._pending = []  # 上一个检查点之后的操作
+        self._capture = None  # 撤销/重做期间记录反向操作
+        self._fingerprint = None  # (版本号, 指纹) 缓存
+        event_store.set_undo_log(self)
+
+    def use_journal(self, journal):
+        """改为把撤销步骤保存到磁盘日志中
+
+        日志中与当前事件一致的历史会被恢复，现有的内存历史被丢弃。
+
+        Args:
+            journal: UndoJournal 实例
+
+        Returns:
+            int: 恢复的撤销步骤数
+        """
+        journal.open(self.fingerprint())
+        self._pending = []
+        self._steps = journal
+        return journal.count(UNDO_STACK)
+
+    def fingerprint(self):
+        """当前事件内容的指纹（按版本号缓存）"""
+        version = self.event_store.version
+        if self._fingerprint is None or self._fingerprint[0] != version:
+            self._fingerprint = (version, store_fingerprint(self.event_store))
+        return self._fingerprint[1]
+
+    def mark_saved(self):
+        """记录事件已保存到文件，日志据此判断重启后能否恢复历史
+
+        尚有未合并的修改时不记录（例如导入过程中），此时重启后不会恢复到这些修改之前。
+
+        Returns:
+            bool: 是否记录
+        """
+        if self._pending or not isinstance(self._steps, UndoJournal):
+            return False
+        self._steps.mark_saved(self.fingerprint())
+        return True
+
+    def close(self):
+        """关闭磁盘日志，之后的撤销历史重新保存在内存中"""
+        if isinstance(self._steps, UndoJournal):
+            self._steps.close()
+            self._steps = _MemorySteps()
+
+    def record(self, operation):
+        """记录一条撤销操作（由事件存储调用）"""
+        if self._capture is not None:
+            self._capture.append(operation)
+            return
+        self._pending.append(operation)
+        # 新的修改使重做历史失效
+        if self._steps.count(REDO_STACK):
+            self._steps.clear_stack(REDO_STACK)
+
+    def checkpoint(self):
+        """把上一个检查点之后的修改合并为一个撤销步骤
+
+        Returns:
+            bool: 是否生成了新的撤销步骤（没有修改时不生成）
+        """
+        if not self._pending:
+            return False
+        self._steps.push(UNDO_STACK, self._pending)
+        self._pending = []
+        excess = self._steps.count(UNDO_STACK) - self.max_steps
+        if excess > 0:
+            self._steps.drop_oldest(UNDO_STACK, excess)
+        return True
+
+    def can_undo(self):
+        """是否有可撤销的修改"""
+        return bool(self._pending or self._steps.count(UNDO_STACK))
+
+    def can_redo(self):
+        """是否有可重做的修改"""
+        return bool(self._steps.count(REDO_STACK))
+
+    def undo_count(self):
+        """撤销步骤数（包括尚未合并的修改）"""
+        return self._steps.count(UNDO_STACK) + (1 if self._pending else 0)
+
+    def redo_count(self):
+        """重做步骤数"""
+        return self._steps.count(REDO_STACK)
+
+    def undo(self):
+        """撤销最近一个步骤
+
+        Returns:
+            bool: 是否执行了撤销
+        """
+        self.checkpoint()
+        if not self._steps.count(UNDO_STACK):
+            return False
+        step = self._steps.pop(UNDO_STACK)
+        self._steps.push(REDO_STACK, self._revert(step))
+        return True
+
+    def redo(self):
+        """重做最近撤销的步骤
+
+        Returns:
+            bool: 是否执行了重做
+        """
+        if not self._steps.count(REDO_STACK):
+            return False
+        step = self._steps.pop(REDO_STACK)
+        self._steps.push(UNDO_STACK, self._revert(step))
+        return True
+
+    def discard_pending(self):
+        """撤回上一个检查点之后的修改，不进入重做历史（用于取消导入等操作）"""
+        if self._pending:
+            step = self._pending
+            self._pending = []
+            self._revert(step)
+
+    def clear(self):
+        """清空全部撤销和重做历史"""
+        self._steps.clear()
+        self._pending = []
+
+    def _revert(self, step):
+        """按相反顺序执行一个步骤中的操作
+
+        Returns:
+            list: 执行过程中记录的反向操作，即还原本次执行的步骤
+        """
+        self._capture = []
+        try:
+            for operation in reversed(step):
+                self.event_store.apply_undo(operation)
+            return self._capture
+        finally:
+            self._capture = None
+
+
+# =============================================================================
+# 磁盘撤销日志
+# =============================================================================
+
+# 日志文件头（版本号变化时旧日志被丢弃）
+_JOURNAL_MAGIC = b"STUJ\x02"
+
+# 日志记录：类型(1字节) + 内容长度(4字节) + 内容
+_RECORD_HEADER = struct.Struct("<BI")
+_PUSH_UNDO = 1    # 内容为压缩后的步骤
+_PUSH_REDO = 2
+_POP_UNDO = 3
+_POP_REDO = 4
+_DROP_UNDO = 5    # 内容为丢弃的最早步骤数
+_CLEAR_UNDO = 6
+_CLEAR_REDO = 7
+_CLEAR = 8
+_SAVED = 9        # 内容为保存时的事件指纹
+
+_PUSH_KINDS = {UNDO_STACK: _PUSH_UNDO, REDO_STACK: _PUSH_REDO}
+_POP_KINDS = {UNDO_STACK: _POP_UNDO, REDO_STACK: _POP_REDO}
+_CLEAR_KINDS = {UNDO_STACK: _CLEAR_UNDO, REDO_STACK: _CLEAR_REDO}
+
+# 步骤内容（压缩前，小端序）：
+#     操作数        uint32
+#     每个操作      操作类型(uint8) + 各字段
+# 字段为 int64 整数或数据列；数据列为类型标记(1字节) + 项数(uint32) + 数据，
+# 名称列的数据为各名称的UTF-8字节数(uint32 × 项数) + UTF-8，
+# 数值列的数据为 array 类型码对应的定长整数数组。
+# 各操作的字段：
+#     删除插入的行    第一行、行数
+#     恢复删除的行    位置、7个数据列
+#     恢复单元格      第一行、列数(uint8)、每列为列序号(uint8) + 数据列
+#     恢复时间原点    旧时间原点
+#     恢复整体内容    7个数据列、旧时间原点
+#     重排            行号数据列
+_OPERATION_CODES = {UNDO_REMOVE: 1, UNDO_INSERT: 2, UNDO_SET: 3,
+                    UNDO_ORIGIN: 4, UNDO_RESET: 5, UNDO_REORDER: 6}
+_OPERATION_KINDS = {code: kind for kind, code in _OPERATION_CODES.items()}
+_NAMES_TAG = b"s"
+_INT64 = struct.Struct("<q")
+_COUNT = struct.Struct("<I")
+_INT_TYPECODES = (b"b", b"q")
+
+
+def _write_int(parts, value):
+    parts.append(_INT64.pack(value))
+
+
+def _write_values(parts, values):
+    """写入一个数据列（名称列表或整数数组）"""
+    if isinstance(values, list):
+        encoded = [name.encode("utf-8") for name in values]
+        parts.append(_NAMES_TAG + _COUNT.pack(len(encoded)))
+        parts.append(array("I", [len(data) for data in encoded]))
+        parts.append(b"".join(encoded))
+        return
+    if not isinstance(values, array):
+        values = array("q", np.asarray(values, dtype=np.int64).tobytes())
+    if sys.byteorder != "little" and values.itemsize > 1:
+        values = array(values.typecode, values)
+        values.byteswap()
+    parts.append(values.typecode.encode("ascii") + _COUNT.pack(len(values)))
+    parts.append(values)
+
+
+def _encode_step(step):
+    """把撤销步骤（操作列表）编码为字节串"""
+    parts = [_COUNT.pack(len(step))]
+    for operation in step:
+        kind = operation[0]
+        parts.append(bytes((_OPERATION_CODES[kind],)))
+        if kind == UNDO_REMOVE:
+            _write_int(parts, operation[1])
+            _write_int(parts, operation[2])
+        elif kind == UNDO_INSERT:
+            _write_int(parts, operation[1])
+            for values in operation[2]:
+                _write_values(parts, values)
+        elif kind == UNDO_SET:
+            _write_int(parts, operation[1])
+            parts.append(bytes((len(operation[2]),)))
+            for index, values in operation[2]:
+                parts.append(bytes((index,)))
+                _write_values(parts, values)
+        elif kind == UNDO_ORIGIN:
+            _write_int(parts, operation[1])
+        elif kind == UNDO_RESET:
+            for values in operation[1]:
+                _write_values(parts, values)
+            _write_int(parts, operation[2])
+        else:
+            _write_values(parts, operation[1])
+    return b"".join(parts)
+
+
+class _StepReader:
+    """按 _encode_step() 的布局读取步骤内容"""
+
+    def __init__(self, data):
+        self.data = data
+        self.position = 0
+
+    def take(self, size):
+        end = self.position + size
+        if end > len(self.data):
+            raise ValueError("撤销步骤内容不完整")
+        chunk = self.data[self.position:end]
+        self.position = end
+        return chunk
+
+    def byte(self):
+        return self.take(1)[0]
+
+    def int(self):
+        return _INT64.unpack(self.take(_INT64.size))[0]
+
+    def count(self):
+        return _COUNT.unpack(self.take(_COUNT.size))[0]
+
+    def values(self):
+        tag = self.take(1)
+        count = self.count()
+        if tag == _NAMES_TAG:
+            lengths = array("I")
+            lengths.frombytes(self.take(lengths.itemsize * count))
+            if sys.byteorder != "little":
+                lengths.byteswap()
+            return [self.take(length).decode("utf-8") for length in lengths]
+        if tag not in _INT_TYPECODES:
+            raise ValueError(f"未知的数据列类型: {tag!r}")
+        values = array(tag.decode("ascii"))
+        values.frombytes(self.take(values.itemsize * count))
+        if sys.byteorder != "little" and values.itemsize > 1:
+            values.byteswap()
+        return values
+
+    def columns(self):
+        return tuple(self.values() for _ in range(7))
+
+
+def _decode_step(data):
+    """从字节串还原撤销步骤
+
+    Raises:
+        ValueError: 内容格式不正确
+    """
+    reader = _StepReader(data)
+    step = []
+    for _ in range(reader.count()):
+        code = reader.byte()
+        kind = _OPERATION_KINDS.get(code)
+        if kind == UNDO_REMOVE:
+            step.append((kind, reader.int(), reader.int()))
+        elif kind == UNDO_INSERT:
+            step.append((kind, reader.int(), reader.columns()))
+        elif kind == UNDO_SET:
+            first = reader.int()
+            fields = tuple((reader.byte(), reader.values()) for _ in range(reader.byte()))
+            step.append((kind, first, fields))
+        elif kind == UNDO_ORIGIN:
+            step.append((kind, reader.int()))
+        elif kind == UNDO_RESET:
+            step.append((kind, reader.columns(), reader.int()))
+        elif kind == UNDO_REORDER:
+            step.append((kind, reader.values()))
+        else:
+            raise ValueError(f"未知的撤销操作代码: {code}")
+    if reader.position != len(data):
+        raise ValueError("撤销步骤内容有多余数据")
+    return step
+
+
+class UndoJournal:
+    """只追加的压缩撤销日志
+
+    每个撤销步骤按 _encode_step() 的固定布局编码、压缩后追加到日志文件，
+    日志只包含数据，读取时不会执行其中的任何内容。栈的变化（压入、弹出、丢弃、清空）
+    也作为记录追加，重启后重放这些记录即可得到两个栈，重放时只读取记录头，
+    步骤内容在撤销时才读取和解压。最近用到的步骤保存在按字节数限制的LRU缓存中。
+
+    事件保存到文件时记录当时的事件指纹，重启后只恢复到与加载的事件指纹一致的位置，
+    之后的记录（例如异常退出前没来得及保存的修改）被截断。
+    失效记录占用的空间超过有效内容时，在保存点重写日志。
+    """
+
+    def __init__(self, path, cache_bytes=32 * 1024 * 1024, compact_bytes=4 * 1024 * 1024):
+        """初始化撤销日志
+
+        Args:
+            path: 日志文件路径
+            cache_bytes: 内存中缓存的步骤大小上限（未压缩字节数）
+            compact_bytes: 失效内容超过该大小且超过有效内容时重写日志
+        """
+        self.path = path
+        self.cache_bytes = cache_bytes
+        self.compact_bytes = compact_bytes
+        self._file = None
+        self._stacks = ([], [])  # 步骤引用 (内容偏移, 内容长度)
+        self._cache = OrderedDict()  # 步骤引用 -> (步骤, 未压缩大小)
+        self._cache_size = 0
+        self._saved = None  # 最近一次保存点的事件指纹
+        self._changed = True  # 最近一次保存点之后栈是否变化
+
+    # -------------------------------------------------------------------------
+    # 打开和重写
+    # -------------------------------------------------------------------------
+
+    def open(self, fingerprint):
+        """打开日志，恢复与 fingerprint 一致的最近保存点时的撤销历史
+
+        Args:
+            fingerprint: 当前事件的指纹
+        """
+        self.close()
+        stacks = ([], [])
+        valid_end = 0
+        file = open(self.path, "r+b") if os.path.exists(self.path) else open(self.path, "w+b")
+        try:
+            if file.read(len(_JOURNAL_MAGIC)) == _JOURNAL_MAGIC:
+                stacks, valid_end = self._replay(file, fingerprint)
+        except (OSError, struct.error, ValueError):
+            stacks, valid_end = ([], []), 0
+        if not valid_end:
+            file.seek(0)
+            file.write(_JOURNAL_MAGIC)
+            valid_end = len(_JOURNAL_MAGIC)
+        file.truncate(valid_end)
+        file.seek(valid_end)
+        self._file = file
+        self._stacks = stacks
+        self._saved = fingerprint
+        self._changed = False
+        self._compact_if_needed()
+
+    def _replay(self, file, fingerprint):
+        """重放日志记录
+
+        Returns:
+            tuple: (与指纹一致的最近保存点时的两个栈, 该保存点的文件位置)，没有这样的保存点时位置为0
+        """
+        size = os.fstat(file.fileno()).st_size
+        stacks = ([], [])
+        result = (([], []), 0)
+        position = file.tell()
+        while position + _RECORD_HEADER.size <= size:
+            kind, length = _RECORD_HEADER.unpack(file.read(_RECORD_HEADER.size))
+            offset = position + _RECORD_HEADER.size
+            if offset + length > size:
+                break  # 写入中断的最后一条记录
+            if kind == _PUSH_UNDO or kind == _PUSH_REDO:
+                stacks[kind - _PUSH_UNDO].append((offset, length))
+                file.seek(length, os.SEEK_CUR)
+            else:
+                payload = file.read(length)
+                if kind == _POP_UNDO or kind == _POP_REDO:
+                    stacks[kind - _POP_UNDO].pop()
+                elif kind == _DROP_UNDO:
+                    del stacks[UNDO_STACK][:struct.unpack("<I", payload)[0]]
+                elif kind == _CLEAR_UNDO or kind == _CLEAR_REDO:
+                    stacks[kind - _CLEAR_UNDO].clear()
+                elif kind == _CLEAR:
+                    stacks = ([], [])
+                elif kind == _SAVED:
+                    if payload == fingerprint:
+                        result = ((list(stacks[0]), list(stacks[1])), offset + length)
+                else:
+                    raise ValueError(f"未知的日志记录类型: {kind}")
+            position = offset + length
+        return result
+
+    def _compact_if_needed(self):
+        """失效内容过多时，只保留当前两个栈中的步骤重写日志（仅在保存点调用）"""
+        size = self._file.seek(0, os.SEEK_END)
+        live = sum(length for stack in self._stacks for _, length in stack)
+        dead = size - live
+        if dead <= self.compact_bytes or dead <= live:
+            return
+        temp_path = self.path + ".tmp"
+        stacks = ([], [])
+        with open(temp_path, "wb") as temp:
+            temp.write(_JOURNAL_MAGIC)
+            for stack, kind in ((UNDO_STACK, _PUSH_UNDO), (REDO_STACK, _PUSH_REDO)):
+                for offset, length in self._stacks[stack]:
+                    self._file.seek(offset)
+                    temp.write(_RECORD_HEADER.pack(kind, length))
+                    stacks[stack].append((temp.tell(), length))
+                    temp.write(self._file.read(length))
+            temp.write(_RECORD_HEADER.pack(_SAVED, len(self._saved)))
+            temp.write(self._saved)
+        self._file.close()
+        os.replace(temp_path, self.path)
+        self._file = open(self.path, "r+b")
+        self._file.seek(0, os.SEEK_END)
+        # 引用随内容位置改变，缓存按新位置重新编号
+        remap = {old: new for old_stack, new_stack in zip(self._stacks, stacks)
+                 for old, new in zip(old_stack, new_stack)}
+        self._cache = OrderedDict((remap[ref], entry) for ref, entry in self._cache.items() if ref in remap)
+        self._cache_size = sum(size for _, size in self._cache.values())
+        self._stacks = stacks
+
+    def close(self):
+        """关闭日志文件"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._cache.clear()
+        self._cache_size = 0
+
+    # -------------------------------------------------------------------------
+    # 步骤栈（与内存步骤相同的接口）
+    # -------------------------------------------------------------------------
+
+    def _append(self, kind, payload=b""):
+        """追加一条记录，返回内容的文件偏移"""
+        self._file.write(_RECORD_HEADER.pack(kind, len(payload)))
+        offset = self._file.tell()
+        self._file.write(payload)
+        self._file.flush()
+        self._changed = True
+        return offset
+
+    def push(self, stack, step):
+        data = _encode_step(step)
+        payload = zlib.compress(data, 1)
+        ref = (self._append(_PUSH_KINDS[stack], payload), len(payload))
+        self._stacks[stack].append(ref)
+        self._remember(ref, step, len(data))
+
+    def pop(self, stack):
+        ref = self._stacks[stack].pop()
+        self._append(_POP_KINDS[stack])
+        entry = self._cache.pop(ref, None)
+        if entry is not None:
+            self._cache_size -= entry[1]
+            return entry[0]
+        self._file.seek(ref[0])
+        step = _decode_step(zlib.decompress(self._file.read(ref[1])))
+        self._file.seek(0, os.SEEK_END)
+        return step
+
+    def count(self, stack):
+        return len(self._stacks[stack])
+
+    def drop_oldest(self, stack, count):
+        # 只有撤销栈会丢弃最早的步骤
+        for ref in self._stacks[stack][:count]:
+            self._forget(ref)
+        del self._stacks[stack][:count]
+        self._append(_DROP_UNDO, struct.pack("<I", count))
+
+    def clear_stack(self, stack):
+        for ref in self._stacks[stack]:
+            self._forget(ref)
+        self._stacks[stack].clear()
+        self._append(_CLEAR_KINDS[stack])
+
+    def clear(self):
+        self._stacks = ([], [])
+        self._cache.clear()
+        self._cache_size = 0
+        self._append(_CLEAR)
+
+    def mark_saved(self, fingerprint):
+        """记录事件已保存，fingerprint 为保存时的事件指纹"""
+        if not self._changed and fingerprint == self._saved:
+            return
+        self._append(_SAVED, fingerprint)
+        self._saved = fingerprint
+        self._changed = False
+        self._compact_if_needed()
+
+    # -------------------------------------------------------------------------
+    # 缓存
+    # -------------------------------------------------------------------------
+
+    def _remember(self, ref, step, size):
+        self._cache[ref] = (step, size)
+        self._cache_size += size
+        while self._cache_size > self.cache_bytes and len(self._cache) > 1:
+            _, (_, old_size) = self._cache.popitem(last=False)
+            self._cache_size -= old_size
+
+    def _forget(self, ref):
+        entry = self._cache.pop(ref, None)
+        if entry is not None:
+            self._cache_size -= entry[1]
@@ -13,6 +13,9 @@ from PyQt6.QtGui import QIcon, QPixmap, QColor, QPainter
 
 # 导入版本管理器
 from version import version_manager
+from event_store import NO_KEYCODE
+from event_index import (PairingIndex, CHANNEL_KEY, PAIRING_DUPLICATE_PRESS,
+                         PAIRING_RELEASE_WITHOUT_PRESS)
 
 # =============================================================================
 # 全局常量和映射
@@ -200,30 +203,6 @@ def get_key_chinese_name(keycode):
         # 如果键码不是数字，返回原值
         return keycode
 
-def get_event_data_from_table(table, row, skip_row_number=True):
-    """从表格中获取事件数据
-    
-    Args:
-        table: 事件表格对象
-        row: 行索引
-        skip_row_number: 是否跳过行号列（默认True）
-        
-    Returns:
-        list: 事件数据列表
-    """
-    event_data = []
-    start_col = 1 if skip_row_number else 0
-    end_col = 8  # 共8列，包括行号列
-    
-    for col in range(start_col, end_col):
-        item = table.item(row, col)
-        if item:
-            event_data.append(item.text())
-        else:
-            event_data.append("")
-    
-    return event_data
-
 def handle_errors(logger=None, error_title="错误", error_message="操作失败"):
     """错误处理装饰器，用于统一处理函数中的异常
     
@@ -325,15 +304,11 @@ def update_app_state(main_window, event_manager=None):
     if hasattr(main_window, 'mark_state_dirty'):
         main_window.mark_state_dirty()
     
-    # 更新统计信息
+    # 更新统计信息，统计信息刷新时会同时刷新预计总时间
     if event_manager and hasattr(event_manager, 'update_stats'):
         event_manager.update_stats()
     elif hasattr(main_window, 'stats_panel') and hasattr(main_window.stats_panel, 'update_stats'):
         main_window.stats_panel.update_stats()
-    
-    # 立即更新预计总时间
-    if hasattr(main_window, 'on_calculate_total_time'):
-        main_window.on_calculate_total_time()
 
 # =============================================================================
 # Windows 任务栏图标修复相关函数
@@ -581,86 +556,43 @@ def get_current_app_info():
     return version_manager.get_app_info()
 
 
-def check_event_pairing(events_table):
-    """
-    检查事件成对性
+def format_pairing_issue(issue):
+    """将成对性索引中的问题转换为提示文本
     
     Args:
-        events_table: 事件表格对象
+        issue: (行号或None, 问题类型, 通道类型, 键码或鼠标按键代码)
         
     Returns:
-        list: 包含检查出的问题的列表
+        str: 问题描述
     """
-    pressed_keys = set()  # 记录按下的按键
-    pressed_mouse_buttons = set()  # 记录按下的鼠标按钮
-    issues = []
+    row, kind, channel_type, code = issue
     
-    for row in range(events_table.rowCount()):
-        type_item = events_table.item(row, 2)  # 事件类型列
-        keycode_item = events_table.item(row, 3)  # 键码列
-        
-        if not type_item:
-            continue
-            
-        event_type = type_item.text()
-        keycode = keycode_item.text() if keycode_item else ""
-        
-        # 检查按键事件
-        if event_type == "按键按下":
-            if keycode in pressed_keys:
-                # 获取按键的中文名称
-                key_name_cn = get_key_chinese_name(keycode)
-                issues.append(f"第{row+1}行: 按键{key_name_cn}重复按下")
-            else:
-                pressed_keys.add(keycode)
-        elif event_type == "按键释放":
-            if keycode not in pressed_keys:
-                # 获取按键的中文名称
-                key_name_cn = get_key_chinese_name(keycode)
-                issues.append(f"第{row+1}行: 按键{key_name_cn}未按下就释放")
-            else:
-                pressed_keys.remove(keycode)
-        
-        # 检查鼠标事件
-        elif event_type == "左键按下":
-            if "Left" in pressed_mouse_buttons:
-                issues.append(f"第{row+1}行: 左键重复按下")
-            else:
-                pressed_mouse_buttons.add("Left")
-        elif event_type == "左键释放":
-            if "Left" not in pressed_mouse_buttons:
-                issues.append(f"第{row+1}行: 左键未按下就释放")
-            else:
-                pressed_mouse_buttons.remove("Left")
-                
-        elif event_type == "右键按下":
-            if "Right" in pressed_mouse_buttons:
-                issues.append(f"第{row+1}行: 右键重复按下")
-            else:
-                pressed_mouse_buttons.add("Right")
-        elif event_type == "右键释放":
-            if "Right" not in pressed_mouse_buttons:
-                issues.append(f"第{row+1}行: 右键未按下就释放")
-            else:
-                pressed_mouse_buttons.remove("Right")
-                
-        elif event_type == "中键按下":
-            if "Middle" in pressed_mouse_buttons:
-                issues.append(f"第{row+1}行: 中键重复按下")
-            else:
-                pressed_mouse_buttons.add("Middle")
-        elif event_type == "中键释放":
-            if "Middle" not in pressed_mouse_buttons:
-                issues.append(f"第{row+1}行: 中键未按下就释放")
-            else:
-                pressed_mouse_buttons.remove("Middle")
+    if channel_type == CHANNEL_KEY:
+        # 获取按键的中文名称
+        name = "按键" + get_key_chinese_name("" if code == NO_KEYCODE else str(code))
+    else:
+        name = {1: "左键", 2: "右键", 3: "中键"}.get(code, "鼠标按键")
     
-    # 检查未释放的按键
-    for key in pressed_keys:
-        key_name_cn = get_key_chinese_name(key)
-        issues.append(f"按键{key_name_cn}被按下但未释放")
-    for button in pressed_mouse_buttons:
-        button_name = "左键" if button == "Left" else "右键" if button == "Right" else "中键"
-        issues.append(f"鼠标{button_name}按钮被按下但未释放")
+    if kind == PAIRING_DUPLICATE_PRESS:
+        return f"第{row+1}行: {name}重复按下"
+    if kind == PAIRING_RELEASE_WITHOUT_PRESS:
+        return f"第{row+1}行: {name}未按下就释放"
+    if channel_type == CHANNEL_KEY:
+        return f"{name}被按下但未释放"
+    return f"鼠标{name}按钮被按下但未释放"
+
+
+def check_event_pairing(event_store, pairing_index=None):
+    """
+    检查事件成对性
     
-    return issues
+    Args:
+        event_store: 事件存储对象
+        pairing_index: 已跟踪该事件存储的成对性索引，为None时临时构建
+        
+    Returns:
+        list: 包含检查出的问题的列表
+    """
+    if pairing_index is None:
+        pairing_index = PairingIndex(event_store, attach=False)
+    return [format_pairing_issue(issue) for issue in pairing_index.issues()]